@@ -0,0 +1,307 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Optional
+
+from app import config
+from app.services.database import ensure_indexes, save_many_to_database
+from app.utils.archives import AUDIO_EXTENSIONS
+
+def find_audio_files(root: str, extensions: frozenset) -> list[str]:
+    """
+    Lists the audio files under a directory, recursively, in a stable order.
+
+    Args:
+        root (str): The directory to walk.
+        extensions (frozenset): The lower-case file extensions to include, e.g. `{'.wav'}`.
+
+    Returns:
+        list[str]: The paths of the audio files, sorted. Hidden files and directories are skipped.
+    """
+    paths = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if not name.startswith('.'))
+        for filename in filenames:
+            if not filename.startswith('.') and os.path.splitext(filename)[1].lower() in extensions:
+                paths.append(os.path.join(directory, filename))
+    return sorted(paths)
+
+def read_manifest(path: str) -> dict[str, dict]:
+    """
+    Reads a checkpoint manifest written by an earlier run.
+
+    Args:
+        path (str): The path of the JSONL manifest; a missing file is an empty manifest.
+
+    Returns:
+        dict[str, dict]: The last entry recorded for each audio file, by path.
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path) as manifest:
+        for line in manifest:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interruption; the file is simply processed again
+                continue
+            entries[entry['path']] = entry
+    return entries
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as file:
+        if file.seek(0, 2) == 0:
+            return True
+        file.seek(-1, 2)
+        return file.read(1) == b'\n'
+
+def _init_worker() -> None:
+    """
+    Initializer of each worker process: loads the models once for the lifetime of the worker.
+    """
+    # The models are only imported in the workers, so the parent process stays small
+    from app.services.model_registry import load_models
+
+    # A worker processes one file at a time, so there is nothing to batch phonemes with
+    config.PHONEME_BATCHING = False
+    load_models()
+
+def _process_file(path: str, relative_path: str) -> dict:
+    """
+    Processes one audio file in a worker, unless the same content was stored before.
+
+    Returns:
+        dict: Either `{'document_id'}` for content found in the database, or `{'document'}`
+              with the processed document, ready to be stored.
+    """
+    from app.services.audio_processing import process_audio
+    from app.services.cache import audio_digest, content_key
+    from app.services.database import find_document
+
+    digest = audio_digest(path)
+    key = content_key(digest)
+    document_id = find_document(key)
+    if document_id is not None:
+        return {'document_id': document_id}
+
+    json_data = process_audio(path, relative_path)
+    json_data['content_key'] = key
+    json_data['audio']['sha256'] = digest
+    return {'document': json_data}
+
+class Progress:
+    """
+    Tracks the throughput of an ingest run and prints it to stderr.
+
+    Args:
+        total (int): The number of files to process in this run.
+        interval (float): Minimum time between two reports, in seconds.
+    """
+
+    def __init__(self, total: int, interval: float = 10.0):
+        self.total = total
+        self.interval = interval
+        self.counts = {'processed': 0, 'cached': 0, 'failed': 0}
+        self.audio_seconds = 0.0
+        self.started = time.perf_counter()
+        self._reported = self.started
+
+    def record(self, status: str, duration: float = 0.0) -> None:
+        self.counts[status] += 1
+        self.audio_seconds += duration
+        if time.perf_counter() - self._reported >= self.interval:
+            self.report()
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            **self.counts,
+            'audio_hours': self.audio_seconds / 3600,
+            'elapsed_hours': elapsed / 3600,
+            # Hours of audio processed per hour of wall time
+            'audio_hours_per_hour': self.audio_seconds / elapsed if elapsed else 0.0,
+        }
+
+    def report(self) -> None:
+        self._reported = time.perf_counter()
+        summary = self.summary()
+        done = sum(self.counts.values())
+        print(
+            f"[{done}/{self.total}] {summary['audio_hours']:.2f} audio-h in {summary['elapsed_hours'] * 60:.1f} min, "
+            f"{summary['audio_hours_per_hour']:.2f} audio-h/h "
+            f"({self.counts['processed']} processed, {self.counts['cached']} cached, {self.counts['failed']} failed)",
+            file=sys.stderr,
+        )
+
+def ingest(
+    root: str,
+    manifest_path: str,
+    workers: int,
+    write_batch_size: int,
+    retry_failed: bool = True,
+    extensions: frozenset = AUDIO_EXTENSIONS,
+) -> dict:
+    """
+    Processes every audio file under a directory and stores the results in the database.
+
+    Files run in a pool of `workers` processes that each load the models once. Processed
+    documents are written in bulk, `write_batch_size` at a time, and every file is recorded
+    in the manifest once its document is stored, so a rerun skips the files already done.
+
+    Args:
+        root (str): The directory of audio files.
+        manifest_path (str): The JSONL checkpoint manifest, created if missing and appended to.
+        workers (int): The number of worker processes.
+        write_batch_size (int): The number of documents per bulk write.
+        retry_failed (bool, optional): If true, files that failed in an earlier run are
+                                       processed again. Defaults to True.
+        extensions (frozenset): The audio file extensions to include.
+
+    Returns:
+        dict: The counts of processed, cached and failed files and the throughput of the run.
+    """
+    done = read_manifest(manifest_path)
+    skipped_statuses = ('processed', 'cached') if retry_failed else ('processed', 'cached', 'failed')
+    pending = [
+        path for path in find_audio_files(root, extensions)
+        if done.get(os.path.relpath(path, root), {}).get('status') not in skipped_statuses
+    ]
+    print(f"{len(pending)} files to process, {len(done)} recorded in {manifest_path}.", file=sys.stderr)
+
+    ensure_indexes()
+    progress = Progress(len(pending))
+    buffered: list[tuple[dict, str, str]] = []
+
+    with open(manifest_path, 'a') as manifest:
+        # Terminate a line cut short by an interruption, so the next entry starts on its own line
+        if not _ends_with_newline(manifest_path):
+            manifest.write('\n')
+
+        def record(relative_path: str, status: str, **fields) -> None:
+            entry = {'path': relative_path, 'status': status, **fields, 'finished': datetime.now().isoformat(timespec='seconds')}
+            manifest.write(json.dumps(entry) + '\n')
+            progress.record(status, fields.get('duration', 0.0))
+
+        def flush() -> None:
+            if not buffered:
+                return
+            try:
+                outcomes = save_many_to_database([(json_data, path) for json_data, path, _ in buffered])
+            except Exception as e:
+                outcomes = [{'error': f"Could not store the document: {e}"}] * len(buffered)
+            for (json_data, _, relative_path), outcome in zip(buffered, outcomes):
+                if 'error' in outcome:
+                    record(relative_path, 'failed', error=outcome['error'])
+                else:
+                    record(relative_path, 'processed', document_id=outcome['document_id'], duration=json_data['audio']['duration'])
+            buffered.clear()
+            # Entries reach the disk only once their documents are stored
+            manifest.flush()
+            os.fsync(manifest.fileno())
+
+        # "spawn" starts clean workers instead of forking a parent holding torch threads
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        ) as executor:
+            queue = iter(pending)
+            running: dict = {}
+            while True:
+                # Keep two files per worker in flight, so workers never wait for the parent
+                while len(running) < 2 * workers:
+                    path = next(queue, None)
+                    if path is None:
+                        break
+                    relative_path = os.path.relpath(path, root)
+                    running[executor.submit(_process_file, path, relative_path)] = (path, relative_path)
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path, relative_path = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        record(relative_path, 'failed', error=str(e))
+                        continue
+                    if 'document_id' in result:
+                        record(relative_path, 'cached', document_id=result['document_id'])
+                    else:
+                        buffered.append((result['document'], path, relative_path))
+                        if len(buffered) >= write_batch_size:
+                            flush()
+            flush()
+
+    progress.report()
+    return progress.summary()
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Process a directory of audio files offline and store the results in MongoDB.")
+    parser.add_argument('directory', help="Directory of audio files, walked recursively.")
+    parser.add_argument('--manifest', help="Checkpoint manifest (JSONL). Defaults to .mxesco-ingest.jsonl in the directory.")
+    parser.add_argument('--workers', type=int, default=config.WORKER_POOL_SIZE, help="Worker processes, each with its own models.")
+    parser.add_argument('--write-batch-size', type=int, default=config.WRITE_BATCH_SIZE, help="Documents per bulk write.")
+    parser.add_argument('--skip-failed', action='store_true', help="Do not retry files that failed in an earlier run.")
+    parser.add_argument('--extensions', nargs='+', default=sorted(AUDIO_EXTENSIONS), help="Audio file extensions to include.")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"'{args.directory}' is not a directory.")
+    # Spawned workers read the configuration from the environment, and split the cores among
+    # themselves according to WORKER_POOL_SIZE (see `TRANSCRIBER_THREADS`)
+    os.environ['WORKER_POOL_SIZE'] = str(args.workers)
+
+    summary = ingest(
+        root=args.directory,
+        manifest_path=args.manifest or os.path.join(args.directory, '.mxesco-ingest.jsonl'),
+        workers=args.workers,
+        write_batch_size=args.write_batch_size,
+        retry_failed=not args.skip_failed,
+        extensions=frozenset(extension.lower() if extension.startswith('.') else f'.{extension.lower()}' for extension in args.extensions),
+    )
+    print(json.dumps(summary, indent=2))
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+"""
+======================
+This module is the command-line entry point for ingesting large archives of audio files
+offline, without going through the web application.
+
+Main Components:
+- `ingest`: Processes a directory of audio files in a process pool and stores the results.
+- `find_audio_files` / `read_manifest`: The files to process and the checkpoint of earlier runs.
+- `Progress`: Reports the throughput (audio hours processed per hour) while the run goes on.
+
+Workflow:
+1. The directory is walked for audio files; the files recorded as `processed` or `cached`
+   in the manifest are skipped (and `failed` ones too, with `--skip-failed`).
+2. Each worker process loads and warms up the models once, then hashes its files, looks up
+   their content key, and runs `process_audio` on the new ones.
+3. The parent stores the documents with `save_many_to_database`, one `insert_many` per
+   `--write-batch-size` documents, and appends one manifest line per file once it is stored
+   (or `failed` with the error for the documents of the batch that could not be written).
+4. Throughput is printed to stderr every 10 seconds, and a JSON summary at the end.
+
+Notes:
+- Documents are keyed like uploads to the API (`content_key`), so files already processed
+  through the API, or present twice in the archive, are not processed again.
+- The manifest is relative to the directory, so an archive can be moved between runs.
+- Stop a run with Ctrl+C: at most the documents of one write batch (plus the files in
+  flight) are processed again on the next run.
+
+Example Usage:
+======================
+    python -m app.cli /data/recordings --workers 4
+    python -m app.cli /data/recordings --manifest ingest.jsonl --write-batch-size 200
+"""
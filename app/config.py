@@ -0,0 +1,176 @@
+import os
+
+# Identifiers of the pretrained models used by the processing pipeline
+TRANSCRIBER_MODEL: str = os.getenv("TRANSCRIBER_MODEL", "medium.en")
+PHONEMIZER_MODEL: str = os.getenv("PHONEMIZER_MODEL", "facebook/wav2vec2-xlsr-53-espeak-cv-ft")
+# Inference backend of each model: "torch" (float32), "quantized" (dynamic int8), or "onnx" (phonemizer only)
+TRANSCRIBER_BACKEND: str = os.getenv("TRANSCRIBER_BACKEND", "torch")
+PHONEMIZER_BACKEND: str = os.getenv("PHONEMIZER_BACKEND", "torch")
+# Transcription of long recordings: "sequential" (one 30 s window after another) or "batched"
+TRANSCRIPTION_MODE: str = os.getenv("TRANSCRIPTION_MODE", "sequential")
+TRANSCRIPTION_BATCH_SIZE: int = int(os.getenv("TRANSCRIPTION_BATCH_SIZE", "8"))
+# Cache of the ONNX exports of the phonemizer model
+ONNX_MODEL_DIR: str = os.getenv("ONNX_MODEL_DIR", "~/.cache/mxesco/onnx")
+
+# Load (and warm up) the models when the application starts instead of on the first request
+PRELOAD_MODELS: bool = os.getenv("PRELOAD_MODELS", "true").lower() in ("1", "true", "yes")
+
+# MongoDB connection
+MONGO_URI: str = os.getenv("MONGO_URI", "mongodb://mongo:27017/")
+MONGO_DATABASE: str = os.getenv("MONGO_DATABASE", "mxesco")
+MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+
+# Write-behind batching of document inserts
+WRITE_BATCH_SIZE: int = int(os.getenv("WRITE_BATCH_SIZE", "100"))
+WRITE_BATCH_MAX_WAIT_MS: float = float(os.getenv("WRITE_BATCH_MAX_WAIT_MS", "50"))
+WRITE_MAX_RETRIES: int = int(os.getenv("WRITE_MAX_RETRIES", "3"))
+# If false, uploads are answered once their document is buffered, before it reaches MongoDB
+WRITE_ACKNOWLEDGE: bool = os.getenv("WRITE_ACKNOWLEDGE", "true").lower() in ("1", "true", "yes")
+
+# Storage of the per-word data: "rows" (a list of dictionaries) or "columnar" (typed arrays)
+WORDS_STORAGE: str = os.getenv("WORDS_STORAGE", "rows")
+
+# Search: postings of every stored word, maintained on insert
+SEARCH_INDEXING: bool = os.getenv("SEARCH_INDEXING", "true").lower() in ("1", "true", "yes")
+SEARCH_CONTEXT_WORDS: int = int(os.getenv("SEARCH_CONTEXT_WORDS", "5"))
+SEARCH_MAX_PAGE_SIZE: int = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "500"))
+
+# Micro-batching of concurrent phonemization requests; only with WORKER_POOL=thread, since a
+# process worker runs one job at a time
+PHONEME_BATCHING: bool = os.getenv("PHONEME_BATCHING", "true").lower() in ("1", "true", "yes")
+PHONEME_BATCH_MAX_SIZE: int = int(os.getenv("PHONEME_BATCH_MAX_SIZE", "8"))
+PHONEME_BATCH_MAX_WAIT_MS: float = float(os.getenv("PHONEME_BATCH_MAX_WAIT_MS", "20"))
+# Longer clips are phonemized on their own, since padding a batch to them would waste compute
+PHONEME_BATCH_MAX_SECONDS: float = float(os.getenv("PHONEME_BATCH_MAX_SECONDS", "20"))
+
+# Windowed phonemization of long recordings, which bounds memory by the window size
+PHONEME_WINDOW_SECONDS: float = float(os.getenv("PHONEME_WINDOW_SECONDS", "20"))
+PHONEME_WINDOW_OVERLAP_SECONDS: float = float(os.getenv("PHONEME_WINDOW_OVERLAP_SECONDS", "2"))
+PHONEME_WINDOW_BATCH_SIZE: int = int(os.getenv("PHONEME_WINDOW_BATCH_SIZE", "1"))
+# Recordings longer than the window never reach the batcher, so a higher batch limit would be misleading
+PHONEME_BATCH_MAX_SECONDS = min(PHONEME_BATCH_MAX_SECONDS, PHONEME_WINDOW_SECONDS)
+
+# Voice activity detection: the models only run on speech regions (plus padding)
+VAD_ENABLED: bool = os.getenv("VAD_ENABLED", "false").lower() in ("1", "true", "yes")
+VAD_MARGIN_DB: float = float(os.getenv("VAD_MARGIN_DB", "12"))
+VAD_MIN_SILENCE_SECONDS: float = float(os.getenv("VAD_MIN_SILENCE_SECONDS", "0.5"))
+VAD_PADDING_SECONDS: float = float(os.getenv("VAD_PADDING_SECONDS", "0.2"))
+
+# Batch uploads: files per worker task, decoding threads, and maximum files and bytes of audio per request
+BATCH_GROUP_SIZE: int = int(os.getenv("BATCH_GROUP_SIZE", "8"))
+BATCH_DECODE_THREADS: int = int(os.getenv("BATCH_DECODE_THREADS", "4"))
+MAX_BATCH_FILES: int = int(os.getenv("MAX_BATCH_FILES", "1000"))
+MAX_BATCH_BYTES: int = int(os.getenv("MAX_BATCH_BYTES", str(2 * 1024 ** 3)))
+
+# Live streams: inference cadence, longest window run at once, and right context before words are final
+STREAM_STEP_SECONDS: float = float(os.getenv("STREAM_STEP_SECONDS", "1.0"))
+STREAM_MAX_WINDOW_SECONDS: float = float(os.getenv("STREAM_MAX_WINDOW_SECONDS", "20"))
+STREAM_COMMIT_MARGIN_SECONDS: float = float(os.getenv("STREAM_COMMIT_MARGIN_SECONDS", "1.5"))
+# Limits of a live stream: its total length, and the audio received but not processed yet,
+# which grows when a client sends faster than the stream is processed
+STREAM_MAX_SECONDS: float = float(os.getenv("STREAM_MAX_SECONDS", "3600"))
+STREAM_MAX_BACKLOG_SECONDS: float = float(os.getenv("STREAM_MAX_BACKLOG_SECONDS", "60"))
+
+# Uploads are spooled to disk in chunks of this size; an empty directory means the system default
+UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_SPOOL_DIR: str = os.getenv("UPLOAD_SPOOL_DIR", "")
+
+# Pool that runs the CPU-bound pipeline off the event loop: "process" or "thread"
+WORKER_POOL: str = os.getenv("WORKER_POOL", "process")
+WORKER_POOL_SIZE: int = int(os.getenv("WORKER_POOL_SIZE", "2"))
+# Web worker processes forked by `python -m app.serve`, which share one copy of the models
+SERVE_WORKERS: int = int(os.getenv("SERVE_WORKERS", "2"))
+# Admission control: uploads wait in a shortest-job-first queue for the workers, and are
+# rejected (HTTP 429) when the queue is full or they would wait longer than the limit
+ADMISSION_CONTROL: bool = os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+ADMISSION_MAX_WAIT_SECONDS: float = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "300"))
+# Seconds of estimated processing time forgiven per second of waiting, so long files are not starved
+ADMISSION_AGING_RATE: float = float(os.getenv("ADMISSION_AGING_RATE", "1.0"))
+# Processing seconds per second of audio assumed until the first uploads are measured
+ADMISSION_INITIAL_RTF: float = float(os.getenv("ADMISSION_INITIAL_RTF", "0.5"))
+# Maximum number of jobs whose status is kept in the `jobs` collection; the oldest finished ones are dropped first
+MAX_STORED_JOBS: int = int(os.getenv("MAX_STORED_JOBS", "10000"))
+
+# Number of content keys whose document identifiers are kept in the in-process LRU cache
+RESULT_CACHE_SIZE: int = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+
+# Run transcription and phonemization of a request concurrently
+CONCURRENT_STAGES: bool = os.getenv("CONCURRENT_STAGES", "true").lower() in ("1", "true", "yes")
+# Torch intra-op threads per stage; by default each worker's share of the cores is split in two
+_cores_per_worker: int = max(1, (os.cpu_count() or 1) // max(1, WORKER_POOL_SIZE))
+TRANSCRIBER_THREADS: int = int(os.getenv("TRANSCRIBER_THREADS", str(max(1, _cores_per_worker // 2))))
+PHONEMIZER_THREADS: int = int(os.getenv("PHONEMIZER_THREADS", str(max(1, _cores_per_worker // 2))))
+
+"""
+======================
+This module centralizes the runtime configuration of the application. Every setting can be
+overridden through an environment variable of the same name (e.g., in `docker-compose.yml`
+or a `.env` file).
+
+Settings:
+- `TRANSCRIBER_MODEL`: Name of the Whisper model used for transcription.
+- `PHONEMIZER_MODEL`: Hugging Face identifier of the Wav2Vec2 model used for phonemization.
+- `TRANSCRIBER_BACKEND`: Inference backend of the Whisper model, `torch` or `quantized`.
+- `PHONEMIZER_BACKEND`: Inference backend of the Wav2Vec2 model, `torch`, `quantized`, or `onnx`.
+- `TRANSCRIPTION_MODE`: `sequential` decodes the 30-second Whisper windows one by one, `batched` several at once.
+- `TRANSCRIPTION_BATCH_SIZE`: Number of Whisper windows per forward pass in `batched` mode.
+- `ONNX_MODEL_DIR`: Directory where the ONNX export of the phonemizer model is cached.
+- `PRELOAD_MODELS`: If true, models are loaded and warmed up at application startup.
+- `MONGO_URI`: Connection string of the MongoDB server.
+- `MONGO_DATABASE`: Name of the database holding the documents and GridFS files.
+- `MONGO_MAX_POOL_SIZE`: Maximum number of pooled connections per client.
+- `WRITE_BATCH_SIZE`: Maximum number of documents per `insert_many` of the write-behind buffer.
+- `WRITE_BATCH_MAX_WAIT_MS`: Maximum time a document waits in the buffer for others to join its batch.
+- `WRITE_MAX_RETRIES`: Retries of a batch after a transient connection error.
+- `WRITE_ACKNOWLEDGE`: If true, uploads are answered only once their document is written.
+- `WORDS_STORAGE`: `rows` stores `words` as a list of dictionaries, `columnar` as typed arrays in `words_columnar`.
+- `SEARCH_INDEXING`: If true, every stored word is added to the `word_postings` search index.
+- `SEARCH_CONTEXT_WORDS`: Words of surrounding text returned on each side of a search hit.
+- `SEARCH_MAX_PAGE_SIZE`: Maximum number of hits per page of search results.
+- `PHONEME_BATCHING`: If true, concurrent phonemization requests are grouped into batches. Only
+  takes effect with `WORKER_POOL=thread`: process workers run one job at a time and disable it.
+- `PHONEME_BATCH_MAX_SIZE`: Maximum number of waveforms per phonemization batch.
+- `PHONEME_BATCH_MAX_WAIT_MS`: Maximum time a request waits for other requests to join its batch.
+- `PHONEME_BATCH_MAX_SECONDS`: Clips longer than this are never batched; capped at `PHONEME_WINDOW_SECONDS`.
+- `PHONEME_WINDOW_SECONDS`: Recordings longer than this are phonemized in overlapping windows.
+- `PHONEME_WINDOW_OVERLAP_SECONDS`: Overlap between consecutive phonemization windows.
+- `PHONEME_WINDOW_BATCH_SIZE`: Number of windows per Wav2Vec2 forward pass.
+- `VAD_ENABLED`: If true, silence is detected before inference and skipped by the models. Off by
+  default, since it changes the content keys: uploads processed before are processed again.
+- `VAD_MARGIN_DB`: How far above the recording's noise floor a frame must be to count as speech.
+- `VAD_MIN_SILENCE_SECONDS`: Shortest silence that is skipped; shorter pauses stay in the model input.
+- `VAD_PADDING_SECONDS`: Audio kept before and after every speech region.
+- `BATCH_GROUP_SIZE`: Number of files of a batch upload processed together by one worker.
+- `BATCH_DECODE_THREADS`: Threads decoding the files of a batch in parallel.
+- `MAX_BATCH_FILES`: Maximum number of audio files in one batch upload.
+- `MAX_BATCH_BYTES`: Maximum total size of the audio files of one batch upload, archive members uncompressed.
+- `STREAM_STEP_SECONDS`: Seconds of new audio after which a live stream is processed again.
+- `STREAM_MAX_WINDOW_SECONDS`: Longest stretch of a live stream processed at once, which bounds the latency.
+- `STREAM_COMMIT_MARGIN_SECONDS`: Words of a live stream ending this long before the latest audio are final.
+- `STREAM_MAX_SECONDS`: Longest live stream; longer ones are closed with WebSocket code 1009.
+- `STREAM_MAX_BACKLOG_SECONDS`: Most audio of a live stream waiting to be processed; beyond it, the
+  stream is closed with WebSocket code 1008.
+- `UPLOAD_CHUNK_BYTES`: Size of the chunks in which uploads are spooled, hashed, and streamed into GridFS.
+- `UPLOAD_SPOOL_DIR`: Directory of the temporary files holding uploads (defaults to the system temp directory).
+- `WORKER_POOL`: Kind of pool running the processing pipeline, `process` or `thread`.
+- `WORKER_POOL_SIZE`: Number of workers in the pool.
+- `SERVE_WORKERS`: Number of web worker processes forked by the pre-fork server (`app.serve`).
+- `ADMISSION_CONTROL`: Queue uploads shortest-job-first and reject them with HTTP 429 when the server is saturated.
+- `ADMISSION_MAX_QUEUE`: Maximum number of uploads waiting for a worker.
+- `ADMISSION_MAX_WAIT_SECONDS`: Longest projected wait of an admitted upload.
+- `ADMISSION_AGING_RATE`: Seconds of estimated processing time forgiven per second of waiting.
+- `ADMISSION_INITIAL_RTF`: Processing seconds per second of audio assumed before any upload is measured.
+- `MAX_STORED_JOBS`: Number of jobs kept in MongoDB for status queries.
+- `RESULT_CACHE_SIZE`: Entries of the in-process cache of already processed uploads (0 disables it).
+- `CONCURRENT_STAGES`: If true, transcription and phonemization of a request run concurrently, each
+  on long-lived threads of its stage whose torch thread count is set once, when they start.
+- `TRANSCRIBER_THREADS`: Torch intra-op threads used by the transcription stage.
+- `PHONEMIZER_THREADS`: Torch intra-op threads used by the phonemization stage.
+
+Example Usage:
+======================
+    from app import config
+
+    whisper_model = whisper.load_model(config.TRANSCRIBER_MODEL)
+"""
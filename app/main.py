@@ -1,35 +1,83 @@
-from fastapi import FastAPI
-from app.routes.audio_routes import router as audio_router
-
-app = FastAPI(
-    title="MXesco API",
-    description="An API for uploading audio files, transcribing them, extracting phonemes, and storing data in MongoDB.",
-    version="1.0.0"
-)
-
-# Register the audio router with the prefix "/api"
-app.include_router(audio_router, prefix="/api")
-
-"""
-======================
-This module sets up and runs the main FastAPI application instance.
-
-Main Components:
-- `FastAPI`: Creates and configures the FastAPI application.
-- `audio_router`: A router defining the audio-related endpoints, imported from `app.routes.audio_routes`.
-
-Key Points:
-- All routes in the audio router are prefixed with `/api`.
-- Additional routers can be added in a similar way to modularize the application.
-
-Example of Execution:
-======================
-Run the server locally using:
-    uvicorn main:app --reload
-
-Interactive API Documentation:
-==============================
-Once the server is running, visit:
-- Swagger UI: http://127.0.0.1:8000/docs
-- ReDoc: http://127.0.0.1:8000/redoc
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+
+from app import config
+from app.routes.audio_routes import router as audio_router
+from app.routes.export_routes import router as export_router
+from app.routes.metrics_routes import router as metrics_router
+from app.routes.search_routes import router as search_router
+from app.services.model_registry import load_models
+from app.services.phoneme_batcher import stop_batcher
+from app.services.workers import start_pool, shutdown_pool
+from app.services.async_database import ensure_indexes_async, close_async_database
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan handler: starts the worker pool and loads and warms up the models
+    before serving requests, and releases them (flushing pending database writes) on shutdown.
+    """
+    # Process workers load their own models; thread workers share the ones of this process
+    if config.PRELOAD_MODELS and config.WORKER_POOL == "thread":
+        # Loading takes several seconds, so keep it off the event loop thread
+        await run_in_threadpool(load_models)
+    start_pool()
+    try:
+        await ensure_indexes_async()
+    except Exception as e:
+        # The API can still start; deduplication falls back to unindexed lookups
+        print(f"Could not create database indexes: {e}")
+    yield
+    await run_in_threadpool(shutdown_pool)
+    await run_in_threadpool(stop_batcher)
+    # Write the documents still buffered before the process exits
+    await close_async_database()
+
+app = FastAPI(
+    title="MXesco API",
+    description="An API for uploading audio files, transcribing them, extracting phonemes, and storing data in MongoDB.",
+    version="1.0.0",
+    lifespan=lifespan,
+)
+
+# Register the audio router with the prefix "/api"
+app.include_router(audio_router, prefix="/api")
+# Register the search router with the prefix "/api"
+app.include_router(search_router, prefix="/api")
+# Register the export router with the prefix "/api"
+app.include_router(export_router, prefix="/api")
+# Register the monitoring router at the root, where Prometheus expects `/metrics`
+app.include_router(metrics_router)
+
+"""
+======================
+This module sets up and runs the main FastAPI application instance.
+
+Main Components:
+- `FastAPI`: Creates and configures the FastAPI application.
+- `audio_router`: A router defining the audio-related endpoints, imported from `app.routes.audio_routes`.
+- `search_router`: The word, token id and phoneme search endpoints, imported from `app.routes.search_routes`.
+- `export_router`: The NDJSON export and audio clip endpoints, imported from `app.routes.export_routes`.
+- `metrics_router`: The `/metrics` endpoint for Prometheus, imported from `app.routes.metrics_routes`.
+- `lifespan`: Startup hook that starts the worker pool and loads the Whisper and Wav2Vec2 models
+  once (in each process worker, or in this process for thread workers).
+
+Key Points:
+- All routes in the audio, search and export routers are prefixed with `/api`.
+- Additional routers can be added in a similar way to modularize the application.
+- Models are loaded at startup unless `PRELOAD_MODELS` is disabled, in which case they are
+  loaded lazily by the first request.
+
+Example of Execution:
+======================
+Run the server locally using:
+    uvicorn main:app --reload
+
+Interactive API Documentation:
+==============================
+Once the server is running, visit:
+- Swagger UI: http://127.0.0.1:8000/docs
+- ReDoc: http://127.0.0.1:8000/redoc
 """
\ No newline at end of file
@@ -1,64 +1,374 @@
-from fastapi import APIRouter, UploadFile, HTTPException
-from app.services.audio_processing import process_audio
-from app.services.database import save_to_database
-
-# Create the APIRouter instance for audio-related routes
-router = APIRouter()
-
-@router.post("/process-audio/")
-async def process_audio_endpoint(file: UploadFile):
-    """
-    Endpoint to process an audio file.
-
-    Args:
-        file (UploadFile): The uploaded audio file to be processed.
-
-    Returns:
-        dict: A dictionary containing the status of the operation and a success message.
-
-    Raises:
-        HTTPException: If an error occurs during processing or saving, it raises an HTTP 500 error with details.
-    """
-    try:
-        # Read the uploaded audio file
-        audio_data = await file.read()
-
-        # Process the audio file and extract relevant data
-        json_data = process_audio(audio_data, file.filename)
-
-        # Save the processed data and raw audio to the database
-        save_to_database(json_data, audio_data)
-
-        # Return a success response
-        return {"status": "success", "message": "Audio processed and saved successfully."}
-    except Exception as e:
-        # Handle any exceptions and return a server error response
-        raise HTTPException(status_code=500, detail=str(e))
-    
-
-"""
-======================
-This module defines the routes for handling audio file processing in the API.
-
-Main Components:
-- `process_audio_endpoint`: A POST endpoint for processing uploaded audio files.
-- `process_audio`: A service function to analyze and extract data from the audio file.
-- `save_to_database`: A service function to store processed audio data and metadata in the database.
-
-Workflow:
-1. The user uploads an audio file to the `/process-audio/` endpoint.
-2. The `process_audio` service processes the audio file, extracting phonemes, transcription, and other relevant data.
-3. The `save_to_database` service saves both the processed data and the raw audio into a database.
-
-Example of Usage:
-=================
-1. Upload an audio file via the `/process-audio/` POST endpoint:
-    curl -X POST "http://127.0.0.1:8000/api/process-audio/" \
-        -F "file=@example_audio.mp3"
-
-Expected Response:
-    {
-        "status": "success",
-        "message": "Audio processed and saved successfully."
-    }
+import asyncio
+import os
+from typing import Optional
+
+from fastapi import APIRouter, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
+from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
+from app import config
+from app.services.cache import content_key
+from app.services.pipeline import find_processed, handle_upload, handle_batch
+from app.utils.archives import is_archive
+from app.services.jobs import submit_job, get_job
+from app.services.uploads import spool_upload, spool_archive, remove_spooled
+from app.services.phoneme_batcher import batcher_stats
+from app.services.admission import Overloaded, admission_stats, audio_duration, get_admission
+from app.services.streaming import StreamLimitExceeded, StreamSession
+from app.services.async_database import delete_document_async
+
+# Create the APIRouter instance for audio-related routes
+router = APIRouter()
+
+async def admit_upload(path: str, digest: str) -> Optional[dict]:
+    """
+    Admits a spooled upload into the processing queue, according to its duration.
+
+    Uploads already processed are answered from the stored result without any inference,
+    so they are never queued nor rejected.
+
+    Args:
+        path (str): The path of the spooled upload.
+        digest (str): The digest of the upload, computed while spooling.
+
+    Returns:
+        Optional[dict]: The admission ticket, or None if admission control is disabled or
+                        the upload was already processed.
+
+    Raises:
+        HTTPException: If the server is saturated, it raises an HTTP 429 error with a
+                       `Retry-After` header.
+    """
+    admission = get_admission()
+    if admission is None or await find_processed(content_key(digest)) is not None:
+        return None
+    # Reading the header may touch the disk, so keep it off the event loop thread
+    duration = await run_in_threadpool(audio_duration, path)
+    try:
+        return admission.admit(duration)
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+@router.post("/process-audio/")
+async def process_audio_endpoint(file: UploadFile):
+    """
+    Endpoint to process an audio file.
+
+    Args:
+        file (UploadFile): The uploaded audio file to be processed.
+
+    Returns:
+        dict: A dictionary containing the status of the operation and a success message.
+
+    Raises:
+        HTTPException: If the server is saturated, it raises an HTTP 429 error with a `Retry-After`
+                       header; if an error occurs during processing or saving, an HTTP 500 error with details.
+    """
+    try:
+        # Spool the uploaded audio file to disk, so it is never held in memory as a whole
+        path, digest = await spool_upload(file)
+        ticket = None
+        try:
+            ticket = await admit_upload(path, digest)
+            # Process the audio file in the worker pool and save the results to the database
+            result = await handle_upload(path, file.filename, digest, ticket)
+        finally:
+            if ticket is not None:
+                # Withdraws the ticket of an upload whose content was stored while it waited
+                get_admission().release(ticket)
+            remove_spooled(path)
+
+        # Return a success response
+        message = "Audio already processed." if result["cached"] else "Audio processed and saved successfully."
+        return {
+            "status": "success",
+            "message": message,
+            "document_id": result["document_id"],
+            "cached": result["cached"],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Handle any exceptions and return a server error response
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/process-audio/batch/")
+async def process_audio_batch_endpoint(files: list[UploadFile] = File(...)):
+    """
+    Endpoint to process many audio files in one request.
+
+    Each uploaded file may be an audio file or a zip/tar archive of audio files. The files
+    are processed in groups that share model forward passes, and one result is reported per
+    audio file, so a failing file does not fail the whole batch.
+
+    Args:
+        files (list[UploadFile]): The uploaded audio files and archives.
+
+    Returns:
+        dict: The per-file `results` (status and `document_id` or `error`) and a `summary`.
+
+    Raises:
+        HTTPException: If an archive cannot be read or the batch holds more than
+                       `MAX_BATCH_FILES` audio files or `MAX_BATCH_BYTES` bytes of audio,
+                       it raises an HTTP 400 error.
+    """
+    # Every file is spooled to disk, archive members included: (path, filename, digest)
+    uploads: list[tuple[str, str, str]] = []
+    total_bytes = 0
+    try:
+        for file in files:
+            if is_archive(file.filename):
+                try:
+                    members = await spool_archive(
+                        file, config.MAX_BATCH_FILES - len(uploads), config.MAX_BATCH_BYTES - total_bytes,
+                    )
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+            else:
+                path, digest = await spool_upload(file)
+                members = [(path, file.filename, digest)]
+            uploads.extend(members)
+            total_bytes += sum(os.path.getsize(path) for path, _, _ in members)
+
+            if len(uploads) > config.MAX_BATCH_FILES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"The batch holds more than {config.MAX_BATCH_FILES} audio files.",
+                )
+            if total_bytes > config.MAX_BATCH_BYTES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"The batch holds more than {config.MAX_BATCH_BYTES} bytes of audio.",
+                )
+
+        try:
+            return await handle_batch(uploads)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for path, _, _ in uploads:
+            remove_spooled(path)
+
+@router.post("/jobs/", status_code=202)
+async def create_job_endpoint(file: UploadFile):
+    """
+    Endpoint to enqueue an audio file for background processing.
+
+    Args:
+        file (UploadFile): The uploaded audio file to be processed.
+
+    Returns:
+        dict: A dictionary containing the `job_id` and its initial status.
+
+    Raises:
+        HTTPException: If the server is saturated, it raises an HTTP 429 error with a `Retry-After`
+                       header; if the job cannot be recorded, an HTTP 500 error.
+    """
+    # Spool the uploaded audio file to disk and hand it to the job manager, which deletes it when done
+    path, digest = await spool_upload(file)
+    try:
+        ticket = await admit_upload(path, digest)
+    except HTTPException:
+        remove_spooled(path)
+        raise
+    try:
+        job_id = await submit_job(path, file.filename, digest, ticket)
+    except Exception as e:
+        if ticket is not None:
+            get_admission().release(ticket)
+        remove_spooled(path)
+        raise HTTPException(status_code=500, detail=f"Could not record the job: {e}")
+
+    return {"job_id": job_id, "status": "queued"}
+
+@router.get("/jobs/{job_id}")
+async def get_job_endpoint(job_id: str):
+    """
+    Endpoint to query the status and result of a job.
+
+    Args:
+        job_id (str): The identifier returned when the job was created.
+
+    Returns:
+        dict: The job status (`queued`, `processing`, `completed` or `failed`) and its result or error.
+
+    Raises:
+        HTTPException: If the job is unknown, it raises an HTTP 404 error.
+    """
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job
+
+@router.websocket("/ws/process-audio/")
+async def process_audio_stream_endpoint(
+    websocket: WebSocket, filename: str = "stream.wav", sample_rate: int = 16000, encoding: str = "pcm_s16le",
+):
+    """
+    WebSocket endpoint processing a live audio stream incrementally.
+
+    The client sends mono samples as binary messages while recording, and the text message
+    `end` when it stops. About every `STREAM_STEP_SECONDS`, the server answers with a
+    `partial` message holding the words that became final and the tentative words after
+    them; after `end`, it sends a `final` message with the id of the stored document.
+    Streams over `STREAM_MAX_SECONDS`, or with more than `STREAM_MAX_BACKLOG_SECONDS` of audio
+    waiting to be processed, get an `error` message and are closed without being stored.
+
+    Args:
+        websocket (WebSocket): The connection.
+        filename (str): The name under which the recording is stored.
+        sample_rate (int): The sample rate of the stream in Hz.
+        encoding (str): The sample format, `pcm_s16le` or `pcm_f32le`.
+    """
+    await websocket.accept()
+    try:
+        session = StreamSession(filename, sample_rate, encoding)
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1008)
+        return
+
+    async def advance() -> None:
+        await websocket.send_json(await session.advance())
+
+    # At most one window is processed at a time; audio received meanwhile waits for the next one
+    pending: Optional[asyncio.Task] = None
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                # The client left without ending the stream, so there is nobody to answer
+                if pending is not None:
+                    pending.cancel()
+                return
+            if message.get("bytes") is not None:
+                session.append(message["bytes"])
+            elif message.get("text") == "end":
+                break
+
+            if pending is not None and pending.done():
+                # Surface the errors of the last window
+                pending.result()
+                pending = None
+            if pending is None and session.should_advance():
+                pending = asyncio.create_task(advance())
+
+        if pending is not None:
+            await pending
+        await websocket.send_json(await session.finish())
+        await websocket.close()
+    except WebSocketDisconnect:
+        if pending is not None:
+            pending.cancel()
+    except StreamLimitExceeded as e:
+        # The stream is dropped without storing it
+        if pending is not None:
+            pending.cancel()
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=e.code)
+    except Exception as e:
+        if pending is not None:
+            pending.cancel()
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1011)
+    finally:
+        session.close()
+
+@router.delete("/documents/{document_id}")
+async def delete_document_endpoint(document_id: str):
+    """
+    Endpoint to delete a stored document, its search postings, and its audio if no other
+    document references it.
+
+    Args:
+        document_id (str): The identifier of the document.
+
+    Returns:
+        dict: A dictionary containing the status of the operation and the deleted `document_id`.
+
+    Raises:
+        HTTPException: If the document id is invalid, it raises an HTTP 400 error; if the
+                       document does not exist, an HTTP 404 error.
+    """
+    if not ObjectId.is_valid(document_id):
+        raise HTTPException(status_code=400, detail=f"Invalid document id '{document_id}'.")
+    if not await delete_document_async(document_id):
+        raise HTTPException(status_code=404, detail=f"Document '{document_id}' not found.")
+    return {"status": "success", "document_id": document_id}
+
+@router.get("/admission/stats")
+async def admission_stats_endpoint():
+    """
+    Endpoint to inspect the admission controller.
+
+    Returns:
+        dict: Admitted and rejected uploads, queue length, real-time factor estimate and queue-wait statistics.
+    """
+    return admission_stats()
+
+@router.get("/phonemizer/stats")
+async def phonemizer_stats_endpoint():
+    """
+    Endpoint to inspect the phonemization micro-batching scheduler.
+
+    Returns:
+        dict: Batch-size histogram and queue-wait statistics of the phoneme batcher.
+    """
+    return batcher_stats()
+    
+
+"""
+======================
+This module defines the routes for handling audio file processing in the API.
+
+Main Components:
+- `process_audio_endpoint`: A POST endpoint for processing uploaded audio files and waiting for the result.
+- `process_audio_batch_endpoint`: A POST endpoint processing many audio files, or archives of them, in one request.
+- `create_job_endpoint`: A POST endpoint that enqueues an uploaded audio file and returns a job id immediately.
+- `get_job_endpoint`: A GET endpoint returning the status and result of a job.
+- `process_audio_stream_endpoint`: A WebSocket endpoint processing live audio as it is recorded.
+- `delete_document_endpoint`: A DELETE endpoint removing a stored document and releasing its audio.
+- `admission_stats_endpoint`: A GET endpoint exposing the admission controller statistics.
+- `phonemizer_stats_endpoint`: A GET endpoint exposing the phoneme batcher statistics.
+- `admit_upload`: Admits a new spooled upload into the shortest-job-first queue, or answers HTTP 429.
+- `spool_upload`: A service function that writes the upload to a temporary file in chunks.
+- `handle_upload`: A service function that processes the audio file in the worker pool and saves the results.
+- `submit_job` / `get_job`: Service functions of the background job manager.
+
+Workflow:
+1. The user uploads an audio file to the `/process-audio/` or `/jobs/` endpoint, and it is spooled to disk.
+2. The `process_audio` service runs in the worker pool, extracting phonemes, transcription, and other relevant data.
+3. The `save_to_database` service saves both the processed data and the raw audio into a database.
+4. `/process-audio/` answers once the document is stored; `/jobs/` answers at once, and the
+   result can be polled at `/jobs/{job_id}`.
+5. When the projected wait for a worker exceeds `ADMISSION_MAX_WAIT_SECONDS`, both answer
+   HTTP 429 with a `Retry-After` header instead of accepting a new upload; uploads already
+   processed are answered from the stored result without being admitted.
+
+Example of Usage:
+=================
+1. Upload an audio file via the `/process-audio/` POST endpoint:
+    curl -X POST "http://127.0.0.1:8000/api/process-audio/" \
+        -F "file=@example_audio.mp3"
+
+Expected Response:
+    {
+        "status": "success",
+        "message": "Audio processed and saved successfully.",
+        "document_id": "...",
+        "cached": false
+    }
+
+2. Upload several files and an archive in one batch:
+    curl -X POST "http://127.0.0.1:8000/api/process-audio/batch/" \
+        -F "files=@first.wav" -F "files=@second.mp3" -F "files=@corpus.zip"
+
+3. Enqueue an audio file and poll its job:
+    curl -X POST "http://127.0.0.1:8000/api/jobs/" -F "file=@example_audio.mp3"
+    curl "http://127.0.0.1:8000/api/jobs/<job_id>"
+
+4. Stream live audio (16 kHz, 16-bit mono) over a WebSocket:
+    ws://127.0.0.1:8000/api/ws/process-audio/?sample_rate=16000&encoding=pcm_s16le
+    -> binary messages with the samples, then the text message "end"
+    <- {"type": "partial", "words": [...], "tentative": [...], "duration": 12.0}
+    <- {"type": "final", "document_id": "...", "words": [...], "duration": 12.4}
 """
\ No newline at end of file
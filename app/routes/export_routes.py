@@ -0,0 +1,89 @@
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+
+from app.services.export import MissingAudio, export_documents, audio_clip
+
+# Create the APIRouter instance for the read path of the corpus
+router = APIRouter()
+
+@router.get("/export/")
+async def export_endpoint(per_word: bool = False, include_pauses: bool = False, after: Optional[str] = None):
+    """
+    Endpoint streaming the stored documents as NDJSON (one JSON object per line).
+
+    Args:
+        per_word (bool): If true, one line per word (document id, file, position, word,
+                         times, probability, token id and phonemes) instead of per document.
+        include_pauses (bool): With `per_word`, also export the `<pause>` entries.
+        after (Optional[str]): Only export the documents stored after this document id.
+
+    Returns:
+        StreamingResponse: The `application/x-ndjson` stream, in document id order.
+
+    Raises:
+        HTTPException: If `after` is not a document id, it raises an HTTP 400 error.
+    """
+    try:
+        lines = export_documents(per_word, include_pauses, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@router.get("/documents/{document_id}/clip")
+async def clip_endpoint(document_id: str, start: float, end: float):
+    """
+    Endpoint returning the audio of a document between two timestamps, e.g. of one word.
+
+    Args:
+        document_id (str): The identifier of the document.
+        start (float): The start of the clip, in seconds.
+        end (float): The end of the clip, in seconds.
+
+    Returns:
+        Response: The clip as an `audio/wav` file.
+
+    Raises:
+        HTTPException: If the document does not exist or has no stored audio, it raises an
+                       HTTP 404 error; if the document id or time range is invalid, an HTTP 400 error.
+    """
+    try:
+        clip = await audio_clip(document_id, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except MissingAudio as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if clip is None:
+        raise HTTPException(status_code=404, detail=f"Document '{document_id}' not found.")
+
+    wav_bytes, filename = clip
+    clip_name = f"{filename.rsplit('.', 1)[0]}_{start:.2f}-{end:.2f}.wav"
+    return Response(
+        content=wav_bytes,
+        media_type="audio/wav",
+        # RFC 5987 encoding, since file names may hold any character
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(clip_name)}"},
+    )
+
+"""
+======================
+This module defines the routes of the read path of the corpus.
+
+Main Components:
+- `export_endpoint`: A GET endpoint streaming every document, or every word, as NDJSON.
+- `clip_endpoint`: A GET endpoint returning the audio between two timestamps of a document.
+
+Key Points:
+- The export is streamed from a database cursor, so it runs in constant memory whatever the
+  size of the corpus; pass the last `document_id` received as `after` to resume it.
+- Clips of WAV files are cut with ranged GridFS reads, so only the chunks holding the clip
+  are fetched. Combined with the `start`/`end` of the exported words or of search hits,
+  this extracts the audio of any word without downloading its recording.
+
+Example of Usage:
+=================
+    curl "http://127.0.0.1:8000/api/export/?per_word=true" > words.ndjson
+    curl "http://127.0.0.1:8000/api/documents/<document_id>/clip?start=1.24&end=1.58" -o hello.wav
+"""
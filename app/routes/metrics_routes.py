@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Response
+
+from app.services.metrics import render_metrics
+
+# Create the APIRouter instance for monitoring routes
+router = APIRouter()
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    """
+    Endpoint exposing the service metrics in the Prometheus text format.
+
+    Returns:
+        Response: The metrics payload, to be scraped by Prometheus.
+    """
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+"""
+======================
+This module defines the monitoring routes of the API.
+
+Main Components:
+- `metrics_endpoint`: A GET endpoint returning the Prometheus metrics defined in
+  `app.services.metrics` (stage latencies, audio seconds processed, real-time factor,
+  queue depth and peak memory).
+
+Example of Usage:
+=================
+    curl "http://127.0.0.1:8000/metrics"
+"""
@@ -0,0 +1,124 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app import config
+from app.services.search import search_words, search_tokens, search_phonemes
+
+# Create the APIRouter instance for search routes
+router = APIRouter()
+
+# Page size used when the request does not give one
+DEFAULT_PAGE_SIZE: int = 50
+
+@router.get("/search/words/")
+async def search_words_endpoint(
+    q: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=config.SEARCH_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+):
+    """
+    Endpoint to find the occurrences of a word across the stored documents.
+
+    Args:
+        q (str): The word to find; case and surrounding punctuation are ignored.
+        limit (int): The maximum number of hits per page.
+        after (Optional[str]): The `next` cursor of the previous page.
+
+    Returns:
+        dict: The `results` (file, timestamps, token id, phonemes and context of each hit)
+              and the `next` cursor.
+
+    Raises:
+        HTTPException: If the query or cursor is invalid, it raises an HTTP 400 error.
+    """
+    try:
+        return await search_words(q, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/search/tokens/{token_id}")
+async def search_tokens_endpoint(
+    token_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=config.SEARCH_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+):
+    """
+    Endpoint to find the words transcribed with a given Whisper token id.
+
+    Args:
+        token_id (int): The token id to find.
+        limit (int): The maximum number of hits per page.
+        after (Optional[str]): The `next` cursor of the previous page.
+
+    Returns:
+        dict: The `results` and the `next` cursor.
+
+    Raises:
+        HTTPException: If the cursor is invalid, it raises an HTTP 400 error.
+    """
+    try:
+        return await search_tokens(token_id, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/search/phonemes/")
+async def search_phonemes_endpoint(
+    q: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=config.SEARCH_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+):
+    """
+    Endpoint to find the words whose phonemes contain a given phoneme sequence.
+
+    Args:
+        q (str): The phoneme sequence, e.g. `həl`.
+        limit (int): The maximum number of hits per page.
+        after (Optional[str]): The `next` cursor of the previous page.
+
+    Returns:
+        dict: The `results` and the `next` cursor.
+
+    Raises:
+        HTTPException: If the query or cursor is invalid, it raises an HTTP 400 error.
+    """
+    try:
+        return await search_phonemes(q, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+"""
+======================
+This module defines the search routes of the API, backed by the `word_postings` index.
+
+Main Components:
+- `search_words_endpoint`: A GET endpoint finding the occurrences of a word.
+- `search_tokens_endpoint`: A GET endpoint finding the occurrences of a Whisper token id.
+- `search_phonemes_endpoint`: A GET endpoint finding the words containing a phoneme sequence.
+
+Every response holds up to `limit` hits (at most `SEARCH_MAX_PAGE_SIZE`) and a `next`
+cursor; pass it as `after` to read the following page.
+
+Example of Usage:
+=================
+    curl "http://127.0.0.1:8000/api/search/words/?q=hello&limit=20"
+    curl "http://127.0.0.1:8000/api/search/tokens/31373"
+    curl "http://127.0.0.1:8000/api/search/phonemes/?q=həl&after=<next>"
+
+Expected Response:
+    {
+        "results": [
+            {
+                "document_id": "...",
+                "file": "interview.wav",
+                "word": "Hello,",
+                "start": 1.24,
+                "end": 1.58,
+                "token_id": 31373,
+                "phoneme": "həloʊ",
+                "context": {"before": "and then I said", "after": "how are you?"}
+            }
+        ],
+        "next": "..."
+    }
+"""
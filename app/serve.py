@@ -0,0 +1,220 @@
+import argparse
+import gc
+import math
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import torch
+import uvicorn
+
+from app import config
+from app.services.model_registry import get_models, load_models, warm_up
+
+# A worker exiting sooner than this after it started is a crash loop, not a one-off failure
+MIN_WORKER_UPTIME_SECONDS: float = 10.0
+
+def thread_budget(workers: int, cores: Optional[int] = None) -> dict:
+    """
+    Splits the cores of the machine among the serving workers.
+
+    Args:
+        workers (int): The number of serving worker processes.
+        cores (Optional[int]): The number of cores. Defaults to `os.cpu_count()`.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'worker': Torch intra-op threads of each worker process.
+            - 'stage': Threads of each stage (`TRANSCRIBER_THREADS` / `PHONEMIZER_THREADS`),
+              a share of the worker's cores for each of its `WORKER_POOL_SIZE` pipeline threads.
+    """
+    cores = cores or os.cpu_count() or 1
+    per_worker = max(1, cores // max(1, workers))
+    per_pipeline = max(1, per_worker // max(1, config.WORKER_POOL_SIZE))
+    return {'worker': per_worker, 'stage': max(1, per_pipeline // 2)}
+
+def _serve_worker(server_config: uvicorn.Config, sockets: list, threads: int) -> None:
+    """
+    Body of a forked worker: warms the inherited models up and serves requests until stopped.
+    """
+    # Own process group, so a Ctrl+C in the terminal reaches the parent only, which stops the workers once
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    torch.set_num_threads(threads)
+    # The parent never ran inference, so this starts the thread pools of this worker
+    warm_up(get_models())
+    uvicorn.Server(server_config).run(sockets=sockets)
+
+def serve(host: str, port: int, workers: int, log_level: str = 'info') -> int:
+    """
+    Loads the models once and serves the application from forked worker processes.
+
+    The models are loaded in this process before forking, so every worker shares their
+    weights through copy-on-write memory instead of loading its own copy. The listening
+    socket is bound here too, and shared by the workers. Workers that exit are replaced
+    by new ones forked from this process, which still holds the models.
+
+    With several workers, the Prometheus metrics are aggregated across them through a
+    `PROMETHEUS_MULTIPROC_DIR` directory, and `ADMISSION_MAX_QUEUE` is split among them.
+
+    Args:
+        host (str): The address to listen on.
+        port (int): The port to listen on.
+        workers (int): The number of worker processes.
+        log_level (str, optional): The uvicorn log level. Defaults to 'info'.
+
+    Returns:
+        int: The exit status: 0 after a requested shutdown, 1 if the workers keep crashing.
+    """
+    metrics_dir = None
+    if workers > 1 and 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        # Must be set before prometheus_client is first imported, here or in the workers
+        metrics_dir = tempfile.mkdtemp(prefix='mxesco-metrics-')
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = metrics_dir
+    # Each worker admits uploads for its own pipeline threads, and queues its share of the limit
+    config.ADMISSION_MAX_QUEUE = max(1, math.ceil(config.ADMISSION_MAX_QUEUE / workers))
+
+    budget = thread_budget(workers)
+    # Each worker runs the pipeline in threads, on the models inherited from this process
+    config.WORKER_POOL = 'thread'
+    if 'TRANSCRIBER_THREADS' not in os.environ:
+        config.TRANSCRIBER_THREADS = budget['stage']
+    if 'PHONEMIZER_THREADS' not in os.environ:
+        config.PHONEMIZER_THREADS = budget['stage']
+
+    # With a single thread, no OpenMP thread pool is started here; one started before
+    # forking would deadlock the first parallel region of every worker
+    torch.set_num_threads(1)
+    load_models(warm=False)
+    # Move the objects created so far out of the collector's reach: collections would
+    # otherwise write to their headers and copy the pages holding them into every worker
+    gc.collect()
+    gc.freeze()
+
+    server_config = uvicorn.Config('app.main:app', host=host, port=port, log_level=log_level)
+    sockets = [server_config.bind_socket()]
+    print(
+        f"Serving on {host}:{port} with {workers} workers, {budget['worker']} torch threads each.",
+        file=sys.stderr,
+    )
+
+    children: dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                _serve_worker(server_config, sockets, budget['worker'])
+            except BaseException as e:
+                print(f"Worker {os.getpid()} failed: {e}", file=sys.stderr)
+                status = 1
+            finally:
+                # Never return into the code of the parent
+                os._exit(status)
+        children[pid] = time.monotonic()
+
+    def stop(signum: int, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        spawn()
+
+    status = 0
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            # Imported after the directory is set, so the values are written to it
+            from prometheus_client import multiprocess
+            # Drop the live gauges (queue depths) of the exited worker
+            multiprocess.mark_process_dead(pid)
+        if stopping or started is None:
+            continue
+        if time.monotonic() - started < MIN_WORKER_UPTIME_SECONDS:
+            print(f"Worker {pid} exited right after starting; stopping.", file=sys.stderr)
+            status = 1
+            stop(signal.SIGTERM, None)
+            continue
+        print(f"Worker {pid} exited; starting a new one.", file=sys.stderr)
+        spawn()
+
+    for sock in sockets:
+        sock.close()
+    if metrics_dir is not None:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    return status
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the API from worker processes that share one copy of the models.")
+    parser.add_argument('--host', default='0.0.0.0', help="Address to listen on.")
+    parser.add_argument('--port', type=int, default=8000, help="Port to listen on.")
+    parser.add_argument('--workers', type=int, default=config.SERVE_WORKERS, help="Worker processes.")
+    parser.add_argument('--log-level', default='info', help="Uvicorn log level.")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1.")
+    if config.PHONEMIZER_BACKEND == 'onnx':
+        # ONNX Runtime sessions own thread pools, which do not survive a fork
+        parser.error("Pre-fork serving does not support PHONEMIZER_BACKEND=onnx; use 'torch' or 'quantized'.")
+
+    return serve(args.host, args.port, args.workers, args.log_level)
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+"""
+======================
+This module is the pre-fork entry point of the web application: the models are loaded once
+in a parent process, which then forks the uvicorn workers. The weights are never written
+after loading, so the workers share the parent's copy of them through copy-on-write memory,
+and each additional worker costs its activations and Python state instead of a full copy of
+Whisper and Wav2Vec2.
+
+Main Components:
+- `serve`: Loads the models, binds the socket, forks the workers and replaces those that exit.
+- `thread_budget`: Splits the cores among the workers and their pipeline threads.
+
+Workflow:
+1. The parent loads the models without running them (`load_models(warm=False)`) and freezes
+   the garbage collector, so the pages holding the models stay shared.
+2. It binds the listening socket and forks `--workers` processes, which accept connections
+   on it in turn.
+3. Each worker sets its torch thread count to its share of the cores, warms the inherited
+   models up, and serves the application with the pipeline in a thread pool (`WORKER_POOL=thread`).
+4. SIGTERM or Ctrl+C stops the workers gracefully, and then the parent.
+
+Notes:
+- Models are shared with the `torch` and `quantized` backends. The `onnx` phonemizer backend
+  is not supported, since ONNX Runtime sessions do not survive a fork.
+- Job status is stored in MongoDB, so a job can be polled from any worker.
+- Prometheus metrics are written by every worker to `PROMETHEUS_MULTIPROC_DIR` (a temporary
+  directory unless set) and aggregated by whichever worker is scraped.
+- Each worker admits uploads for its own `WORKER_POOL_SIZE` pipeline threads, which run on
+  its share of the cores, and queues at most `ADMISSION_MAX_QUEUE / workers` of them, so the
+  limit holds for the whole server. The result cache is kept per worker.
+
+Example Usage:
+======================
+    python -m app.serve --workers 6
+    SERVE_WORKERS=6 WORKER_POOL_SIZE=1 python -m app.serve --port 8080
+"""
@@ -0,0 +1,333 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from typing import Optional
+
+import torchaudio
+
+from app import config
+from app.services.metrics import ADMISSION_QUEUE, ADMISSION_REJECTED
+from app.utils.wav import read_wav_header
+
+# Number of recent jobs kept to compute the queue-wait statistics
+STATS_WINDOW: int = 1000
+# Assumed bitrate of files whose duration cannot be read without decoding them (128 kbit/s)
+FALLBACK_BYTES_PER_SECOND: float = 16000.0
+# Weight of the latest job in the running estimate of the real-time factor
+RTF_SMOOTHING: float = 0.2
+
+class Overloaded(Exception):
+    """
+    Raised when a job is not admitted because the server is saturated.
+
+    Args:
+        message (str): The reason of the rejection.
+        retry_after (int): The seconds after which the job would likely be admitted.
+    """
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def audio_duration(path: str) -> float:
+    """
+    Estimates the duration of an audio file without decoding it.
+
+    WAV headers are parsed directly; other formats are read with `torchaudio.info`. When the
+    container does not record its length, the duration is estimated from the file size.
+
+    Args:
+        path (str): The path of the audio file, e.g. a spooled upload.
+
+    Returns:
+        float: The duration in seconds.
+    """
+    with open(path, 'rb') as source:
+        header = read_wav_header(source)
+    if header is not None and header['block_align'] and header['sample_rate']:
+        return header['data_size'] / header['block_align'] / header['sample_rate']
+
+    try:
+        info = torchaudio.info(path)
+        if info.num_frames > 0 and info.sample_rate > 0:
+            return info.num_frames / info.sample_rate
+    except Exception:
+        # Unreadable files are admitted by size; decoding them fails in the worker anyway
+        pass
+    return os.path.getsize(path) / FALLBACK_BYTES_PER_SECOND
+
+class AdmissionController:
+    """
+    Admits uploads according to their estimated cost and dispatches them shortest first.
+
+    Every upload is admitted with the duration of its audio, converted into an estimated
+    processing time (its cost) with the measured real-time factor. At most `slots` jobs run at
+    once; the others wait in a priority queue ordered by cost, where every second spent
+    waiting lowers the priority by `aging_rate` seconds of cost, so long files are delayed by
+    short clips but never starved. A job is rejected with `Overloaded` when the queue is full,
+    or when the work that would run before it exceeds `max_wait_seconds`.
+
+    Must be used from the event loop.
+
+    Args:
+        slots (int): The number of jobs run at once, i.e. the number of pipeline workers.
+        max_queue (int): Maximum number of waiting jobs.
+        max_wait_seconds (float): Maximum projected wait of an admitted job, in seconds.
+        aging_rate (float): Seconds of cost forgiven per second of waiting.
+        real_time_factor (float): Processing seconds per second of audio until measured.
+    """
+
+    def __init__(self, slots: int, max_queue: int, max_wait_seconds: float, aging_rate: float, real_time_factor: float):
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.aging_rate = aging_rate
+        self.real_time_factor = real_time_factor
+
+        # Waiting tickets as (priority, sequence, ticket); cancelled ones are skipped when popped
+        self._heap: list = []
+        self._sequence = itertools.count()
+        self._queued = 0
+        # Dispatched tickets, by identity
+        self._running: dict[int, dict] = {}
+        self._admitted = 0
+        self._rejected = 0
+        self._queue_waits: deque = deque(maxlen=STATS_WINDOW)
+
+    def _priority(self, cost: float, enqueued: float) -> float:
+        # cost - aging_rate * (now - enqueued) orders the tickets the same way at any time `now`,
+        # so the key can be fixed when the ticket is queued
+        return cost + self.aging_rate * enqueued
+
+    def _remaining(self, now: float) -> float:
+        return sum(max(0.0, ticket['cost'] - (now - ticket['started'])) for ticket in self._running.values())
+
+    def projected_wait(self, cost: float) -> float:
+        """
+        Estimates how long a new job of a given cost would wait before it runs.
+
+        Args:
+            cost (float): The estimated processing time of the job, in seconds.
+
+        Returns:
+            float: The remaining work of the running jobs and of the waiting jobs that would
+                   run before it, spread over the slots, in seconds; 0 if a slot is free.
+        """
+        if len(self._running) < self.slots and not self._queued:
+            return 0.0
+        now = time.monotonic()
+        priority = self._priority(cost, now)
+        ahead = sum(
+            ticket['cost'] for key, _, ticket in self._heap
+            if key <= priority and not ticket['cancelled']
+        )
+        return (self._remaining(now) + ahead) / self.slots
+
+    def admit(self, duration: float, reject: bool = True) -> dict:
+        """
+        Admits a job and queues it for a slot.
+
+        Args:
+            duration (float): The duration of the audio to process, in seconds.
+            reject (bool, optional): If false, the job is queued even when the server is
+                                     saturated, e.g. for work already accepted by other
+                                     limits (batch groups, windows of a live stream).
+                                     Defaults to True.
+
+        Returns:
+            dict: The ticket of the job, to pass to `acquire` and `release`.
+
+        Raises:
+            Overloaded: If `reject` is set and the queue is full or the projected wait exceeds
+                        `max_wait_seconds`.
+        """
+        cost = duration * self.real_time_factor
+        wait = self.projected_wait(cost)
+        if reject and self._queued >= self.max_queue:
+            self._reject()
+            # A queue position frees up when the first running job finishes
+            now = time.monotonic()
+            first_done = min((ticket['cost'] - (now - ticket['started']) for ticket in self._running.values()), default=1.0)
+            raise Overloaded(f"The queue is full ({self._queued} jobs waiting).", max(1, math.ceil(first_done)))
+        if reject and wait > self.max_wait_seconds:
+            self._reject()
+            raise Overloaded(
+                f"The server is busy: the upload would wait about {wait:.0f} s.",
+                max(1, math.ceil(wait - self.max_wait_seconds)),
+            )
+
+        now = time.monotonic()
+        ticket = {
+            'duration': duration,
+            'cost': cost,
+            'enqueued': now,
+            'started': None,
+            'acquired': None,
+            'cancelled': False,
+            'released': False,
+            'granted': asyncio.get_running_loop().create_future(),
+        }
+        heapq.heappush(self._heap, (self._priority(cost, now), next(self._sequence), ticket))
+        self._queued += 1
+        self._admitted += 1
+        self._dispatch()
+        return ticket
+
+    def _reject(self) -> None:
+        self._rejected += 1
+        ADMISSION_REJECTED.inc()
+
+    def _dispatch(self) -> None:
+        # Grant the free slots to the waiting tickets of lowest priority
+        while len(self._running) < self.slots and self._heap:
+            _, _, ticket = heapq.heappop(self._heap)
+            if ticket['cancelled']:
+                continue
+            self._queued -= 1
+            ticket['started'] = time.monotonic()
+            self._queue_waits.append(ticket['started'] - ticket['enqueued'])
+            self._running[id(ticket)] = ticket
+            ticket['granted'].set_result(None)
+        ADMISSION_QUEUE.set(self._queued)
+
+    async def acquire(self, ticket: dict) -> None:
+        """
+        Waits until the job of a ticket may run. Returns at once if it already may.
+        """
+        await asyncio.shield(ticket['granted'])
+        if ticket['acquired'] is None:
+            ticket['acquired'] = time.monotonic()
+
+    def release(self, ticket: dict) -> None:
+        """
+        Frees the slot of a job, or withdraws it from the queue if it was not dispatched yet.
+
+        Safe to call more than once. The processing time of jobs that ran (between `acquire`
+        and the first `release`) updates the estimate of the real-time factor.
+        """
+        if ticket['released']:
+            return
+        ticket['released'] = True
+
+        if ticket['started'] is None:
+            ticket['cancelled'] = True
+            self._queued -= 1
+        else:
+            del self._running[id(ticket)]
+            if ticket['acquired'] is not None and ticket['duration'] > 0:
+                measured = (time.monotonic() - ticket['acquired']) / ticket['duration']
+                self.real_time_factor += RTF_SMOOTHING * (measured - self.real_time_factor)
+        self._dispatch()
+
+    def stats(self) -> dict:
+        """
+        Returns admission statistics for tuning the limits.
+
+        Returns:
+            dict: A dictionary containing:
+                - 'admitted' / 'rejected': Total number of admitted and rejected jobs.
+                - 'running' / 'queued': The jobs currently running and waiting.
+                - 'real_time_factor': The current estimate of processing seconds per second of audio.
+                - 'projected_wait_seconds': The wait of a new job of zero cost.
+                - 'queue_wait_seconds': Mean, p50, p95 and max queue wait over the recent jobs.
+        """
+        waits = sorted(self._queue_waits)
+
+        def percentile(p: float) -> float:
+            return waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+
+        return {
+            'admitted': self._admitted,
+            'rejected': self._rejected,
+            'running': len(self._running),
+            'queued': self._queued,
+            'real_time_factor': self.real_time_factor,
+            'projected_wait_seconds': self.projected_wait(0.0),
+            'queue_wait_seconds': {
+                'mean': sum(waits) / len(waits) if waits else 0.0,
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'max': waits[-1] if waits else 0.0,
+            },
+        }
+
+# Process-wide controller, created on first use
+_controller: Optional[AdmissionController] = None
+
+def get_admission() -> Optional[AdmissionController]:
+    """
+    Returns the process-wide admission controller, creating it on first use.
+
+    Returns:
+        Optional[AdmissionController]: The controller, or None if `ADMISSION_CONTROL` is disabled.
+    """
+    global _controller
+    if not config.ADMISSION_CONTROL:
+        return None
+    if _controller is None:
+        _controller = AdmissionController(
+            slots=config.WORKER_POOL_SIZE,
+            max_queue=config.ADMISSION_MAX_QUEUE,
+            max_wait_seconds=config.ADMISSION_MAX_WAIT_SECONDS,
+            aging_rate=config.ADMISSION_AGING_RATE,
+            real_time_factor=config.ADMISSION_INITIAL_RTF,
+        )
+    return _controller
+
+def admission_stats() -> dict:
+    """
+    Returns the statistics of the process-wide admission controller.
+
+    Returns:
+        dict: The output of `AdmissionController.stats`, or an empty dictionary if admission
+              control is disabled or no upload was admitted yet.
+    """
+    return _controller.stats() if _controller is not None else {}
+
+"""
+======================
+This module implements cost-aware admission control for uploads. Without it, every upload
+is handed to the worker pool at once, so a burst of long recordings queues up in front of
+every short clip, and memory and latency grow with the burst.
+
+Main Components:
+- `audio_duration`: Reads the duration of a spooled upload from its header, without decoding it.
+- `AdmissionController`: Bounded shortest-job-first queue in front of the worker pool.
+- `Overloaded`: Raised for rejected uploads; the routes answer HTTP 429 with `Retry-After`.
+- `get_admission` / `admission_stats`: The process-wide controller and its statistics.
+
+Workflow:
+1. The route looks the content key of the upload up; uploads already processed are answered
+   from the stored result and never admitted.
+2. For the others, it reads the duration of the upload and calls `admit`, which rejects it if
+   the queue is full or if it would wait more than `ADMISSION_MAX_WAIT_SECONDS`.
+3. `handle_upload` awaits `acquire`, which returns when the job is dispatched, and runs it
+   in the worker pool.
+4. `release` frees the slot and dispatches the next job of lowest priority.
+
+Notes:
+- The projected wait of a job only counts the jobs that would run before it, so short clips
+  are still admitted (and served quickly) while long recordings are rejected under load.
+- Priorities age by `ADMISSION_AGING_RATE` seconds of cost per second of waiting: a long
+  recording runs before a new short clip once it has waited for the difference of their costs.
+- The real-time factor starts at `ADMISSION_INITIAL_RTF` and follows the measured processing times.
+- Batch uploads are queued one ticket per `BATCH_GROUP_SIZE` group, costed by the summed
+  duration of its files, and every window of a live stream is queued too, so all the work
+  of the worker pool is counted in the projected waits and ordered shortest first. They are
+  never rejected: batches are bounded by `MAX_BATCH_FILES` / `MAX_BATCH_BYTES` instead.
+- The ingest CLI (`app.cli`) runs its own worker processes, outside of the web server.
+
+Example Usage:
+======================
+    admission = get_admission()
+    ticket = admission.admit(await run_in_threadpool(audio_duration, path))
+    try:
+        await admission.acquire(ticket)
+        json_data = await run_in_pool(process_audio, path, filename)
+    finally:
+        admission.release(ticket)
+"""
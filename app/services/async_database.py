@@ -0,0 +1,533 @@
+import asyncio
+import io
+from typing import BinaryIO, Optional, Union
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket, AsyncIOMotorGridIn, AsyncIOMotorGridOut
+from pymongo import ReturnDocument
+from pymongo.errors import AutoReconnect, BulkWriteError, DuplicateKeyError
+
+from app import config
+from app.services.cache import audio_digest, result_cache
+from app.utils.columnar import document_words, encode_document_words
+from app.utils.postings import POSTING_INDEXES, build_postings
+from app.utils.timing import timed
+
+# Error code reported by MongoDB for unique index violations
+DUPLICATE_KEY_ERROR: int = 11000
+
+# Process-wide client, created on first use inside the event loop
+_client: Optional[AsyncIOMotorClient] = None
+
+def get_async_db():
+    """
+    Returns the `mxesco` database through a pooled asynchronous client.
+
+    Returns:
+        AsyncIOMotorDatabase: The database configured by `MONGO_URI` and `MONGO_DATABASE`.
+    """
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(config.MONGO_URI, maxPoolSize=config.MONGO_MAX_POOL_SIZE)
+    return _client[config.MONGO_DATABASE]
+
+async def ensure_indexes_async() -> None:
+    """
+    Creates the indexes used for content-addressed lookups. Safe to call repeatedly.
+    """
+    db = get_async_db()
+    await db.documents.create_index(
+        'content_key',
+        unique=True,
+        partialFilterExpression={'content_key': {'$exists': True}},
+    )
+    await db.fs.files.create_index(
+        'sha256',
+        unique=True,
+        partialFilterExpression={'sha256': {'$exists': True}},
+    )
+    await db.word_postings.create_indexes(POSTING_INDEXES)
+
+async def find_document_async(content_key: str) -> Optional[str]:
+    """
+    Looks up a stored document by content key.
+
+    Args:
+        content_key (str): The key returned by `content_key`.
+
+    Returns:
+        Optional[str]: The identifier of the stored document, or None if there is none.
+    """
+    document = await get_async_db().documents.find_one({'content_key': content_key}, projection={'_id': 1})
+    return str(document['_id']) if document else None
+
+async def get_document_async(document_id: str, as_rows: bool = True) -> Optional[dict]:
+    """
+    Reads a stored document.
+
+    Args:
+        document_id (str): The identifier of the document.
+        as_rows (bool, optional): If true, words stored in columnar format are rebuilt into the
+                                  `words` list of dictionaries. Defaults to True.
+
+    Returns:
+        Optional[dict]: The document, or None if there is none.
+    """
+    document = await get_async_db().documents.find_one({'_id': ObjectId(document_id)})
+    if document is not None and as_rows and 'words_columnar' in document:
+        document['words'] = document_words(document)
+        del document['words_columnar']
+    return document
+
+async def _read_chunk(source: BinaryIO) -> bytes:
+    """
+    Reads the next chunk of an audio source; files are read in a thread, off the event loop.
+    """
+    if isinstance(source, io.BytesIO):
+        return source.read(config.UPLOAD_CHUNK_BYTES)
+    return await asyncio.to_thread(source.read, config.UPLOAD_CHUNK_BYTES)
+
+async def store_audio_async(source: Union[bytes, BinaryIO], filename: str, digest: str) -> ObjectId:
+    """
+    Streams raw audio into GridFS once per digest, counting the documents that reference it.
+
+    Args:
+        source (Union[bytes, BinaryIO]): The raw audio, as bytes or a binary file object.
+        filename (str): The name of the audio file, used for the first upload of the digest.
+        digest (str): The audio digest returned by `audio_digest`.
+
+    Returns:
+        ObjectId: The identifier of the GridFS file holding the audio.
+    """
+    db = get_async_db()
+
+    # Reuse the stored copy if these bytes were uploaded before; a file whose last reference
+    # is being released is never picked up again
+    existing = await db.fs.files.find_one_and_update(
+        {'sha256': digest, 'refcount': {'$gt': 0}},
+        {'$inc': {'refcount': 1}},
+        projection={'_id': 1},
+    )
+    if existing:
+        return existing['_id']
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    file_id = ObjectId()
+    grid_in = AsyncIOMotorGridIn(db.fs, _id=file_id, filename=filename, sha256=digest, refcount=1)
+    try:
+        # Stream the audio piece by piece instead of handing GridFS one large buffer
+        while chunk := await _read_chunk(source):
+            await grid_in.write(chunk)
+        await grid_in.close()
+    except DuplicateKeyError:
+        # A concurrent upload of the same bytes won the race: drop our chunks and share its file,
+        # unless it is an unreferenced copy left by a release, which is deleted first
+        await db.fs.chunks.delete_many({'files_id': file_id})
+        await _delete_released_async({'sha256': digest})
+        source.seek(0)
+        return await store_audio_async(source, filename, digest)
+    return file_id
+
+async def _delete_released_async(query: dict) -> None:
+    """
+    Deletes the GridFS file matching a query if no document references it any more.
+
+    The reference count is checked by the delete itself, so a file referenced again in the
+    meantime is kept.
+    """
+    db = get_async_db()
+    file = await db.fs.files.find_one_and_delete({**query, 'refcount': {'$lte': 0}}, projection={'_id': 1})
+    if file is not None:
+        await db.fs.chunks.delete_many({'files_id': file['_id']})
+
+async def release_audio_async(file_id: ObjectId) -> None:
+    """
+    Drops one reference to a GridFS audio file, deleting the file when none remain.
+
+    Args:
+        file_id (ObjectId): The identifier returned by `store_audio_async`.
+    """
+    db = get_async_db()
+    file = await db.fs.files.find_one_and_update(
+        {'_id': file_id},
+        {'$inc': {'refcount': -1}},
+        projection={'refcount': 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if file is not None and file.get('refcount', 0) <= 0:
+        await _delete_released_async({'_id': file_id})
+
+async def delete_document_async(document_id: str) -> bool:
+    """
+    Deletes a stored document, its search postings and its reference to the GridFS audio.
+
+    The document's content key is dropped from the result cache of this process, so a new
+    upload of the same audio is processed again.
+
+    Args:
+        document_id (str): The identifier of the document.
+
+    Returns:
+        bool: True if the document existed.
+    """
+    db = get_async_db()
+    document = await db.documents.find_one_and_delete(
+        {'_id': ObjectId(document_id)},
+        projection={'audio.file_id': 1, 'content_key': 1},
+    )
+    if document is None:
+        return False
+    if 'content_key' in document:
+        result_cache.discard(document['content_key'])
+    await db.word_postings.delete_many({'document_id': document['_id']})
+    file_id = document.get('audio', {}).get('file_id')
+    if file_id is not None:
+        await release_audio_async(file_id)
+    return True
+
+async def open_audio_async(file_id: ObjectId) -> AsyncIOMotorGridOut:
+    """
+    Opens a GridFS audio file for reading. Reads fetch only the chunks they cover, so any
+    byte range can be read after a `seek` without downloading the rest of the file.
+
+    Args:
+        file_id (ObjectId): The identifier returned by `store_audio_async`.
+
+    Returns:
+        AsyncIOMotorGridOut: The open file; `read` is a coroutine, `seek` and `length` are not.
+
+    Raises:
+        gridfs.errors.NoFile: If the file does not exist.
+    """
+    return await AsyncIOMotorGridFSBucket(get_async_db()).open_download_stream(file_id)
+
+async def index_words_async(documents: list[dict]) -> None:
+    """
+    Adds the words of stored documents to the `word_postings` search index, in one `insert_many`.
+
+    Postings that already exist are left as they are, so documents can be indexed again safely.
+
+    Args:
+        documents (list[dict]): The stored documents, including their `_id`, in either words format.
+    """
+    postings = [
+        posting
+        for document in documents
+        for posting in build_postings(document['_id'], document['audio']['file'], document_words(document), config.SEARCH_CONTEXT_WORDS)
+    ]
+    if not postings:
+        return
+    try:
+        await get_async_db().word_postings.insert_many(postings, ordered=False)
+    except BulkWriteError as e:
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+
+def _resolve(future: asyncio.Future, result=None, exception: Optional[BaseException] = None) -> None:
+    """
+    Resolves a future unless its waiter has already given up on it.
+    """
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+def _is_duplicate_id(error: dict) -> bool:
+    """
+    Tells whether a write error means the document was already inserted under the same `_id`.
+    """
+    return error['code'] == DUPLICATE_KEY_ERROR and '_id' in error.get('keyPattern', {})
+
+class WriteBehindBuffer:
+    """
+    Buffers document inserts and writes them to MongoDB in `insert_many` batches.
+
+    A background task takes the first buffered document, waits up to `max_wait_ms` for more
+    (or until `batch_size` documents are buffered), and inserts them with a single unordered
+    `insert_many`. Transient connection errors are retried with exponential backoff. Every
+    future is resolved whatever the outcome, and documents that could not be written release
+    their reference to their GridFS audio.
+
+    Args:
+        batch_size (int): Maximum number of documents per `insert_many`.
+        max_wait_ms (float): Maximum time the first document of a batch waits for company.
+        max_retries (int): Retries of a batch after a transient connection error.
+    """
+
+    def __init__(self, batch_size: int, max_wait_ms: float, max_retries: int):
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def insert(self, document: dict, wait: bool = True) -> str:
+        """
+        Buffers a document for insertion into the `documents` collection.
+
+        Args:
+            document (dict): The document to insert. Its `_id` is assigned here if missing.
+            wait (bool, optional): If true, return only once the document is written.
+                                   Defaults to True.
+
+        Returns:
+            str: The identifier of the stored document. If another document with the same
+                 `content_key` was stored first, that document's identifier.
+        """
+        document.setdefault('_id', ObjectId())
+        future = asyncio.get_running_loop().create_future()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        await self._queue.put((document, future))
+        if not wait:
+            future.add_done_callback(self._report_failure)
+            return str(document['_id'])
+        return await future
+
+    async def flush(self) -> None:
+        """
+        Writes every buffered document and stops the background task.
+        """
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+
+    @staticmethod
+    def _report_failure(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Write-behind insert failed: {future.exception()}")
+
+    async def _run(self) -> None:
+        """
+        Main loop of the background task.
+        """
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_wait_ms / 1000
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._write(batch)
+            except Exception as e:
+                # Never let one batch stop the task: later inserts would wait for it forever
+                for _, future in batch:
+                    _resolve(future, exception=e)
+
+    async def _write(self, batch: list[tuple]) -> None:
+        """
+        Writes a batch and resolves the futures of its documents, whatever goes wrong.
+        """
+        try:
+            await self._insert_batch(batch)
+        except Exception as e:
+            # E.g. `DocumentTooLarge` or `OperationFailure`, raised for the batch as a whole
+            await self._recover(batch, e)
+
+    async def _insert_batch(self, batch: list[tuple]) -> None:
+        """
+        Inserts a batch with bounded retries and resolves the futures of its documents.
+
+        Raises:
+            Exception: Any error that is not reported per document, once retries are exhausted.
+        """
+        collection = get_async_db().documents
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            try:
+                await collection.insert_many([document for document, _ in pending], ordered=False)
+                failed = {}
+            except BulkWriteError as e:
+                failed = {error['index']: error for error in e.details['writeErrors']}
+            except AutoReconnect:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(0.1 * 2 ** attempt)
+                continue
+
+            await self._index([
+                document for index, (document, _) in enumerate(pending)
+                if index not in failed or _is_duplicate_id(failed[index])
+            ])
+
+            for index, (document, future) in enumerate(pending):
+                error = failed.get(index)
+                try:
+                    if error is None or _is_duplicate_id(error):
+                        # Written now, or by an earlier attempt whose acknowledgement was lost
+                        _resolve(future, str(document['_id']))
+                    elif error['code'] == DUPLICATE_KEY_ERROR and 'content_key' in error.get('keyPattern', {}):
+                        # The same content was stored concurrently: keep that document
+                        await release_audio_async(document['audio']['file_id'])
+                        _resolve(future, await find_document_async(document['content_key']))
+                    else:
+                        await self._fail(document, future, RuntimeError(error.get('errmsg', 'Insert failed.')))
+                except Exception as e:
+                    _resolve(future, exception=e)
+            return
+
+    async def _recover(self, batch: list[tuple], error: Exception) -> None:
+        """
+        Resolves the documents of a batch whose `insert_many` failed as a whole.
+
+        Part of the batch may have been written before the error, so the documents found in
+        the collection succeed. If several others remain, they are written one by one, so a
+        single invalid document (e.g. over the 16 MB limit) only fails itself.
+        """
+        unresolved = [(document, future) for document, future in batch if not future.done()]
+        try:
+            cursor = get_async_db().documents.find(
+                {'_id': {'$in': [document['_id'] for document, _ in unresolved]}},
+                projection={'_id': 1},
+            )
+            stored = {document['_id'] for document in await cursor.to_list(length=None)}
+        except Exception:
+            # Whether the documents were written is unknown, so their audio is kept
+            for _, future in unresolved:
+                _resolve(future, exception=error)
+            return
+
+        written = [(document, future) for document, future in unresolved if document['_id'] in stored]
+        remaining = [(document, future) for document, future in unresolved if document['_id'] not in stored]
+        await self._index([document for document, _ in written])
+        for document, future in written:
+            _resolve(future, str(document['_id']))
+
+        if len(remaining) > 1:
+            for item in remaining:
+                await self._write([item])
+        else:
+            for document, future in remaining:
+                await self._fail(document, future, error)
+
+    @staticmethod
+    async def _index(documents: list[dict]) -> None:
+        if config.SEARCH_INDEXING and documents:
+            try:
+                await index_words_async(documents)
+            except Exception as e:
+                # The documents are stored; `rebuild_word_postings` can index them later
+                print(f"Could not index the words of {len(documents)} documents: {e}")
+
+    @staticmethod
+    async def _fail(document: dict, future: asyncio.Future, error: Exception) -> None:
+        """
+        Fails the insert of a document that was not written, dropping its reference to its audio.
+        """
+        try:
+            await release_audio_async(document['audio']['file_id'])
+        except Exception as e:
+            print(f"Could not release the audio of document {document['_id']}: {e}")
+        _resolve(future, exception=error)
+
+# Process-wide buffer, created on first use inside the event loop
+_buffer: Optional[WriteBehindBuffer] = None
+
+def get_write_buffer() -> WriteBehindBuffer:
+    """
+    Returns the process-wide write-behind buffer.
+    """
+    global _buffer
+    if _buffer is None:
+        _buffer = WriteBehindBuffer(
+            batch_size=config.WRITE_BATCH_SIZE,
+            max_wait_ms=config.WRITE_BATCH_MAX_WAIT_MS,
+            max_retries=config.WRITE_MAX_RETRIES,
+        )
+    return _buffer
+
+async def save_to_database_async(json_data: dict, audio: Union[bytes, BinaryIO], timings: Optional[dict] = None) -> str:
+    """
+    Saves processed audio data and its metadata to MongoDB without blocking the event loop.
+
+    The raw audio is streamed into GridFS (once per digest), and the document is handed to
+    the write-behind buffer, which groups concurrent inserts into `insert_many` batches.
+
+    Args:
+        json_data (dict): A dictionary containing metadata and transcription data for the audio file.
+        audio (Union[bytes, BinaryIO]): The raw audio file, as bytes or a binary file object.
+        timings (Optional[dict]): If given, the wall times of the `gridfs_put` and `db_write`
+                                  steps are added to it, in seconds.
+
+    Returns:
+        str: The identifier of the stored document.
+    """
+    timings = timings if timings is not None else {}
+    audio_info = json_data['audio']
+    # The digest is usually known already; hashing it again reads the whole file, in a thread
+    if 'sha256' not in audio_info:
+        audio_info['sha256'] = await asyncio.to_thread(audio_digest, audio)
+    digest = audio_info['sha256']
+
+    # Stream raw audio into GridFS, deduplicated by digest
+    with timed(timings, 'gridfs_put'):
+        audio_info['file_id'] = await store_audio_async(audio, audio_info['file'], digest)
+
+    # Insert metadata and transcription data through the write-behind buffer
+    with timed(timings, 'db_write'):
+        if config.WORDS_STORAGE == 'columnar':
+            encode_document_words(json_data)
+        return await get_write_buffer().insert(json_data, wait=config.WRITE_ACKNOWLEDGE)
+
+async def close_async_database() -> None:
+    """
+    Flushes the write-behind buffer and closes the client. Called on application shutdown.
+    """
+    global _client, _buffer
+    if _buffer is not None:
+        await _buffer.flush()
+        _buffer = None
+    if _client is not None:
+        _client.close()
+        _client = None
+
+"""
+======================
+This module provides the asynchronous persistence layer used by the web application. It
+shares one pooled Motor client per process and batches document inserts behind a
+write-behind buffer, so ingest bursts are not throttled by one round trip per document.
+
+Main Components:
+- `get_async_db`: Returns the database through the pooled client (`MONGO_URI`, `MONGO_MAX_POOL_SIZE`).
+- `find_document_async`: Looks up a stored document by content key.
+- `get_document_async`: Reads a document, rebuilding columnar words into the list-of-dictionaries form.
+- `store_audio_async` / `release_audio_async`: Streamed, deduplicated, reference-counted GridFS storage.
+- `open_audio_async`: Opens a stored audio file for ranged reads.
+- `delete_document_async`: Deletes a document, its search postings, and its reference to the audio.
+- `WriteBehindBuffer`: Groups inserts into `insert_many` batches with bounded retries, and
+  indexes the words of each batch for search with one more `insert_many`.
+- `index_words_async`: Adds the words of stored documents to the `word_postings` search index.
+- `save_to_database_async`: Stores the audio and buffers the document.
+- `close_async_database`: Flushes pending writes and closes the client on shutdown.
+
+Notes:
+- Documents and GridFS files have the same format as those written by
+  `app.services.database`, so both layers can be used on the same database.
+- With `WRITE_ACKNOWLEDGE=false`, uploads are answered as soon as their document is
+  buffered; failures after that point are only logged.
+
+Example Usage:
+======================
+    document_id = await save_to_database_async(json_data, audio_bytes)
+    ...
+    await close_async_database()
+"""
@@ -1,118 +1,609 @@
-import io
-from datetime import datetime
-
-from pydub import AudioSegment
-import torch
-import torchaudio
-
-from app.utils.transcription import transcriber
-from app.utils.phonemization import phonemizer
-from app.services.corpus_app import corpus_app
-
-def get_audio_duration(file_path: io.BytesIO, milliseconds: bool = False) -> float:
-	"""
-	Calculate the duration of an audio file.
-
-	Args:
-		file_path (io.BytesIO): The audio file to calculate the duration for.
-		milliseconds (bool): If True, return duration in milliseconds. Defaults to False.
-
-	Returns:
-		float: Duration of the audio file in seconds or milliseconds.
-	"""
-	audio = AudioSegment.from_file(file_path)
-	if milliseconds:
-		duration = len(audio) # Duration in milliseconds
-	else:
-		duration = len(audio) / 1000 # Convert milliseconds to seconds
-	return duration
-
-def waveform_loader(file_path: io.BytesIO) -> tuple[torch.Tensor, int]:
-    """
-    Load the waveform and sample rate from an audio file.
-
-    Args:
-        file_path (io.BytesIO): The audio file to load.
-
-    Returns:
-        tuple[torch.Tensor, int]: A tuple containing the waveform tensor and its sampling rate.
-    """
-    waveform, sample_rate = torchaudio.load(file_path)
-    
-	# Convert stereo to mono if necessary
-    if waveform.shape[0] == 2:
-        waveform = torch.mean(waveform, dim=0, keepdim=True).squeeze()
-    else:
-        waveform = waveform.squeeze()
-    return waveform, sample_rate
-
-def process_audio(audio_bytes: bytes, filename: str) -> dict:
-    """
-    Process an audio file: transcribe, phonemize, and generate metadata.
-
-    Args:
-        audio_bytes (bytes): The raw audio file in bytes format.
-        filename (str): The name of the audio file.
-
-    Returns:
-        dict: A dictionary containing metadata, transcriptions, and phoneme data.
-    """
-    # Convert audio bytes into waveform and sample rate
-    waveform, sample_rate = waveform_loader(io.BytesIO(audio_bytes))
-
-    # Transcribe the audio
-    text_transcription = transcriber(audio=waveform)
-    
-	# Phonemize the audio
-    phoneme_transcription = phonemizer(audio=waveform, sample_rate=sample_rate)
-
-    # Generate a list of words using the corpus application
-    words_list = corpus_app(text_transcription, phoneme_transcription)
-    
-	# Create a JSON-like dictionary with metadata and transcriptions
-    json_dict = {
-        'metadata': {
-            'transcriber_model': 'medium.en',
-            'phonemizer_model': 'facebook/wav2vec2-xlsr-53-espeak-cv-ft',
-            'datetime': datetime.now().strftime('%d/%m/%Y, %H:%M:%S'),
-        },
-        'audio': {
-            'file': filename,
-            'duration': get_audio_duration(io.BytesIO(audio_bytes)),
-            'sampling_rate': sample_rate,
-        },
-        'text_transcription': text_transcription['text'],
-        'words': words_list,
-    }
-    return json_dict
-
-"""
-======================
-This module handles audio file processing, including loading, transcribing, phonemizing, 
-and generating metadata for audio files.
-
-Functions:
-- `get_audio_duration`: Calculates the duration of an audio file in seconds or milliseconds.
-- `waveform_loader`: Converts raw audio bytes into a waveform tensor and retrieves the sample rate.
-- `process_audio`: Processes audio files by transcribing, phonemizing, and generating a JSON-like dictionary with metadata.
-
-External Dependencies:
-- `pydub` for audio duration calculation.
-- `torchaudio` for waveform loading and processing.
-- Custom utilities for transcription (`transcriber`) and phonemization (`phonemizer`).
-- A corpus application (`corpus_app`) to generate word lists.
-
-Example Usage:
-======================
-Process an audio file:
-    audio_bytes = open("example_audio.wav", "rb").read()
-    result = process_audio(audio_bytes, "example_audio.wav")
-
-Expected Output:
-    {
-        "metadata": {...},
-        "audio": {...},
-        "text_transcription": "Transcribed text...",
-        "words": [...]
-    }
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Callable, Optional, Union
+
+import numpy as np
+import torch
+import torchaudio
+
+from app.utils.transcription import transcriber, batched_transcriber
+from app.utils.phonemization import phonemizer, batch_phonemizer, chunked_phonemizer
+from app.utils.timing import timed, peak_rss_mb
+from app.utils.wav import memmap_wav, to_float32
+from app.utils.vad import detect_speech, extract_regions, remap_times, FRAME_SAMPLES
+from app.services.corpus_app import corpus_app
+from app.services.model_registry import get_models
+from app.services.phoneme_batcher import get_batcher
+from app import config
+
+# Sample rate expected by both Whisper and the Wav2Vec2 model
+TARGET_SAMPLE_RATE: int = 16000
+# Length of the audio windows Whisper decodes, in seconds
+WHISPER_WINDOW_SECONDS: float = 30.0
+# Frames of a memory-mapped WAV file converted to mono at a time
+DOWNMIX_BLOCK_FRAMES: int = 1 << 20
+
+# Threads of the concurrent stages, by stage, created on first use (see `stage_executor`)
+_stage_executors: dict[str, ThreadPoolExecutor] = {}
+_stage_lock = threading.Lock()
+
+def get_audio_duration(waveform: torch.Tensor, sample_rate: int, milliseconds: bool = False) -> float:
+    """
+    Calculate the duration of a decoded waveform from its sample count.
+
+    Args:
+        waveform (torch.Tensor): The mono audio waveform.
+        sample_rate (int): The sample rate of the waveform in Hz.
+        milliseconds (bool): If True, return duration in milliseconds. Defaults to False.
+
+    Returns:
+        float: Duration of the audio in seconds or milliseconds.
+    """
+    duration = waveform.shape[-1] / sample_rate
+    if milliseconds:
+        duration *= 1000 # Convert seconds to milliseconds
+    return duration
+
+def _load_mapped_wav(path: str) -> Optional[tuple[torch.Tensor, int]]:
+    """
+    Reads an uncompressed WAV file through a memory map, downmixing it to mono block by block.
+
+    Returns:
+        Optional[tuple[torch.Tensor, int]]: The mono float32 waveform at the file's sample rate,
+                                            and that rate; None if the file cannot be mapped.
+    """
+    mapped = memmap_wav(path)
+    if mapped is None:
+        return None
+    samples, sample_rate = mapped
+
+    # Only the mono output and one block of the file are resident at a time
+    mono = np.empty(samples.shape[0], dtype=np.float32)
+    for start in range(0, samples.shape[0], DOWNMIX_BLOCK_FRAMES):
+        block = to_float32(samples[start:start + DOWNMIX_BLOCK_FRAMES])
+        mono[start:start + block.shape[0]] = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+    return torch.from_numpy(mono), sample_rate
+
+def waveform_loader(file_path: Union[str, BinaryIO]) -> tuple[torch.Tensor, int]:
+    """
+    Decode an audio file once into a contiguous 16 kHz mono float32 waveform.
+
+    The returned tensor is shared by every downstream stage (transcription, phonemization,
+    duration), so the file is decoded a single time and the models never run on more
+    samples than they need.
+
+    Args:
+        file_path (Union[str, BinaryIO]): The path of the audio file, or the file as a binary
+                                          file object. Uncompressed WAV files given by path are
+                                          memory-mapped instead of decoded.
+
+    Returns:
+        tuple[torch.Tensor, int]: A tuple containing the 16 kHz waveform tensor and the
+                                  original sampling rate of the file.
+    """
+    mapped = _load_mapped_wav(file_path) if isinstance(file_path, str) else None
+    if mapped is not None:
+        waveform, sample_rate = mapped
+    else:
+        waveform, sample_rate = torchaudio.load(file_path)
+
+        # Downmix any number of channels to mono before resampling, so only one channel is resampled
+        if waveform.shape[0] > 1:
+            waveform = torch.mean(waveform, dim=0)
+        else:
+            waveform = waveform[0]
+
+    # Resample to the rate the models expect
+    if sample_rate != TARGET_SAMPLE_RATE:
+        waveform = torchaudio.functional.resample(waveform, sample_rate, TARGET_SAMPLE_RATE)
+
+    return waveform.to(torch.float32).contiguous(), sample_rate
+
+def _open_audio(audio: Union[bytes, str]) -> Union[str, BinaryIO]:
+    """
+    Wraps raw bytes in a file object; paths are passed through, so the file is read from disk.
+    """
+    return audio if isinstance(audio, str) else io.BytesIO(audio)
+
+def _limit_threads(num_threads: int) -> None:
+    """
+    Initializer of the stage threads: sets their torch intra-op thread budget once.
+    """
+    torch.set_num_threads(num_threads)
+
+def stage_executor(stage: str) -> ThreadPoolExecutor:
+    """
+    Returns the long-lived threads that run one stage of the pipeline, creating them on first use.
+
+    The thread count of torch is set once, when each stage thread starts, and never changed
+    afterwards: changing it around every call would race with the other stage (and with the
+    other pipelines of a thread pool), since the setting is not reliably local to a thread.
+    Each stage has one thread per pipeline worker of this process, so concurrent requests
+    never wait for each other's stages.
+
+    Args:
+        stage (str): `transcribe` (`TRANSCRIBER_THREADS`) or `phonemize` (`PHONEMIZER_THREADS`).
+
+    Returns:
+        ThreadPoolExecutor: The executor of the stage.
+    """
+    with _stage_lock:
+        if stage not in _stage_executors:
+            budget = {'transcribe': config.TRANSCRIBER_THREADS, 'phonemize': config.PHONEMIZER_THREADS}[stage]
+            _stage_executors[stage] = ThreadPoolExecutor(
+                max_workers=max(1, config.WORKER_POOL_SIZE) if config.WORKER_POOL == "thread" else 1,
+                thread_name_prefix=stage,
+                initializer=_limit_threads,
+                initargs=(budget,),
+            )
+        return _stage_executors[stage]
+
+def speech_regions(waveform: torch.Tensor, sample_rate: int) -> Optional[list[tuple[int, int]]]:
+    """
+    Find the speech regions the models should run on, if voice activity detection is enabled.
+
+    Args:
+        waveform (torch.Tensor): The mono audio waveform.
+        sample_rate (int): The sample rate of the waveform in Hz.
+
+    Returns:
+        Optional[list[tuple[int, int]]]: The `(start, end)` sample ranges of speech (empty if
+                                         there is none), or None if the whole waveform should
+                                         be processed, because VAD is disabled or would skip nothing.
+    """
+    if not config.VAD_ENABLED:
+        return None
+    regions = detect_speech(
+        waveform,
+        sample_rate,
+        margin_db=config.VAD_MARGIN_DB,
+        min_silence_seconds=config.VAD_MIN_SILENCE_SECONDS,
+        padding_seconds=config.VAD_PADDING_SECONDS,
+    )
+    if regions == [(0, waveform.shape[-1])]:
+        return None
+    return regions
+
+def restore_timeline(
+    text_transcription: dict,
+    char_offsets: list[dict],
+    regions: list[tuple[int, int]],
+    sample_rate: int
+) -> list[dict]:
+    """
+    Map the timestamps of models run on the speech regions back to the original recording.
+
+    The segment and word times of the transcription are updated in place, so the silences
+    that were skipped reappear as gaps between words (and as `<pause>` entries later on).
+
+    Args:
+        text_transcription (dict): The Whisper transcription of the concatenated regions.
+        char_offsets (list[dict]): The character offsets of the concatenated regions.
+        regions (list[tuple[int, int]]): The sample ranges returned by `speech_regions`.
+        sample_rate (int): The sample rate of the waveform in Hz.
+
+    Returns:
+        list[dict]: The character offsets in the original timeline.
+    """
+    if not regions:
+        return char_offsets
+
+    segments = text_transcription.get('segments', [])
+    words = [word for segment in segments for word in segment.get('words', [])]
+    for items in (segments, words):
+        if not items:
+            continue
+        starts = remap_times([item['start'] for item in items], regions, sample_rate)
+        ends = remap_times([item['end'] for item in items], regions, sample_rate, is_end=True)
+        for item, start, end in zip(items, starts.tolist(), ends.tolist()):
+            # Whisper reports times with two decimals
+            item['start'], item['end'] = round(start, 2), round(end, 2)
+
+    if not char_offsets:
+        return char_offsets
+    # Offsets count model frames; region starts are frame-aligned, so the mapping is exact
+    frame_seconds = FRAME_SAMPLES / sample_rate
+    starts = remap_times([char['start_offset'] * frame_seconds for char in char_offsets], regions, sample_rate)
+    ends = remap_times([char['end_offset'] * frame_seconds for char in char_offsets], regions, sample_rate, is_end=True)
+    return [
+        {**char, 'start_offset': int(round(start / frame_seconds)), 'end_offset': int(round(end / frame_seconds))}
+        for char, start, end in zip(char_offsets, starts.tolist(), ends.tolist())
+    ]
+
+def transcribe(waveform: torch.Tensor, models: dict) -> dict:
+    """
+    Transcribe a waveform with Whisper, skipping the model when there is no audio.
+
+    With `TRANSCRIPTION_MODE=batched`, recordings longer than one Whisper window are decoded
+    with `batched_transcriber`.
+
+    Args:
+        waveform (torch.Tensor): The mono 16 kHz audio waveform.
+        models (dict): The loaded models, as returned by `load_models`.
+
+    Returns:
+        dict: The transcription, as returned by `transcriber`.
+    """
+    if waveform.shape[-1] == 0:
+        return {'text': '', 'segments': [], 'language': 'en'}
+    # Recordings of a single window have nothing to batch
+    if config.TRANSCRIPTION_MODE == 'batched' and get_audio_duration(waveform, TARGET_SAMPLE_RATE) > WHISPER_WINDOW_SECONDS:
+        return batched_transcriber(waveform, models['whisper'], batch_size=config.TRANSCRIPTION_BATCH_SIZE)
+    return transcriber(audio=waveform, whisper_model=models['whisper'])
+
+def phonemize(waveform: torch.Tensor, sample_rate: int, models: dict) -> list[dict]:
+    """
+    Phonemize a waveform, batching it with concurrent requests when possible.
+
+    Recordings longer than `PHONEME_WINDOW_SECONDS` are phonemized in overlapping windows
+    so that memory stays bounded; shorter ones go through the micro-batching scheduler.
+
+    Args:
+        waveform (torch.Tensor): The mono audio waveform.
+        sample_rate (int): The sample rate of the audio in Hz.
+        models (dict): The loaded models, as returned by `load_models`.
+
+    Returns:
+        list[dict]: The character offsets of the waveform, as returned by `phonemizer`.
+    """
+    if waveform.shape[-1] == 0:
+        return []
+
+    duration = get_audio_duration(waveform, sample_rate)
+    if duration > config.PHONEME_WINDOW_SECONDS:
+        return chunked_phonemizer(
+            audio=waveform,
+            sample_rate=sample_rate,
+            wav2vec_processor=models['wav2vec_processor'],
+            wav2vec_model=models['wav2vec_model'],
+            window_seconds=config.PHONEME_WINDOW_SECONDS,
+            overlap_seconds=config.PHONEME_WINDOW_OVERLAP_SECONDS,
+            batch_size=config.PHONEME_WINDOW_BATCH_SIZE,
+        )
+
+    if config.PHONEME_BATCHING and duration <= config.PHONEME_BATCH_MAX_SECONDS:
+        return get_batcher(models).phonemize(waveform, sample_rate)
+
+    return phonemizer(
+        audio=waveform,
+        sample_rate=sample_rate,
+        wav2vec_processor=models['wav2vec_processor'],
+        wav2vec_model=models['wav2vec_model'],
+    )
+
+def analyze_waveform(waveform: torch.Tensor, models: dict, timings: dict) -> tuple[dict, list[dict], int]:
+    """
+    Run the models on a decoded waveform and align their outputs into words.
+
+    Args:
+        waveform (torch.Tensor): The mono 16 kHz audio waveform.
+        models (dict): The loaded models, as returned by `load_models`.
+        timings (dict): The wall times of the `vad`, `transcribe`, `phonemize` and
+                        `corpus_alignment` stages are added to it, in seconds.
+
+    Returns:
+        tuple[dict, list[dict], int]: The Whisper transcription, the words returned by
+                                      `corpus_app`, and the number of samples the models ran on.
+    """
+    sample_rate = TARGET_SAMPLE_RATE
+
+    def transcribe_stage() -> dict:
+        with timed(timings, 'transcribe'):
+            return transcribe(speech, models)
+
+    def phonemize_stage() -> list[dict]:
+        with timed(timings, 'phonemize'):
+            return phonemize(speech, sample_rate, models)
+
+    # Keep only the speech regions, so the models skip the silence between them
+    with timed(timings, 'vad'):
+        regions = speech_regions(waveform, sample_rate)
+        speech = extract_regions(waveform, regions) if regions is not None else waveform
+
+    if config.CONCURRENT_STAGES:
+        # Transcription and phonemization are independent, so they run at once, each on the
+        # threads of its stage and within its thread budget
+        phoneme_future = stage_executor('phonemize').submit(phonemize_stage)
+        text_transcription = stage_executor('transcribe').submit(transcribe_stage).result()
+        phoneme_transcription = phoneme_future.result()
+    else:
+        # Transcribe the audio
+        text_transcription = transcribe_stage()
+
+        # Phonemize the audio
+        phoneme_transcription = phonemize_stage()
+
+    # Generate a list of words using the corpus application
+    with timed(timings, 'corpus_alignment'):
+        if regions is not None:
+            phoneme_transcription = restore_timeline(text_transcription, phoneme_transcription, regions, sample_rate)
+        words_list = corpus_app(text_transcription, phoneme_transcription, sample_rate=sample_rate)
+
+    return text_transcription, words_list, speech.shape[-1]
+
+def process_audio(audio: Union[bytes, str], filename: str, models: Optional[dict] = None) -> dict:
+    """
+    Process an audio file: transcribe, phonemize, and generate metadata.
+
+    Args:
+        audio (Union[bytes, str]): The raw audio file in bytes format, or the path of the file.
+                                   Passing a path keeps the upload out of memory, and out of
+                                   the arguments pickled for a process worker.
+        filename (str): The name of the audio file.
+        models (Optional[dict]): The loaded models, as returned by `load_models`. Defaults to the
+                              process-wide cached models.
+
+    Returns:
+        dict: A dictionary containing metadata, transcriptions, and phoneme data.
+    """
+    if models is None:
+        models = get_models()
+
+    # Wall time of every stage, in seconds
+    timings: dict[str, float] = {}
+
+    with timed(timings, 'total'):
+        # Decode the audio once into a 16 kHz mono waveform
+        with timed(timings, 'decode'):
+            waveform, original_sample_rate = waveform_loader(_open_audio(audio))
+
+        text_transcription, words_list, speech_samples = analyze_waveform(waveform, models, timings)
+
+    return build_document(
+        filename, waveform.shape[-1], original_sample_rate, text_transcription, words_list, timings,
+        speech_samples=speech_samples,
+    )
+
+def process_window(samples: np.ndarray, sample_rate: int, offset: float, models: Optional[dict] = None) -> dict:
+    """
+    Process one window of a live audio stream.
+
+    Args:
+        samples (np.ndarray): The mono float32 samples of the window.
+        sample_rate (int): The sample rate of the samples in Hz.
+        offset (float): The time of the first sample within the stream, in seconds.
+        models (Optional[dict]): The loaded models, as returned by `load_models`. Defaults to the
+                                 process-wide cached models.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'words': The words returned by `corpus_app` (including `<pause>` entries), with
+              times in the timeline of the stream.
+            - 'timings': The wall time of every stage, in seconds, including `total`.
+    """
+    if models is None:
+        models = get_models()
+
+    timings: dict[str, float] = {}
+    with timed(timings, 'total'):
+        with timed(timings, 'decode'):
+            waveform = torch.from_numpy(samples)
+            if sample_rate != TARGET_SAMPLE_RATE:
+                waveform = torchaudio.functional.resample(waveform, sample_rate, TARGET_SAMPLE_RATE)
+        _, words_list, _ = analyze_waveform(waveform.contiguous(), models, timings)
+
+    for word in words_list:
+        word['start'] = round(word['start'] + offset, 2)
+        word['end'] = round(word['end'] + offset, 2)
+    return {'words': words_list, 'timings': timings}
+
+def build_document(
+    filename: str,
+    num_samples: int,
+    original_sample_rate: int,
+    text_transcription: dict,
+    words_list: list[dict],
+    timings: dict,
+    speech_samples: Optional[int] = None
+) -> dict:
+    """
+    Assemble the stored document of a processed audio file.
+
+    Args:
+        filename (str): The name of the audio file.
+        num_samples (int): The number of samples of the decoded 16 kHz waveform.
+        original_sample_rate (int): The sampling rate of the uploaded file.
+        text_transcription (dict): The Whisper transcription.
+        words_list (list[dict]): The enriched words returned by `corpus_app`.
+        timings (dict): The wall time of every stage, in seconds, including `total`.
+        speech_samples (Optional[int]): The number of samples the models ran on, if voice
+                                        activity detection skipped part of the waveform.
+
+    Returns:
+        dict: A dictionary containing metadata, transcriptions, and phoneme data.
+    """
+    sample_rate = TARGET_SAMPLE_RATE
+    duration = num_samples / sample_rate
+    
+	# Create a JSON-like dictionary with metadata and transcriptions
+    json_dict = {
+        'metadata': {
+            'transcriber_model': config.TRANSCRIBER_MODEL,
+            'transcriber_backend': config.TRANSCRIBER_BACKEND,
+            'phonemizer_model': config.PHONEMIZER_MODEL,
+            'phonemizer_backend': config.PHONEMIZER_BACKEND,
+            'datetime': datetime.now().strftime('%d/%m/%Y, %H:%M:%S'),
+            'timings': timings,
+            # Processing time per second of audio; below 1 means faster than real time
+            'real_time_factor': timings['total'] / duration if duration else 0.0,
+            'worker_peak_rss_mb': peak_rss_mb(),
+            # Fraction of the recording passed to the models after voice activity detection
+            'speech_ratio': speech_samples / num_samples if speech_samples is not None and num_samples else 1.0,
+        },
+        'audio': {
+            'file': filename,
+            'duration': duration,
+            'sampling_rate': sample_rate,
+            'original_sampling_rate': original_sample_rate,
+        },
+        'text_transcription': text_transcription['text'],
+        'words': words_list,
+    }
+    return json_dict
+
+def process_audio_batch(uploads: list[tuple[Union[bytes, str], str]], models: Optional[dict] = None) -> list[dict]:
+    """
+    Process several audio files together, sharing model forward passes between them.
+
+    The files are decoded in parallel threads. Short clips are phonemized in padded batches
+    (sorted by length to minimize padding), while Whisper transcribes the files in a second
+    thread. Per-file stage timings are amortized over the files sharing a forward pass.
+
+    Args:
+        uploads (list[tuple[Union[bytes, str], str]]): The raw audio bytes (or path) and filename
+                                                       of each file.
+        models (Optional[dict]): The loaded models, as returned by `load_models`. Defaults to the
+                                 process-wide cached models.
+
+    Returns:
+        list[dict]: One entry per upload, in input order, holding either the processed
+                    `document` or the `error` that prevented processing it.
+    """
+    if models is None:
+        models = get_models()
+
+    started = time.perf_counter()
+    timings: list[dict[str, float]] = [{} for _ in uploads]
+    errors: dict[int, str] = {}
+    sample_rate = TARGET_SAMPLE_RATE
+
+    def decode(i: int) -> tuple[torch.Tensor, int]:
+        with timed(timings[i], 'decode'):
+            return waveform_loader(_open_audio(uploads[i][0]))
+
+    # Decode every file in parallel; the decoders release the GIL
+    decoded: dict[int, tuple[torch.Tensor, int]] = {}
+    with ThreadPoolExecutor(max_workers=config.BATCH_DECODE_THREADS, thread_name_prefix="decode") as executor:
+        futures = {i: executor.submit(decode, i) for i in range(len(uploads))}
+        for i, future in futures.items():
+            try:
+                decoded[i] = future.result()
+            except Exception as e:
+                errors[i] = f"Could not decode audio: {e}"
+
+    # Keep only the speech regions of every file
+    regions: dict[int, Optional[list[tuple[int, int]]]] = {}
+    speech: dict[int, torch.Tensor] = {}
+    for i, (waveform, _) in decoded.items():
+        with timed(timings[i], 'vad'):
+            regions[i] = speech_regions(waveform, sample_rate)
+            speech[i] = extract_regions(waveform, regions[i]) if regions[i] is not None else waveform
+
+    def transcribe_all() -> dict[int, dict]:
+        transcriptions = {}
+        for i in decoded:
+            try:
+                with timed(timings[i], 'transcribe'):
+                    transcriptions[i] = transcribe(speech[i], models)
+            except Exception as e:
+                errors[i] = f"Transcription failed: {e}"
+        return transcriptions
+
+    def phonemize_all() -> dict[int, list[dict]]:
+        phonemes = {}
+        short = [i for i in decoded if 0 < get_audio_duration(speech[i], sample_rate) <= config.PHONEME_WINDOW_SECONDS]
+        # Sorting by length keeps the clips of a batch similar in size, so little compute goes to padding
+        short.sort(key=lambda i: speech[i].shape[-1])
+        for first in range(0, len(short), config.PHONEME_BATCH_MAX_SIZE):
+            group = short[first:first + config.PHONEME_BATCH_MAX_SIZE]
+            batch_timings: dict[str, float] = {}
+            try:
+                with timed(batch_timings, 'phonemize'):
+                    char_offsets_list = batch_phonemizer(
+                        [speech[i] for i in group],
+                        sample_rate=sample_rate,
+                        wav2vec_processor=models['wav2vec_processor'],
+                        wav2vec_model=models['wav2vec_model'],
+                    )
+            except Exception as e:
+                errors.update({i: f"Phonemization failed: {e}" for i in group})
+                continue
+            for i, char_offsets in zip(group, char_offsets_list):
+                phonemes[i] = char_offsets
+                timings[i]['phonemize'] = batch_timings['phonemize'] / len(group)
+
+        # Long recordings are phonemized one by one, in overlapping windows
+        for i in decoded.keys() - set(short):
+            try:
+                with timed(timings[i], 'phonemize'):
+                    phonemes[i] = phonemize(speech[i], sample_rate, models)
+            except Exception as e:
+                errors[i] = f"Phonemization failed: {e}"
+        return phonemes
+
+    if config.CONCURRENT_STAGES:
+        phoneme_future = stage_executor('phonemize').submit(phonemize_all)
+        transcriptions = stage_executor('transcribe').submit(transcribe_all).result()
+        phonemes = phoneme_future.result()
+    else:
+        transcriptions = transcribe_all()
+        phonemes = phonemize_all()
+
+    # Wall time of the batch, shared equally by the files processed in it
+    total_per_file = (time.perf_counter() - started) / max(1, len(decoded))
+
+    results: list[dict] = []
+    for i, (_, filename) in enumerate(uploads):
+        if i in errors:
+            results.append({'error': errors[i]})
+            continue
+        try:
+            waveform, original_sample_rate = decoded[i]
+            with timed(timings[i], 'corpus_alignment'):
+                if regions[i] is not None:
+                    phonemes[i] = restore_timeline(transcriptions[i], phonemes[i], regions[i], sample_rate)
+                words_list = corpus_app(transcriptions[i], phonemes[i], sample_rate=sample_rate)
+            timings[i]['total'] = total_per_file + timings[i]['corpus_alignment']
+            document = build_document(
+                filename, waveform.shape[-1], original_sample_rate, transcriptions[i], words_list, timings[i],
+                speech_samples=speech[i].shape[-1],
+            )
+            results.append({'document': document})
+        except Exception as e:
+            results.append({'error': str(e)})
+    return results
+
+"""
+======================
+This module handles audio file processing, including loading, transcribing, phonemizing, 
+and generating metadata for audio files.
+
+Functions:
+- `get_audio_duration`: Calculates the duration of a decoded waveform in seconds or milliseconds.
+- `waveform_loader`: Decodes an audio file once into a 16 kHz mono float32 waveform tensor, memory-mapping
+  uncompressed WAV files given by path.
+- `speech_regions`: Finds the speech regions the models run on (voice activity detection).
+- `restore_timeline`: Maps word and phoneme timestamps of the speech regions back to the recording.
+- `analyze_waveform`: Runs voice activity detection, both models and the word alignment on a waveform.
+- `transcribe`: Transcribes a waveform with Whisper, window by window or in batches of windows.
+- `stage_executor`: Long-lived threads of the transcription and phonemization stages, each with its own torch thread budget.
+- `phonemize`: Phonemizes a waveform, in overlapping windows for long recordings or through the
+  micro-batching scheduler for short clips.
+- `process_audio`: Processes audio files by transcribing, phonemizing, and generating a JSON-like dictionary with metadata.
+- `process_window`: Processes one window of a live stream, with times in the timeline of the stream.
+- `process_audio_batch`: Processes several files together, decoding them in parallel and phonemizing them in batches.
+- `build_document`: Assembles the stored document of a processed file.
+
+External Dependencies:
+- `torchaudio` for waveform decoding and resampling.
+- Custom utilities for transcription (`transcriber`) and phonemization (`phonemizer`).
+- The model registry (`get_models`), which provides the cached Whisper and Wav2Vec2 models.
+- A corpus application (`corpus_app`) to generate word lists.
+
+Example Usage:
+======================
+Process an audio file:
+    audio_bytes = open("example_audio.wav", "rb").read()
+    result = process_audio(audio_bytes, "example_audio.wav")
+
+Expected Output:
+    {
+        "metadata": {...},
+        "audio": {...},
+        "text_transcription": "Transcribed text...",
+        "words": [...]
+    }
 """
\ No newline at end of file
@@ -0,0 +1,242 @@
+import os
+from typing import Optional
+
+import numpy as np
+import torch
+from transformers import Wav2Vec2ForCTC
+from transformers.modeling_outputs import CausalLMOutput
+
+from app import config
+
+# Inference backends available for each stage
+TRANSCRIBER_BACKENDS: tuple = ('torch', 'quantized')
+PHONEMIZER_BACKENDS: tuple = ('torch', 'quantized', 'onnx')
+
+# ONNX opset used for the exported Wav2Vec2 graph
+ONNX_OPSET: int = 17
+
+def _as_plain_linear(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Replaces subclasses of `torch.nn.Linear` (such as Whisper's own `Linear`) with plain
+    `Linear` modules sharing the same parameters, since dynamic quantization only swaps
+    modules of the exact type.
+    """
+    for name, module in list(model.named_children()):
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            plain = torch.nn.Linear(module.in_features, module.out_features, bias=module.bias is not None)
+            plain.weight = module.weight
+            plain.bias = module.bias
+            setattr(model, name, plain)
+        else:
+            _as_plain_linear(module)
+    return model
+
+def quantize_linear_layers(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Applies dynamic int8 quantization to every linear layer of a model, in place.
+
+    Weights are stored as int8 and activations are quantized on the fly, which speeds up
+    the matrix multiplications that dominate transformer inference on CPUs and shrinks the
+    model in memory by about 4x. Convolutions and embeddings stay in float32.
+
+    Args:
+        model (torch.nn.Module): The model to quantize, in evaluation mode.
+
+    Returns:
+        torch.nn.Module: The quantized model.
+    """
+    return torch.ao.quantization.quantize_dynamic(
+        _as_plain_linear(model),
+        {torch.nn.Linear},
+        dtype=torch.qint8,
+        inplace=True,
+    )
+
+class _LogitsOnly(torch.nn.Module):
+    """
+    Wraps a Wav2Vec2 CTC model so its traced graph returns the logits tensor only.
+    """
+
+    def __init__(self, model: Wav2Vec2ForCTC):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_values: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_values, attention_mask=attention_mask).logits
+
+def export_wav2vec2_onnx(model: Wav2Vec2ForCTC, path: str) -> None:
+    """
+    Exports a Wav2Vec2 CTC model to ONNX, with dynamic batch and sample dimensions.
+
+    The graph is written to a temporary file and renamed into place, so concurrent workers
+    never load a partially written export.
+
+    Args:
+        model (Wav2Vec2ForCTC): The model to export.
+        path (str): The destination of the `.onnx` file.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    partial_path = f"{path}.{os.getpid()}.partial"
+
+    dummy_values = torch.zeros(1, 16000)
+    dummy_mask = torch.ones(1, 16000, dtype=torch.long)
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model.eval()),
+            (dummy_values, dummy_mask),
+            partial_path,
+            input_names=['input_values', 'attention_mask'],
+            output_names=['logits'],
+            dynamic_axes={
+                'input_values': {0: 'batch', 1: 'samples'},
+                'attention_mask': {0: 'batch', 1: 'samples'},
+                'logits': {0: 'batch', 1: 'frames'},
+            },
+            opset_version=ONNX_OPSET,
+        )
+    os.replace(partial_path, path)
+
+class OnnxWav2Vec2ForCTC:
+    """
+    Runs an exported Wav2Vec2 CTC graph with ONNX Runtime behind the interface of
+    `Wav2Vec2ForCTC` used by `app.utils.phonemization`, so the phonemizers work unchanged.
+
+    Args:
+        session: An `onnxruntime.InferenceSession` of a graph exported by `export_wav2vec2_onnx`.
+        model_config: The `Wav2Vec2Config` of the exported model.
+    """
+
+    def __init__(self, session, model_config):
+        self.session = session
+        self.config = model_config
+
+    def __call__(self, input_values: torch.Tensor, attention_mask: Optional[torch.Tensor] = None) -> CausalLMOutput:
+        if attention_mask is None:
+            attention_mask = torch.ones(input_values.shape, dtype=torch.long)
+        (logits,) = self.session.run(['logits'], {
+            'input_values': input_values.numpy().astype(np.float32, copy=False),
+            'attention_mask': attention_mask.numpy().astype(np.int64, copy=False),
+        })
+        return CausalLMOutput(logits=torch.from_numpy(logits))
+
+    def eval(self) -> "OnnxWav2Vec2ForCTC":
+        return self
+
+    def _get_feat_extract_output_lengths(self, input_lengths: torch.Tensor) -> torch.Tensor:
+        """
+        Computes the number of logit frames produced for inputs of the given lengths.
+        """
+        for kernel_size, stride in zip(self.config.conv_kernel, self.config.conv_stride):
+            input_lengths = torch.div(input_lengths - kernel_size, stride, rounding_mode='floor') + 1
+        if getattr(self.config, 'add_adapter', False):
+            for _ in range(self.config.num_adapter_layers):
+                input_lengths = torch.div(input_lengths + 2 - 3, self.config.adapter_stride, rounding_mode='floor') + 1
+        return input_lengths
+
+def onnx_model_path(model_id: str) -> str:
+    """
+    Returns the path of the cached ONNX export of a model.
+
+    Args:
+        model_id (str): The Hugging Face identifier of the model.
+
+    Returns:
+        str: The path of the `.onnx` file within `ONNX_MODEL_DIR`.
+    """
+    return os.path.join(os.path.expanduser(config.ONNX_MODEL_DIR), model_id.replace('/', '--') + '.onnx')
+
+def load_onnx_wav2vec2(model: Wav2Vec2ForCTC, model_id: str, num_threads: int) -> OnnxWav2Vec2ForCTC:
+    """
+    Loads the ONNX Runtime version of a Wav2Vec2 CTC model, exporting it on first use.
+
+    Args:
+        model (Wav2Vec2ForCTC): The PyTorch model, exported if no cached graph exists.
+        model_id (str): The Hugging Face identifier of the model, which names the cached graph.
+        num_threads (int): Intra-op threads of the ONNX Runtime session.
+
+    Returns:
+        OnnxWav2Vec2ForCTC: The model running on ONNX Runtime.
+
+    Raises:
+        ImportError: If `onnxruntime` is not installed.
+    """
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError("PHONEMIZER_BACKEND=onnx requires the 'onnxruntime' package.") from e
+
+    path = onnx_model_path(model_id)
+    if not os.path.exists(path):
+        print(f"Exporting {model_id} to ONNX...")
+        export_wav2vec2_onnx(model, path)
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = num_threads
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = onnxruntime.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+    return OnnxWav2Vec2ForCTC(session, model.config)
+
+def apply_transcriber_backend(whisper_model: torch.nn.Module, backend: str) -> torch.nn.Module:
+    """
+    Prepares a Whisper model for the given inference backend.
+
+    Args:
+        whisper_model (torch.nn.Module): The loaded Whisper model.
+        backend (str): One of `TRANSCRIBER_BACKENDS`.
+
+    Returns:
+        torch.nn.Module: The model to run.
+    """
+    if backend == 'torch':
+        return whisper_model
+    if backend == 'quantized':
+        return quantize_linear_layers(whisper_model)
+    raise ValueError(f"Unknown TRANSCRIBER_BACKEND '{backend}', expected one of {', '.join(TRANSCRIBER_BACKENDS)}.")
+
+def apply_phonemizer_backend(wav2vec_model: Wav2Vec2ForCTC, backend: str, model_id: str):
+    """
+    Prepares a Wav2Vec2 CTC model for the given inference backend.
+
+    Args:
+        wav2vec_model (Wav2Vec2ForCTC): The loaded Wav2Vec2 model.
+        backend (str): One of `PHONEMIZER_BACKENDS`.
+        model_id (str): The Hugging Face identifier of the model.
+
+    Returns:
+        The model to run: a `Wav2Vec2ForCTC` or an `OnnxWav2Vec2ForCTC`.
+    """
+    if backend == 'torch':
+        return wav2vec_model
+    if backend == 'quantized':
+        return quantize_linear_layers(wav2vec_model)
+    if backend == 'onnx':
+        return load_onnx_wav2vec2(wav2vec_model, model_id, config.PHONEMIZER_THREADS)
+    raise ValueError(f"Unknown PHONEMIZER_BACKEND '{backend}', expected one of {', '.join(PHONEMIZER_BACKENDS)}.")
+
+"""
+======================
+This module provides the CPU inference backends selectable for each model through
+`TRANSCRIBER_BACKEND` and `PHONEMIZER_BACKEND`.
+
+Backends:
+- `torch`: The float32 PyTorch eager model, as loaded.
+- `quantized`: Dynamic int8 quantization of every linear layer (Whisper and Wav2Vec2).
+- `onnx`: The Wav2Vec2 CTC model exported to ONNX and run by ONNX Runtime (phonemizer only).
+  The export is cached in `ONNX_MODEL_DIR` and reused by every worker and restart.
+
+Main Components:
+- `quantize_linear_layers`: Dynamic int8 quantization of a model's linear layers.
+- `export_wav2vec2_onnx` / `load_onnx_wav2vec2`: Export and load the ONNX Runtime model.
+- `OnnxWav2Vec2ForCTC`: Adapter exposing an ONNX Runtime session as a `Wav2Vec2ForCTC`.
+- `apply_transcriber_backend` / `apply_phonemizer_backend`: Used by `load_models`.
+
+Notes:
+- The backends change the numerics slightly. The backend of each model is recorded in the
+  document's `metadata` and is part of the content key, so results of different backends
+  are never mixed up. Use `benchmarks/backends.py` to check that the outputs stay within
+  tolerance of the `torch` backend before switching.
+
+Example Usage:
+======================
+    wav2vec_model = apply_phonemizer_backend(wav2vec_model, 'onnx', config.PHONEMIZER_MODEL)
+"""
@@ -0,0 +1,125 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Optional, Union
+
+from app import config
+
+def audio_digest(audio: Union[bytes, str, BinaryIO]) -> str:
+    """
+    Computes the content hash of an audio file.
+
+    Args:
+        audio (Union[bytes, str, BinaryIO]): The raw audio file, as bytes, a path, or a seekable
+                                             binary file object, which is read in chunks and rewound.
+
+    Returns:
+        str: The hexadecimal SHA-256 digest of the bytes.
+    """
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(audio).hexdigest()
+    if isinstance(audio, str):
+        with open(audio, 'rb') as source:
+            return audio_digest(source)
+
+    digest = hashlib.sha256()
+    audio.seek(0)
+    while chunk := audio.read(config.UPLOAD_CHUNK_BYTES):
+        digest.update(chunk)
+    audio.seek(0)
+    return digest.hexdigest()
+
+def content_key(digest: str) -> str:
+    """
+    Builds the cache key of a processing result from the audio digest and the models used.
+
+    Two uploads share a key only if they have the same bytes and would be processed by the
+    same models, backends, transcription mode and voice activity detection settings, so
+    changing any of them never returns results computed before.
+
+    Args:
+        digest (str): The audio digest returned by `audio_digest`.
+
+    Returns:
+        str: The hexadecimal cache key.
+    """
+    parts = [digest, config.TRANSCRIBER_MODEL, config.PHONEMIZER_MODEL]
+    # Keys of the default backends are left unchanged, so earlier documents are still found
+    if (config.TRANSCRIBER_BACKEND, config.PHONEMIZER_BACKEND) != ('torch', 'torch'):
+        parts += [config.TRANSCRIBER_BACKEND, config.PHONEMIZER_BACKEND]
+    if config.TRANSCRIPTION_MODE != 'sequential':
+        parts += [config.TRANSCRIPTION_MODE]
+    # Skipping silence changes the model input, and with it the results
+    if config.VAD_ENABLED:
+        parts += ['vad', str(config.VAD_MARGIN_DB), str(config.VAD_MIN_SILENCE_SECONDS), str(config.VAD_PADDING_SECONDS)]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+class ResultCache:
+    """
+    Thread-safe in-process LRU cache mapping content keys to stored document identifiers.
+
+    It sits in front of the MongoDB lookup, so hot repeats are answered without a round trip.
+
+    Args:
+        maxsize (int): Maximum number of entries. A value of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the document identifier cached for a key, marking it as recently used.
+        """
+        with self._lock:
+            document_id = self._entries.get(key)
+            if document_id is not None:
+                self._entries.move_to_end(key)
+            return document_id
+
+    def put(self, key: str, document_id: str) -> None:
+        """
+        Caches the document identifier of a key, evicting the least recently used entry if full.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = document_id
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        """
+        Removes a key from the cache, e.g., after its document was deleted.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+# Cache shared by every request of this process
+result_cache = ResultCache(config.RESULT_CACHE_SIZE)
+
+"""
+======================
+This module provides content addressing for uploads: the bytes of an audio file and the
+identifiers of the models define a key, so re-uploads of the same file (retries, repeated
+ingests of a corpus) reuse the stored result instead of being processed again.
+
+Main Components:
+- `audio_digest`: SHA-256 digest of the audio bytes, used to deduplicate GridFS storage.
+- `content_key`: Key of a processing result (audio digest plus the settings that affect the output).
+- `ResultCache`: In-process LRU cache from content keys to document identifiers.
+- `result_cache`: The process-wide `ResultCache` instance, sized by `RESULT_CACHE_SIZE`.
+
+Lookup Order:
+1. `result_cache`, in memory.
+2. The `content_key` index of the `documents` collection (see `find_document`).
+3. Full processing, after which the key is stored with the new document.
+
+Example Usage:
+======================
+    key = content_key(audio_digest(audio_bytes))
+    document_id = result_cache.get(key)
+"""
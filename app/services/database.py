@@ -1,49 +1,381 @@
-from pymongo import MongoClient
-import gridfs
-
-# Initialize the MongoDB client
-client = MongoClient("mongodb://mongo:27017/")
-# Access the `mxesco` database
-db = client.mxesco
-# Initialize GridFS for handling binary files (e.g., audio)
-fs = gridfs.GridFS(db)
-
-def save_to_database(json_data: dict, audio_bytes: bytes) -> None:
-    """
-    Saves processed audio data and its metadata to the MongoDB database.
-
-    Args:
-        json_data (dict): A dictionary containing metadata and transcription data for the audio file.
-        audio_bytes (bytes): The raw audio file in bytes format.
-    """
-    # Insert metadata and transcription data into the `documents` collection
-    db.documents.insert_one(json_data)
-    
-    # Save raw audio bytes into GridFS with the filename from the metadata
-    fs.put(audio_bytes, filename=json_data["audio"]["file"])
-
-"""
-======================
-This module provides functionality to save processed audio metadata and raw audio files 
-to a MongoDB database using GridFS for binary file storage.
-
-Main Components:
-- `MongoClient`: Connects to the MongoDB database.
-- `GridFS`: Used to store and retrieve binary files (e.g., audio files).
-- `save_to_database`: A function to save metadata and audio files.
-
-Workflow:
-1. Connects to the `mxesco` database on the MongoDB server.
-2. Stores audio metadata in the `documents` collection.
-3. Stores the raw audio file in GridFS with its corresponding filename.
-
-Example of Execution:
-======================
-json_data = {
-    "audio": {"file": "example_audio.wav", "duration": 12.34},
-    "metadata": {"transcriber_model": "medium.en"}
-}
-audio_bytes = open("example_audio.wav", "rb").read()
-
-save_to_database(json_data, audio_bytes)
-"""
\ No newline at end of file
+from typing import BinaryIO, Optional, Union
+
+from bson import ObjectId
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import gridfs
+
+from app import config
+from app.services.cache import audio_digest, result_cache
+from app.utils.columnar import document_words, encode_document_words
+from app.utils.postings import POSTING_INDEXES, build_postings
+from app.utils.timing import timed
+
+# Error code reported by MongoDB for unique index violations
+DUPLICATE_KEY_ERROR: int = 11000
+
+# Initialize the MongoDB client (connections are opened lazily, on first use)
+client = MongoClient(config.MONGO_URI, maxPoolSize=config.MONGO_MAX_POOL_SIZE)
+# Access the `mxesco` database
+db = client[config.MONGO_DATABASE]
+# Initialize GridFS for handling binary files (e.g., audio)
+fs = gridfs.GridFS(db)
+
+def ensure_indexes() -> None:
+    """
+    Creates the indexes used for content-addressed lookups. Safe to call repeatedly.
+    """
+    # One document per content key (audio digest plus models)
+    db.documents.create_index(
+        'content_key',
+        unique=True,
+        partialFilterExpression={'content_key': {'$exists': True}},
+    )
+    # One GridFS file per audio digest
+    db.fs.files.create_index(
+        'sha256',
+        unique=True,
+        partialFilterExpression={'sha256': {'$exists': True}},
+    )
+    # Word, token id and phoneme n-gram lookups of the search API
+    db.word_postings.create_indexes(POSTING_INDEXES)
+
+def find_document(content_key: str) -> Optional[str]:
+    """
+    Looks up a stored document by content key.
+
+    Args:
+        content_key (str): The key returned by `content_key`.
+
+    Returns:
+        Optional[str]: The identifier of the stored document, or None if there is none.
+    """
+    document = db.documents.find_one({'content_key': content_key}, projection={'_id': 1})
+    return str(document['_id']) if document else None
+
+def get_document(document_id: str, as_rows: bool = True) -> Optional[dict]:
+    """
+    Reads a stored document.
+
+    Args:
+        document_id (str): The identifier of the document.
+        as_rows (bool, optional): If true, words stored in columnar format are rebuilt into the
+                                  `words` list of dictionaries. Defaults to True.
+
+    Returns:
+        Optional[dict]: The document, or None if there is none.
+    """
+    document = db.documents.find_one({'_id': ObjectId(document_id)})
+    if document is not None and as_rows and 'words_columnar' in document:
+        document['words'] = document_words(document)
+        del document['words_columnar']
+    return document
+
+def index_words(documents: list[dict]) -> int:
+    """
+    Adds the words of stored documents to the `word_postings` search index, in one `insert_many`.
+
+    Postings that already exist are left as they are, so documents can be indexed again safely.
+
+    Args:
+        documents (list[dict]): The stored documents, including their `_id`, in either words format.
+
+    Returns:
+        int: The number of postings written.
+    """
+    postings = [
+        posting
+        for document in documents
+        for posting in build_postings(document['_id'], document['audio']['file'], document_words(document), config.SEARCH_CONTEXT_WORDS)
+    ]
+    if not postings:
+        return 0
+    try:
+        return len(db.word_postings.insert_many(postings, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+        return e.details['nInserted']
+
+def rebuild_word_postings() -> int:
+    """
+    Indexes the words of every stored document, e.g. for documents stored before the search
+    index existed or with `SEARCH_INDEXING` disabled.
+
+    Returns:
+        int: The number of postings written.
+    """
+    projection = {'audio.file': 1, 'words': 1, 'words_columnar': 1}
+    written = 0
+    batch = []
+    for document in db.documents.find({}, projection=projection):
+        batch.append(document)
+        if len(batch) >= config.WRITE_BATCH_SIZE:
+            written += index_words(batch)
+            batch = []
+    return written + index_words(batch)
+
+def store_audio(audio: Union[bytes, BinaryIO], filename: str, digest: str) -> ObjectId:
+    """
+    Stores raw audio in GridFS once per digest, counting the documents that reference it.
+
+    Args:
+        audio (Union[bytes, BinaryIO]): The raw audio, as bytes or a binary file object,
+                                        which GridFS reads chunk by chunk.
+        filename (str): The name of the audio file, used for the first upload of the digest.
+        digest (str): The audio digest returned by `audio_digest`.
+
+    Returns:
+        ObjectId: The identifier of the GridFS file holding the audio.
+    """
+    # Reuse the stored copy if these bytes were uploaded before; a file whose last reference
+    # is being released is never picked up again
+    existing = db.fs.files.find_one_and_update(
+        {'sha256': digest, 'refcount': {'$gt': 0}},
+        {'$inc': {'refcount': 1}},
+        projection={'_id': 1},
+    )
+    if existing:
+        return existing['_id']
+
+    file_id = ObjectId()
+    try:
+        fs.put(audio, _id=file_id, filename=filename, sha256=digest, refcount=1)
+    except (DuplicateKeyError, gridfs.errors.FileExists):
+        # A concurrent upload of the same bytes won the race: drop our chunks and share its file,
+        # unless it is an unreferenced copy left by a release, which is deleted first
+        fs.delete(file_id)
+        _delete_released({'sha256': digest})
+        if hasattr(audio, 'seek'):
+            audio.seek(0)
+        return store_audio(audio, filename, digest)
+    return file_id
+
+def _delete_released(query: dict) -> None:
+    """
+    Deletes the GridFS file matching a query if no document references it any more.
+
+    The reference count is checked by the delete itself, so a file referenced again in the
+    meantime is kept.
+    """
+    file = db.fs.files.find_one_and_delete({**query, 'refcount': {'$lte': 0}}, projection={'_id': 1})
+    if file is not None:
+        db.fs.chunks.delete_many({'files_id': file['_id']})
+
+def release_audio(file_id: ObjectId) -> None:
+    """
+    Drops one reference to a GridFS audio file, deleting the file when none remain.
+
+    Args:
+        file_id (ObjectId): The identifier returned by `store_audio`.
+    """
+    file = db.fs.files.find_one_and_update(
+        {'_id': file_id},
+        {'$inc': {'refcount': -1}},
+        projection={'refcount': 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if file is not None and file.get('refcount', 0) <= 0:
+        _delete_released({'_id': file_id})
+
+def save_to_database(json_data: dict, audio: Union[bytes, BinaryIO], timings: Optional[dict] = None) -> str:
+    """
+    Saves processed audio data and its metadata to the MongoDB database.
+
+    The raw audio is stored in GridFS only if no file with the same digest exists yet. If a
+    document with the same `content_key` was stored concurrently, that document is kept and
+    its identifier returned.
+
+    Args:
+        json_data (dict): A dictionary containing metadata and transcription data for the audio file.
+        audio (Union[bytes, BinaryIO]): The raw audio file, as bytes or a binary file object.
+        timings (Optional[dict]): If given, the wall times of the `gridfs_put` and `db_write`
+                                  steps are added to it, in seconds. Passing the document's
+                                  `metadata.timings` stores the GridFS timing with the document.
+
+    Returns:
+        str: The identifier of the stored document.
+    """
+    timings = timings if timings is not None else {}
+    audio_info = json_data["audio"]
+    # The digest is usually known already; hashing it again would read the whole file
+    if "sha256" not in audio_info:
+        audio_info["sha256"] = audio_digest(audio)
+    digest = audio_info["sha256"]
+
+    # Save raw audio bytes into GridFS, deduplicated by digest
+    with timed(timings, "gridfs_put"):
+        audio_info["file_id"] = store_audio(audio, audio_info["file"], digest)
+
+    # Insert metadata and transcription data into the `documents` collection
+    try:
+        with timed(timings, "db_write"):
+            if config.WORDS_STORAGE == "columnar":
+                encode_document_words(json_data)
+            result = db.documents.insert_one(json_data)
+    except DuplicateKeyError:
+        release_audio(audio_info["file_id"])
+        return find_document(json_data["content_key"])
+
+    # Make the words searchable; the document is stored either way, and
+    # `rebuild_word_postings` can index it later
+    if config.SEARCH_INDEXING:
+        try:
+            with timed(timings, "index_words"):
+                index_words([json_data])
+        except Exception as e:
+            print(f"Could not index the words of document {result.inserted_id}: {e}")
+
+    return str(result.inserted_id)
+
+def save_many_to_database(items: list[tuple[dict, str]]) -> list[dict]:
+    """
+    Saves many processed audio files with one `insert_many` for their documents.
+
+    The audio files are streamed into GridFS from disk (once per digest), then all documents
+    are inserted with a single unordered bulk write and their words indexed with another.
+    Documents whose `content_key` was stored in the meantime resolve to the stored document.
+    Documents that could not be written release their reference to their audio.
+
+    Args:
+        items (list[tuple[dict, str]]): The document returned by `process_audio`, with its
+                                        `content_key` and `audio.sha256`, and the path of its
+                                        audio file.
+
+    Returns:
+        list[dict]: One entry per item, in order, holding either the `document_id` of its
+                    stored document or the `error` that prevented storing it.
+    """
+    outcomes: list[dict] = [{} for _ in items]
+    # Items whose audio is stored, as (item index, document)
+    documents: list[tuple[int, dict]] = []
+    for i, (json_data, path) in enumerate(items):
+        audio_info = json_data["audio"]
+        try:
+            with timed(json_data["metadata"]["timings"], "gridfs_put"), open(path, "rb") as source:
+                audio_info["file_id"] = store_audio(source, audio_info["file"], audio_info["sha256"])
+        except Exception as e:
+            outcomes[i] = {'error': f"Could not store the audio: {e}"}
+            continue
+        if config.WORDS_STORAGE == "columnar":
+            encode_document_words(json_data)
+        json_data.setdefault("_id", ObjectId())
+        documents.append((i, json_data))
+
+    failed: dict[int, dict] = {}
+    if documents:
+        try:
+            db.documents.insert_many([json_data for _, json_data in documents], ordered=False)
+        except BulkWriteError as e:
+            failed = {error['index']: error for error in e.details['writeErrors']}
+        except Exception as e:
+            # E.g. `DocumentTooLarge`: part of the batch may have been written before the error
+            try:
+                stored = {
+                    document['_id']
+                    for document in db.documents.find({'_id': {'$in': [json_data['_id'] for _, json_data in documents]}}, projection={'_id': 1})
+                }
+            except Exception:
+                # Whether the documents were written is unknown, so their audio is kept
+                for i, _ in documents:
+                    outcomes[i] = {'error': f"Could not store the document: {e}"}
+                return outcomes
+            failed = {
+                index: {'code': None, 'errmsg': str(e)}
+                for index, (_, json_data) in enumerate(documents)
+                if json_data['_id'] not in stored
+            }
+
+    written = []
+    for index, (i, json_data) in enumerate(documents):
+        error = failed.get(index)
+        try:
+            if error is None:
+                written.append(json_data)
+                outcomes[i] = {'document_id': str(json_data["_id"])}
+            elif error['code'] == DUPLICATE_KEY_ERROR and 'content_key' in error.get('keyPattern', {}):
+                # The same content was stored concurrently: keep that document
+                release_audio(json_data["audio"]["file_id"])
+                outcomes[i] = {'document_id': find_document(json_data["content_key"])}
+            else:
+                release_audio(json_data["audio"]["file_id"])
+                outcomes[i] = {'error': f"Could not store the document: {error.get('errmsg', 'Insert failed.')}"}
+        except Exception as e:
+            outcomes[i] = {'error': str(e)}
+
+    if config.SEARCH_INDEXING and written:
+        try:
+            index_words(written)
+        except Exception as e:
+            # The documents are stored; `rebuild_word_postings` can index them later
+            print(f"Could not index the words of {len(written)} documents: {e}")
+
+    return outcomes
+
+def delete_document(document_id: str) -> bool:
+    """
+    Deletes a stored document, its search postings and its reference to the GridFS audio.
+
+    The document's content key is dropped from the result cache of this process, so a new
+    upload of the same audio is processed again.
+
+    Args:
+        document_id (str): The identifier of the document.
+
+    Returns:
+        bool: True if the document existed.
+    """
+    document = db.documents.find_one_and_delete(
+        {'_id': ObjectId(document_id)},
+        projection={'audio.file_id': 1, 'content_key': 1},
+    )
+    if document is None:
+        return False
+    if 'content_key' in document:
+        result_cache.discard(document['content_key'])
+    db.word_postings.delete_many({'document_id': document['_id']})
+    file_id = document.get('audio', {}).get('file_id')
+    if file_id is not None:
+        release_audio(file_id)
+    return True
+
+"""
+======================
+This module provides functionality to save processed audio metadata and raw audio files
+to a MongoDB database using GridFS for binary file storage.
+
+Main Components:
+- `MongoClient`: Connects to the MongoDB database.
+- `GridFS`: Used to store and retrieve binary files (e.g., audio files).
+- `save_to_database`: A function to save metadata and audio files.
+- `save_many_to_database`: Saves many processed files with bulk writes, for offline ingest.
+- `find_document`: Looks up a stored document by content key.
+- `get_document`: Reads a document, rebuilding columnar words into the list-of-dictionaries form.
+- `store_audio` / `release_audio`: Reference-counted, deduplicated audio storage.
+- `delete_document`: Deletes a document, its search postings, and its reference to the audio.
+- `index_words` / `rebuild_word_postings`: Maintain the `word_postings` search index.
+- `ensure_indexes`: Creates the `content_key` and `sha256` unique indexes and the search indexes.
+
+This blocking implementation is meant for scripts and worker processes; the web application
+persists through the asynchronous, batched layer in `app.services.async_database`, which
+stores documents in the same format.
+
+Workflow:
+1. Connects to the `mxesco` database on the MongoDB server given by `MONGO_URI`.
+2. Stores the raw audio file in GridFS once per SHA-256 digest; later uploads of the same
+   bytes increment the file's `refcount` instead of storing another copy.
+3. Stores audio metadata in the `documents` collection, with `audio.file_id` pointing to
+   the GridFS file. With `WORDS_STORAGE=columnar`, the words are stored as typed columns in
+   `words_columnar` instead of the `words` list (see `app.utils.columnar`).
+4. Adds one posting per spoken word to the `word_postings` collection (see `app.utils.postings`).
+
+Example of Execution:
+======================
+json_data = {
+    "audio": {"file": "example_audio.wav", "duration": 12.34},
+    "metadata": {"transcriber_model": "medium.en"}
+}
+audio_bytes = open("example_audio.wav", "rb").read()
+
+save_to_database(json_data, audio_bytes)
+"""
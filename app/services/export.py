@@ -0,0 +1,198 @@
+import io
+import json
+import math
+from typing import AsyncIterator, Optional
+
+import numpy as np
+import torch
+import torchaudio
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi.concurrency import run_in_threadpool
+from gridfs.errors import NoFile
+
+from app.services.async_database import get_async_db, open_audio_async
+from app.utils.columnar import document_words
+from app.utils.postings import PAUSE_WORD
+from app.utils.wav import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, read_wav_header, wav_header
+
+# Documents fetched per round trip of an export cursor; bounds the memory held by the export
+EXPORT_BATCH_SIZE: int = 32
+# Bytes read from the start of a stored file to parse its WAV header
+WAV_HEADER_BYTES: int = 64 * 1024
+
+def _json_line(value: dict) -> str:
+    # Identifiers (ObjectId) are written as their hexadecimal string
+    return json.dumps(value, default=str, ensure_ascii=False) + '\n'
+
+def _parse_id(value: str) -> ObjectId:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError) as e:
+        raise ValueError(f"Invalid document id '{value}'.") from e
+
+def word_rows(document: dict, include_pauses: bool = False) -> list[dict]:
+    """
+    Flattens a stored document into one row per word.
+
+    Args:
+        document (dict): A document read from the `documents` collection, in either words format.
+        include_pauses (bool, optional): If true, `<pause>` entries are exported as rows too.
+                                         Defaults to False.
+
+    Returns:
+        list[dict]: The rows, with the document id, file, position of the word within the
+                    document, and the `word`, `start`, `end`, `probability`, `token_id` and
+                    `phoneme` of the word (None where the word has no such value).
+    """
+    document_id = str(document['_id'])
+    filename = document['audio']['file']
+    return [
+        {
+            'document_id': document_id,
+            'file': filename,
+            'position': position,
+            'word': word['word'],
+            'start': word['start'],
+            'end': word['end'],
+            'probability': word.get('probability'),
+            'token_id': word.get('token_id'),
+            'phoneme': word.get('phoneme'),
+        }
+        for position, word in enumerate(document_words(document))
+        if include_pauses or word['word'] != PAUSE_WORD
+    ]
+
+async def _stream_lines(cursor, per_word: bool, include_pauses: bool) -> AsyncIterator[str]:
+    async for document in cursor:
+        if per_word:
+            yield ''.join(_json_line(row) for row in word_rows(document, include_pauses))
+        else:
+            if 'words_columnar' in document:
+                document['words'] = document_words(document)
+                del document['words_columnar']
+            yield _json_line(document)
+
+def export_documents(per_word: bool = False, include_pauses: bool = False, after: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Streams the stored documents as NDJSON lines, in `_id` order.
+
+    Documents are read from a cursor `EXPORT_BATCH_SIZE` at a time and written out as they
+    arrive, so memory use does not depend on the size of the corpus.
+
+    Args:
+        per_word (bool, optional): If true, one line per word (see `word_rows`) instead of one
+                                   line per document. Defaults to False.
+        include_pauses (bool, optional): With `per_word`, also export `<pause>` entries.
+                                         Defaults to False.
+        after (Optional[str]): Only export the documents stored after this document id, e.g.
+                               the last one received by an interrupted export.
+
+    Returns:
+        AsyncIterator[str]: The lines, yielded one document at a time (one line, or one line per word).
+
+    Raises:
+        ValueError: If `after` is not a document id. Raised by the call, before anything is streamed.
+    """
+    query = {'_id': {'$gt': _parse_id(after)}} if after else {}
+    # Only the fields of the rows are needed for a per-word export
+    projection = {'audio.file': 1, 'words': 1, 'words_columnar': 1} if per_word else None
+    cursor = get_async_db().documents.find(query, projection=projection).sort('_id', 1).batch_size(EXPORT_BATCH_SIZE)
+    return _stream_lines(cursor, per_word, include_pauses)
+
+class MissingAudio(LookupError):
+    """
+    Raised when a document has no stored audio: documents stored before the audio was linked
+    to them carry no `audio.file_id`, and the GridFS file of others may have been removed.
+    """
+
+def _decode_clip(data: bytes, start: float, end: float) -> bytes:
+    """
+    Decodes a whole audio file and cuts a clip from it, as 16-bit PCM WAV.
+    """
+    waveform, sample_rate = torchaudio.load(io.BytesIO(data))
+    first = min(int(math.floor(start * sample_rate)), waveform.shape[1])
+    last = min(int(math.ceil(end * sample_rate)), waveform.shape[1])
+    samples = (waveform[:, first:last].clamp(-1.0, 1.0) * 32767).to(torch.int16)
+    pcm = np.ascontiguousarray(samples.numpy().T).tobytes()
+    return wav_header(WAVE_FORMAT_PCM, waveform.shape[0], sample_rate, 16, len(pcm)) + pcm
+
+async def audio_clip(document_id: str, start: float, end: float) -> Optional[tuple[bytes, str]]:
+    """
+    Cuts the audio between two timestamps out of the stored audio file of a document.
+
+    For WAV files with PCM or float samples, the header is parsed from the first bytes of
+    the file and only the GridFS chunks covering the clip are read; the samples are returned
+    unchanged, with the original sample rate and channels. Other formats are read and
+    decoded as a whole, and the clip is returned as 16-bit PCM.
+
+    Args:
+        document_id (str): The identifier of the document.
+        start (float): The start of the clip in seconds, e.g. the `start` of a word.
+        end (float): The end of the clip in seconds, e.g. the `end` of a word.
+
+    Returns:
+        Optional[tuple[bytes, str]]: The clip as a WAV file and the name of the audio file,
+                                     or None if the document does not exist.
+
+    Raises:
+        ValueError: If the document id or the time range is invalid.
+        MissingAudio: If the document has no stored audio.
+    """
+    if not 0 <= start < end:
+        raise ValueError(f"Invalid clip range [{start}, {end}).")
+
+    document = await get_async_db().documents.find_one({'_id': _parse_id(document_id)}, projection={'audio': 1})
+    if document is None:
+        return None
+    audio_info = document.get('audio', {})
+    if audio_info.get('file_id') is None:
+        raise MissingAudio(f"Document '{document_id}' has no stored audio.")
+
+    try:
+        grid_out = await open_audio_async(audio_info['file_id'])
+    except NoFile:
+        raise MissingAudio(f"Document '{document_id}' has no stored audio.")
+    header = read_wav_header(io.BytesIO(await grid_out.read(WAV_HEADER_BYTES)), size=grid_out.length)
+    if header is None or header['format_tag'] not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+        grid_out.seek(0)
+        data = await grid_out.read()
+        # Decoding is CPU-bound, so keep it off the event loop thread
+        return await run_in_threadpool(_decode_clip, data, start, end), audio_info['file']
+
+    frames = header['data_size'] // header['block_align']
+    first = min(int(math.floor(start * header['sample_rate'])), frames)
+    last = min(int(math.ceil(end * header['sample_rate'])), frames)
+    grid_out.seek(header['data_offset'] + first * header['block_align'])
+    samples = await grid_out.read((last - first) * header['block_align'])
+
+    clip_header = wav_header(
+        header['format_tag'], header['channels'], header['sample_rate'], header['bits_per_sample'], len(samples),
+    )
+    return clip_header + samples, audio_info['file']
+
+"""
+======================
+This module implements the read path of the corpus: bulk export of the stored documents and
+retrieval of the audio of single words or passages.
+
+Functions:
+- `export_documents`: Streams every document, or every word, as NDJSON from a database cursor.
+- `word_rows`: Flattens a document into one row per word.
+- `audio_clip`: Cuts a time range out of a stored audio file with ranged GridFS reads.
+- `MissingAudio`: Raised by `audio_clip` for documents without stored audio.
+
+Notes:
+- Exports are ordered by document id, so an interrupted export can be resumed with `after`.
+- Timestamps in the documents refer to the original recording, so clips cut with the `start`
+  and `end` of a word (or of a search hit) hold exactly that word.
+- Only the clip of a WAV file is read without loading the file; the GridFS chunks of other
+  formats are all read, since compressed audio cannot be cut without decoding it.
+
+Example Usage:
+======================
+    async for lines in export_documents(per_word=True):
+        output.write(lines)
+
+    wav_bytes, filename = await audio_clip(document_id, 1.24, 1.58)
+"""
@@ -0,0 +1,155 @@
+import asyncio
+from datetime import datetime
+from typing import Optional, Union
+
+from bson import ObjectId
+
+from app import config
+from app.services.admission import get_admission
+from app.services.async_database import get_async_db
+from app.services.pipeline import handle_upload
+from app.services.uploads import remove_spooled
+
+# References to the running tasks, so they are not garbage collected before finishing
+_tasks: set = set()
+
+def _timestamp() -> str:
+    return datetime.now().strftime('%d/%m/%Y, %H:%M:%S')
+
+def _spawn(coroutine) -> None:
+    """
+    Runs a coroutine in the background, keeping a reference to it until it finishes.
+    """
+    task = asyncio.create_task(coroutine)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+async def _evict_finished_jobs() -> None:
+    """
+    Drops the oldest finished jobs once more than `MAX_STORED_JOBS` are stored.
+    """
+    jobs = get_async_db().jobs
+    excess = await jobs.estimated_document_count() - config.MAX_STORED_JOBS
+    if excess <= 0:
+        return
+    # Identifiers are ObjectIds, so they sort in submission order
+    cursor = jobs.find({'status': {'$in': ['completed', 'failed']}}, projection={'_id': 1}).sort('_id', 1).limit(excess)
+    ids = [job['_id'] for job in await cursor.to_list(length=excess)]
+    if ids:
+        await jobs.delete_many({'_id': {'$in': ids}})
+
+async def _mark_processing(job_id: ObjectId) -> None:
+    try:
+        # Only a queued job moves on, in case its outcome was recorded first
+        await get_async_db().jobs.update_one({'_id': job_id, 'status': 'queued'}, {'$set': {'status': 'processing'}})
+    except Exception as e:
+        print(f"Could not update the status of job {job_id}: {e}")
+
+async def _run_job(job_id: ObjectId, filename: str, audio: Union[bytes, str], digest: Optional[str], ticket: Optional[dict]) -> None:
+    """
+    Runs the pipeline for a job and records its outcome.
+    """
+    def start() -> None:
+        _spawn(_mark_processing(job_id))
+
+    try:
+        result = await handle_upload(audio, filename, digest, ticket, on_start=start)
+        outcome = {'status': 'completed', 'result': result}
+    except Exception as e:
+        outcome = {'status': 'failed', 'error': str(e)}
+    finally:
+        if ticket is not None:
+            # Withdraws the ticket of a job whose content was stored while it waited
+            get_admission().release(ticket)
+        if isinstance(audio, str):
+            remove_spooled(audio)
+    outcome['finished'] = _timestamp()
+
+    try:
+        await get_async_db().jobs.update_one({'_id': job_id}, {'$set': outcome})
+        await _evict_finished_jobs()
+    except Exception as e:
+        print(f"Could not record the outcome of job {job_id}: {e}")
+
+async def submit_job(audio: Union[bytes, str], filename: str, digest: Optional[str] = None, ticket: Optional[dict] = None) -> str:
+    """
+    Enqueues an uploaded file for background processing.
+
+    The job is recorded in the `jobs` collection before this returns, so its status can be
+    queried from any process serving the API.
+
+    Args:
+        audio (Union[bytes, str]): The raw audio file in bytes format, or the path of a file
+                                   spooled by `spool_upload`. The job takes ownership of a
+                                   spooled file and deletes it once processed.
+        filename (str): The name of the audio file.
+        digest (Optional[str]): The digest of the audio, if already computed while spooling.
+        ticket (Optional[dict]): The admission ticket of the upload; the job takes ownership of it.
+
+    Returns:
+        str: The identifier of the new job.
+
+    Raises:
+        Exception: If the job cannot be recorded; the spooled file and the ticket are then
+                   still owned by the caller.
+    """
+    job_id = ObjectId()
+    await get_async_db().jobs.insert_one({
+        '_id': job_id,
+        'status': 'queued',
+        'filename': filename,
+        'submitted': _timestamp(),
+        'finished': None,
+        'result': None,
+        'error': None,
+    })
+    _spawn(_run_job(job_id, filename, audio, digest, ticket))
+    return str(job_id)
+
+async def get_job(job_id: str) -> Optional[dict]:
+    """
+    Returns the status of a job.
+
+    Args:
+        job_id (str): The identifier returned by `submit_job`.
+
+    Returns:
+        Optional[dict]: The job's `status` (`queued`, `processing`, `completed` or `failed`),
+                        its `result` or `error`, and timestamps; None if the job is unknown.
+    """
+    if not ObjectId.is_valid(job_id):
+        return None
+    job = await get_async_db().jobs.find_one({'_id': ObjectId(job_id)}, projection={'_id': 0})
+    return {'job_id': job_id, **job} if job is not None else None
+
+"""
+======================
+This module implements the asynchronous job API: uploads are enqueued, processed in the
+background by the worker pool, and their status can be polled by job identifier.
+
+Functions:
+- `submit_job`: Records a new job and starts processing it in the background.
+- `get_job`: Returns the status and result of a job.
+
+Job Lifecycle:
+1. `queued`: The job was accepted and is waiting to be dispatched, shortest first when
+   admission control is enabled.
+2. `processing`: The job was handed to the worker pool.
+3. `completed`: The document was stored; `result` holds its `document_id`.
+4. `failed`: An error occurred; `error` holds its message.
+
+Notes:
+- Queued uploads wait on disk, as spooled files, rather than in memory.
+- Job status is stored in the `jobs` collection, bounded by `MAX_STORED_JOBS`, so with
+  several serving workers (`app.serve`) a job can be polled from any of them. The job itself
+  runs in the process that accepted it: if that process dies, the job stays `queued` or
+  `processing`.
+
+Example Usage:
+======================
+    path, digest = await spool_upload(file)
+    job_id = await submit_job(path, "example_audio.wav", digest)
+    ...
+    job = await get_job(job_id)
+    print(job['status'])
+"""
@@ -0,0 +1,113 @@
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+from app.utils.timing import peak_rss_mb
+
+# Buckets from 10 ms up to two hours, since stage latency grows with the recording length
+LATENCY_BUCKETS: tuple = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+STAGE_LATENCY = Histogram(
+    'mxesco_stage_duration_seconds',
+    'Wall time of each stage of the processing pipeline.',
+    ['stage'],
+    buckets=LATENCY_BUCKETS,
+)
+AUDIO_SECONDS = Counter(
+    'mxesco_audio_seconds_processed_total',
+    'Seconds of audio run through the models.',
+)
+REAL_TIME_FACTOR = Histogram(
+    'mxesco_real_time_factor',
+    'Processing time per second of audio (below 1 is faster than real time).',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+UPLOADS = Counter(
+    'mxesco_uploads_total',
+    'Uploads handled by the pipeline, by outcome.',
+    ['outcome'],
+)
+QUEUE_DEPTH = Gauge(
+    'mxesco_pipeline_queue_depth',
+    'Uploads waiting for or being processed by the worker pool.',
+    # With several serving workers (multiprocess mode), the depths of the live ones add up
+    multiprocess_mode='livesum',
+)
+ADMISSION_QUEUE = Gauge(
+    'mxesco_admission_queue_depth',
+    'Admitted uploads waiting for a pipeline worker.',
+    multiprocess_mode='livesum',
+)
+ADMISSION_REJECTED = Counter(
+    'mxesco_admission_rejected_total',
+    'Uploads rejected with HTTP 429 because the server was saturated.',
+)
+PEAK_RSS = Gauge(
+    'mxesco_peak_rss_bytes',
+    'Peak resident memory, of the web process and of the largest worker seen so far.',
+    ['process'],
+    multiprocess_mode='max',
+)
+
+# Largest peak RSS reported by any worker so far, in bytes
+_worker_peak_rss: float = 0.0
+
+def observe_processing(json_data: dict) -> None:
+    """
+    Records the stage timings and throughput reported by `process_audio` and `save_to_database`.
+
+    Args:
+        json_data (dict): The processed document, with `metadata.timings` filled in.
+    """
+    global _worker_peak_rss
+    metadata = json_data['metadata']
+    for stage, seconds in metadata['timings'].items():
+        STAGE_LATENCY.labels(stage=stage).observe(seconds)
+    AUDIO_SECONDS.inc(json_data['audio']['duration'])
+    REAL_TIME_FACTOR.observe(metadata['real_time_factor'])
+
+    _worker_peak_rss = max(_worker_peak_rss, metadata['worker_peak_rss_mb'] * 2**20)
+    PEAK_RSS.labels(process='worker').set(_worker_peak_rss)
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Renders every metric in the Prometheus text exposition format.
+
+    Returns:
+        tuple[bytes, str]: The payload and its content type.
+    """
+    PEAK_RSS.labels(process='web').set(peak_rss_mb() * 2**20)
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Several serving workers: aggregate the values every worker wrote to the shared directory
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+"""
+======================
+This module defines the Prometheus metrics of the service. Timings are measured with
+`app.utils.timing` wherever the work happens (including worker processes), travel back in the
+document's `metadata`, and are recorded here, in the web process that serves `/metrics`.
+
+Metrics:
+- `mxesco_stage_duration_seconds{stage}`: Latency histogram per stage (`decode`, `transcribe`,
+  `phonemize`, `corpus_alignment`, `gridfs_put`, `db_write`, and `total`).
+- `mxesco_audio_seconds_processed_total`: Seconds of audio processed.
+- `mxesco_real_time_factor`: Processing time per second of audio.
+- `mxesco_uploads_total{outcome}`: Uploads by outcome (`processed`, `cached`, `failed`).
+- `mxesco_pipeline_queue_depth`: Uploads waiting for or running in the worker pool.
+- `mxesco_admission_queue_depth`: Admitted uploads waiting for a worker (see `app.services.admission`).
+- `mxesco_admission_rejected_total`: Uploads rejected because the server was saturated.
+- `mxesco_peak_rss_bytes{process}`: Peak resident memory of the web process and the workers.
+
+Notes:
+- Under the pre-fork server (`app.serve`), every worker writes its metrics to the
+  `PROMETHEUS_MULTIPROC_DIR` directory, and `render_metrics` aggregates all of them, so a
+  scrape reports the whole server whichever worker answers it. Counters and histograms are
+  summed; queue depths are summed over the live workers; peak memory is the maximum.
+
+Example Usage:
+======================
+    payload, content_type = render_metrics()
+"""
@@ -0,0 +1,139 @@
+import threading
+
+import torch
+import whisper
+from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
+
+from app import config
+from app.services.backends import apply_transcriber_backend, apply_phonemizer_backend
+from app.utils.transcription import transcriber
+from app.utils.phonemization import phonemizer
+
+# Process-wide cache of loaded models, populated once by `load_models`
+_models: dict = {}
+_lock = threading.Lock()
+
+# Length of the synthetic clip used to warm up the models, in seconds
+WARM_UP_SECONDS: float = 1.0
+WARM_UP_SAMPLE_RATE: int = 16000
+
+def warm_up(models: dict) -> None:
+    """
+    Runs one inference pass of every model on a short synthetic clip.
+
+    The first forward pass of a PyTorch model pays one-off costs (kernel selection, memory
+    pool growth, lazy initialization) that would otherwise be charged to the first request.
+
+    Args:
+        models (dict): The models returned by `load_models`.
+    """
+    # Low-amplitude noise is used instead of pure silence so every layer does real work
+    clip = 0.01 * torch.randn(int(WARM_UP_SECONDS * WARM_UP_SAMPLE_RATE))
+
+    transcriber(audio=clip, whisper_model=models['whisper'])
+    phonemizer(
+        audio=clip,
+        sample_rate=WARM_UP_SAMPLE_RATE,
+        wav2vec_processor=models['wav2vec_processor'],
+        wav2vec_model=models['wav2vec_model'],
+    )
+
+def build_models(transcriber_backend: str, phonemizer_backend: str) -> dict:
+    """
+    Loads the configured models and prepares them for the given inference backends.
+
+    Unlike `load_models`, nothing is cached or warmed up, so several variants can be built
+    side by side (e.g., to compare backends).
+
+    Args:
+        transcriber_backend (str): The backend of the Whisper model (see `app.services.backends`).
+        phonemizer_backend (str): The backend of the Wav2Vec2 model.
+
+    Returns:
+        dict: The models, with the same keys as `load_models`.
+    """
+    print(f"Loading Whisper model ({transcriber_backend})...")
+    whisper_model = whisper.load_model(config.TRANSCRIBER_MODEL)
+    whisper_model = apply_transcriber_backend(whisper_model, transcriber_backend)
+
+    print(f"Loading Wav2Vec model ({phonemizer_backend})...")
+    wav2vec_processor = Wav2Vec2Processor.from_pretrained(config.PHONEMIZER_MODEL)
+    wav2vec_model = Wav2Vec2ForCTC.from_pretrained(config.PHONEMIZER_MODEL)
+    wav2vec_model.eval()
+    wav2vec_model = apply_phonemizer_backend(wav2vec_model, phonemizer_backend, config.PHONEMIZER_MODEL)
+
+    return {
+        'whisper': whisper_model,
+        'wav2vec_processor': wav2vec_processor,
+        'wav2vec_model': wav2vec_model,
+    }
+
+def load_models(warm: bool = True) -> dict:
+    """
+    Loads the Whisper and Wav2Vec2 models once per process, for the backends selected by
+    `TRANSCRIBER_BACKEND` and `PHONEMIZER_BACKEND`, and warms them up.
+
+    Subsequent calls return the cached instances without touching the disk.
+
+    Args:
+        warm (bool, optional): If false, the models are not warmed up, e.g. in a process that
+                               forks before running any inference (see `app.serve`). Defaults to True.
+
+    Returns:
+        dict: A dictionary with the keys:
+            - 'whisper': The Whisper transcription model.
+            - 'wav2vec_processor': The Wav2Vec2 processor (feature extractor and tokenizer).
+            - 'wav2vec_model': The Wav2Vec2 CTC model (or its ONNX Runtime adapter).
+    """
+    if _models:
+        return _models
+
+    with _lock:
+        # Another thread may have finished loading while this one was waiting
+        if _models:
+            return _models
+
+        models = build_models(config.TRANSCRIBER_BACKEND, config.PHONEMIZER_BACKEND)
+
+        if warm:
+            print("Warming up models...")
+            warm_up(models)
+
+        # Publish the models only once they are fully initialized
+        _models.update(models)
+
+    return _models
+
+def get_models() -> dict:
+    """
+    Returns the cached models, loading them first if this process has not done so yet.
+
+    Returns:
+        dict: The models returned by `load_models`.
+    """
+    return load_models()
+
+"""
+======================
+This module provides a process-wide registry for the Whisper and Wav2Vec2 models, so that
+each model is deserialized only once per process instead of once per request.
+
+Functions:
+- `load_models`: Loads, warms up, and caches the models. Safe to call from several threads.
+- `build_models`: Loads the models for explicit backends, without caching them.
+- `get_models`: Returns the cached models, loading them lazily if needed.
+- `warm_up`: Runs a synthetic clip through the models to absorb first-inference costs.
+
+Workflow:
+1. The FastAPI startup hook in `app/main.py` calls `load_models` (or the pre-fork server in
+   `app/serve.py` does, once, before forking the web workers).
+2. The models are loaded using the identifiers in `app.config`, then quantized or exported
+   to ONNX Runtime as selected by `TRANSCRIBER_BACKEND` and `PHONEMIZER_BACKEND`.
+3. A one-second synthetic clip is transcribed and phonemized to warm the models up.
+4. `process_audio` obtains the cached instances through `get_models`.
+
+Example Usage:
+======================
+    models = get_models()
+    text_transcription = transcriber(audio=waveform, whisper_model=models['whisper'])
+"""
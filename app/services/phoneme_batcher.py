@@ -0,0 +1,255 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Optional
+
+import torch
+
+from app import config
+from app.utils.phonemization import batch_phonemizer
+
+# Number of recent batches kept to compute the queue-wait statistics
+STATS_WINDOW: int = 1000
+
+class PhonemeBatcher:
+    """
+    Groups concurrent phonemization requests into batches for the Wav2Vec2 model.
+
+    Requests are queued by `submit`. A background thread takes the first waiting request,
+    keeps collecting more for up to `max_wait_ms` (or until `max_batch_size` is reached),
+    and runs them through `batch_phonemizer` in a single forward pass.
+
+    Args:
+        models (dict): The loaded models, as returned by `load_models`.
+        max_batch_size (int): Maximum number of waveforms per batch.
+        max_wait_ms (float): Maximum time the first request of a batch waits for company.
+    """
+
+    def __init__(self, models: dict, max_batch_size: int, max_wait_ms: float):
+        self.models = models
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: dict[int, int] = {}
+        self._queue_waits_ms: deque = deque(maxlen=STATS_WINDOW)
+        self._requests: int = 0
+
+    def start(self) -> None:
+        """
+        Starts the background batching thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="phoneme-batcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the background thread once the requests already queued have been served.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, audio: torch.Tensor, sample_rate: int) -> Future:
+        """
+        Queues a waveform for phonemization.
+
+        Args:
+            audio (torch.Tensor): The mono audio waveform.
+            sample_rate (int): The sample rate of the audio in Hz.
+
+        Returns:
+            Future: A future resolving to the list of character offsets of the waveform.
+        """
+        future: Future = Future()
+        self._queue.put((audio, sample_rate, future, time.perf_counter()))
+        return future
+
+    def phonemize(self, audio: torch.Tensor, sample_rate: int) -> list[dict]:
+        """
+        Queues a waveform for phonemization and blocks until its batch has been processed.
+
+        Args:
+            audio (torch.Tensor): The mono audio waveform.
+            sample_rate (int): The sample rate of the audio in Hz.
+
+        Returns:
+            list[dict]: The character offsets of the waveform, as returned by `phonemizer`.
+        """
+        return self.submit(audio, sample_rate).result()
+
+    def stats(self) -> dict:
+        """
+        Returns batching statistics for tuning throughput versus tail latency.
+
+        Returns:
+            dict: A dictionary containing:
+                - 'requests': Total number of phonemized waveforms.
+                - 'batches': Total number of forward passes.
+                - 'mean_batch_size': Average number of waveforms per forward pass.
+                - 'batch_sizes': Histogram of batch sizes ({size: count}).
+                - 'queue_wait_ms': Mean, p50, p95 and max queue wait over the recent requests.
+        """
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            waits = sorted(self._queue_waits_ms)
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            requests = self._requests
+
+        def percentile(p: float) -> float:
+            return waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+
+        return {
+            'requests': requests,
+            'batches': batches,
+            'mean_batch_size': requests / batches if batches else 0.0,
+            'batch_sizes': batch_sizes,
+            'queue_wait_ms': {
+                'mean': sum(waits) / len(waits) if waits else 0.0,
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'max': waits[-1] if waits else 0.0,
+            },
+        }
+
+    def _collect(self, first: tuple) -> tuple[list[tuple], bool]:
+        """
+        Collects requests that arrive within the wait window of the first one.
+
+        Returns:
+            tuple[list[tuple], bool]: The batch, and whether a stop signal was received.
+        """
+        batch = [first]
+        deadline = first[3] + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        """
+        Main loop of the background thread.
+        """
+        # The batcher thread runs the phonemization stage, so it gets that stage's thread budget
+        torch.set_num_threads(config.PHONEMIZER_THREADS)
+
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect(first)
+
+            # The processor needs a single sampling rate per forward pass
+            by_rate: dict[int, list[tuple]] = {}
+            for item in batch:
+                by_rate.setdefault(item[1], []).append(item)
+            for sample_rate, items in by_rate.items():
+                self._process(items, sample_rate)
+
+    def _process(self, items: list[tuple], sample_rate: int) -> None:
+        """
+        Runs one forward pass over a batch and resolves the futures of its requests.
+        """
+        started = time.perf_counter()
+        try:
+            results = batch_phonemizer(
+                [item[0] for item in items],
+                sample_rate=sample_rate,
+                wav2vec_processor=self.models['wav2vec_processor'],
+                wav2vec_model=self.models['wav2vec_model'],
+            )
+        except Exception as e:
+            for item in items:
+                item[2].set_exception(e)
+            return
+
+        for item, char_offsets in zip(items, results):
+            item[2].set_result(char_offsets)
+
+        with self._stats_lock:
+            self._requests += len(items)
+            self._batch_sizes[len(items)] = self._batch_sizes.get(len(items), 0) + 1
+            self._queue_waits_ms.extend((started - item[3]) * 1000 for item in items)
+
+# Process-wide batcher instance, created on first use
+_batcher: Optional[PhonemeBatcher] = None
+_batcher_lock = threading.Lock()
+
+def get_batcher(models: dict) -> PhonemeBatcher:
+    """
+    Returns the process-wide phoneme batcher, starting it on first use.
+
+    Args:
+        models (dict): The loaded models, as returned by `load_models`.
+
+    Returns:
+        PhonemeBatcher: The running batcher.
+    """
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = PhonemeBatcher(
+                models,
+                max_batch_size=config.PHONEME_BATCH_MAX_SIZE,
+                max_wait_ms=config.PHONEME_BATCH_MAX_WAIT_MS,
+            )
+            _batcher.start()
+    return _batcher
+
+def stop_batcher() -> None:
+    """
+    Stops the process-wide phoneme batcher, if it was started.
+    """
+    global _batcher
+    with _batcher_lock:
+        if _batcher is not None:
+            _batcher.stop()
+            _batcher = None
+
+def batcher_stats() -> dict:
+    """
+    Returns the statistics of the process-wide phoneme batcher.
+
+    Returns:
+        dict: The output of `PhonemeBatcher.stats`, or an empty dictionary if the batcher
+              has not been started.
+    """
+    return _batcher.stats() if _batcher is not None else {}
+
+"""
+======================
+This module implements dynamic micro-batching for the Wav2Vec2 phonemizer. Concurrent
+requests are collected for a short window, padded into one batch with an attention mask,
+and phonemized in a single forward pass, which makes much better use of the CPU's matrix
+multiplication throughput than one waveform at a time.
+
+Main Components:
+- `PhonemeBatcher`: Queue and background thread that form and run the batches.
+- `get_batcher`: Returns the process-wide batcher, starting it on first use.
+- `stop_batcher`: Stops the process-wide batcher (called on application shutdown).
+- `batcher_stats`: Returns batch-size and queue-wait statistics.
+
+Tuning:
+- `PHONEME_BATCH_MAX_SIZE` bounds the batch size (and thus peak memory per forward pass).
+- `PHONEME_BATCH_MAX_WAIT_MS` trades latency for throughput: a longer window forms larger
+  batches, but every request may wait up to that long before inference starts.
+- Compare `mean_batch_size` with `queue_wait_ms` from `batcher_stats` to pick the values.
+
+Example Usage:
+======================
+    batcher = get_batcher(get_models())
+    char_offsets = batcher.phonemize(waveform, 16000)
+"""
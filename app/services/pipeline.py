@@ -0,0 +1,256 @@
+import asyncio
+from typing import Callable, Optional, Union
+
+from fastapi.concurrency import run_in_threadpool
+
+from app import config
+from app.services.audio_processing import process_audio, process_audio_batch
+from app.services.cache import audio_digest, content_key, result_cache
+from app.services.admission import audio_duration, get_admission
+from app.services.async_database import find_document_async, save_to_database_async
+from app.services.metrics import QUEUE_DEPTH, UPLOADS, observe_processing
+from app.services.workers import run_in_pool
+
+def _cache_stored(key: str, document_id: str) -> None:
+    """
+    Caches the document stored for a content key, if it is known to be written.
+
+    With `WRITE_ACKNOWLEDGE=false`, the document is still in the write-behind buffer, which may
+    fail to write it or resolve it to a concurrent copy; it is cached by `find_processed` once
+    it is found in the database instead.
+    """
+    if config.WRITE_ACKNOWLEDGE:
+        result_cache.put(key, document_id)
+
+async def find_processed(key: str) -> Optional[str]:
+    """
+    Looks up the document stored for a content key, first in memory and then in the database.
+
+    Args:
+        key (str): The key returned by `content_key`.
+
+    Returns:
+        Optional[str]: The identifier of the stored document, or None if the content is new.
+    """
+    document_id = result_cache.get(key)
+    if document_id is None:
+        document_id = await find_document_async(key)
+    if document_id is not None:
+        result_cache.put(key, document_id)
+    return document_id
+
+async def handle_upload(
+    audio: Union[bytes, str],
+    filename: str,
+    digest: Optional[str] = None,
+    ticket: Optional[dict] = None,
+    on_start: Optional[Callable[[], None]] = None,
+) -> dict:
+    """
+    Runs the full pipeline for one uploaded file without blocking the event loop.
+
+    Uploads whose bytes were already processed by the same models are answered with the
+    stored document. Otherwise, inference runs in the worker pool, and the results are
+    persisted through the asynchronous write-behind layer.
+
+    Args:
+        audio (Union[bytes, str]): The raw audio file in bytes format, or the path of a spooled
+                                   upload, which the workers decode and GridFS reads from disk.
+        filename (str): The name of the audio file.
+        digest (Optional[str]): The digest of the audio, if already computed while spooling.
+        ticket (Optional[dict]): The admission ticket of the upload (see `app.services.admission`);
+                                 processing waits until it is dispatched, and frees its slot.
+        on_start (Optional[Callable[[], None]]): Called when the audio is handed to the worker pool.
+
+    Returns:
+        dict: A dictionary containing the `document_id` of the stored document and whether
+              it was `cached` (i.e., stored by an earlier upload of the same content).
+    """
+    if digest is None:
+        # Hashing large files takes a while, so keep it off the event loop thread
+        digest = await run_in_threadpool(audio_digest, audio)
+    key = content_key(digest)
+
+    # Look for an earlier result; with a ticket, the route found none before admitting the
+    # upload, but an upload of the same content may have been stored since
+    document_id = await find_processed(key)
+    if document_id is not None:
+        UPLOADS.labels(outcome='cached').inc()
+        return {'document_id': document_id, 'cached': True}
+
+    try:
+        # Process the audio file in the worker pool
+        QUEUE_DEPTH.inc()
+        try:
+            if ticket is not None:
+                # Wait for a worker, behind the admitted uploads that are cheaper to process
+                await get_admission().acquire(ticket)
+            if on_start is not None:
+                on_start()
+            json_data = await run_in_pool(process_audio, audio, filename)
+        finally:
+            QUEUE_DEPTH.dec()
+            if ticket is not None:
+                get_admission().release(ticket)
+        json_data['content_key'] = key
+        json_data['audio']['sha256'] = digest
+
+        # Save the processed data and raw audio to the database; the GridFS timing is stored
+        # with the document, and the insert timing is added to the dictionary afterwards
+        timings = json_data['metadata']['timings']
+        if isinstance(audio, str):
+            # Stream the spooled file into GridFS instead of loading it
+            with open(audio, 'rb') as source:
+                document_id = await save_to_database_async(json_data, source, timings)
+        else:
+            document_id = await save_to_database_async(json_data, audio, timings)
+    except Exception:
+        UPLOADS.labels(outcome='failed').inc()
+        raise
+
+    _cache_stored(key, document_id)
+    observe_processing(json_data)
+    UPLOADS.labels(outcome='processed').inc()
+
+    return {'document_id': document_id, 'cached': False}
+
+async def _store_processed(json_data: dict, path: str, key: str, digest: str) -> str:
+    """
+    Persists one document processed as part of a batch and records its metrics.
+    """
+    json_data['content_key'] = key
+    json_data['audio']['sha256'] = digest
+    with open(path, 'rb') as source:
+        document_id = await save_to_database_async(json_data, source, json_data['metadata']['timings'])
+    _cache_stored(key, document_id)
+    observe_processing(json_data)
+    UPLOADS.labels(outcome='processed').inc()
+    return document_id
+
+async def handle_batch(uploads: list[tuple[str, str, str]]) -> dict:
+    """
+    Runs the pipeline for many files at once, sharing model work between them.
+
+    Files already processed are answered from the cache. The others are split into groups
+    of `BATCH_GROUP_SIZE`, each processed by one worker with `process_audio_batch`, and
+    the groups run concurrently across the worker pool, each once it gets a slot from the
+    admission controller (groups are queued, never rejected). Documents are persisted as their
+    group finishes, so the write-behind buffer inserts them in bulk.
+
+    Args:
+        uploads (list[tuple[str, str, str]]): The path of the spooled file, the filename and the
+                                              digest of each file.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'results': One entry per file, in input order, with its `file`, `status`
+              (`processed`, `cached` or `failed`), and `document_id` or `error`.
+            - 'summary': The number of files with each status.
+    """
+    results: list[dict] = [{'file': filename} for _, filename, _ in uploads]
+    pending: list[tuple[int, str, str]] = []
+    # Files repeated within the batch are processed once; the copies share the result
+    duplicates: dict[str, list[int]] = {}
+
+    for i, (_, _, digest) in enumerate(uploads):
+        key = content_key(digest)
+        if key in duplicates:
+            duplicates[key].append(i)
+            continue
+
+        document_id = await find_processed(key)
+        if document_id is not None:
+            UPLOADS.labels(outcome='cached').inc()
+            results[i].update(status='cached', document_id=document_id)
+            continue
+
+        duplicates[key] = []
+        pending.append((i, key, digest))
+
+    size = max(1, config.BATCH_GROUP_SIZE)
+    groups = [pending[first:first + size] for first in range(0, len(pending), size)]
+
+    # Each group holds one pipeline worker, so it waits for a slot like an upload, costed by
+    # the duration of its files; the wait estimates of other uploads then include the batch
+    admission = get_admission()
+    tickets: list[Optional[dict]] = [None] * len(groups)
+    if admission is not None:
+        durations = await run_in_threadpool(
+            lambda: [sum(audio_duration(uploads[i][0]) for i, _, _ in group) for group in groups]
+        )
+        tickets = [admission.admit(duration, reject=False) for duration in durations]
+
+    async def run_group(group: list[tuple[int, str, str]], ticket: Optional[dict]) -> None:
+        QUEUE_DEPTH.inc(len(group))
+        try:
+            if ticket is not None:
+                await admission.acquire(ticket)
+            # Only the paths cross the process boundary; the workers decode the files from disk
+            outcomes = await run_in_pool(process_audio_batch, [uploads[i][:2] for i, _, _ in group])
+        except Exception as e:
+            outcomes = [{'error': str(e)}] * len(group)
+        finally:
+            QUEUE_DEPTH.dec(len(group))
+            if ticket is not None:
+                admission.release(ticket)
+
+        async def store(entry: tuple[int, str, str], outcome: dict) -> None:
+            i, key, digest = entry
+            try:
+                if 'error' in outcome:
+                    raise RuntimeError(outcome['error'])
+                document_id = await _store_processed(outcome['document'], uploads[i][0], key, digest)
+                results[i].update(status='processed', document_id=document_id)
+            except Exception as e:
+                UPLOADS.labels(outcome='failed').inc()
+                results[i].update(status='failed', error=str(e))
+
+        await asyncio.gather(*(store(entry, outcome) for entry, outcome in zip(group, outcomes)))
+
+    try:
+        await asyncio.gather(*(run_group(group, ticket) for group, ticket in zip(groups, tickets)))
+    finally:
+        # Withdraws the tickets of groups that never ran, e.g. if the request was cancelled
+        for ticket in tickets:
+            if ticket is not None:
+                admission.release(ticket)
+
+    # Copies of a file within the batch get the outcome of its first occurrence
+    for i, key, _ in pending:
+        for copy in duplicates[key]:
+            results[copy].update({k: v for k, v in results[i].items() if k != 'file'})
+            if results[copy]['status'] == 'processed':
+                results[copy]['status'] = 'cached'
+
+    summary = {'processed': 0, 'cached': 0, 'failed': 0}
+    for result in results:
+        summary[result['status']] += 1
+    return {'results': results, 'summary': summary}
+
+"""
+======================
+This module ties the processing and storage services together into the pipeline executed
+for every uploaded file, shared by the synchronous endpoint and the job API.
+
+Functions:
+- `find_processed`: Looks up the document stored for a content key, in memory and then in MongoDB.
+- `handle_upload`: Processes an upload in the worker pool and stores the result.
+- `handle_batch`: Processes many uploads in groups, one `process_audio_batch` task per group.
+
+Workflow:
+1. The upload is hashed, and its content key is looked up in the in-process LRU cache and
+   then in the `documents` collection; a hit returns the stored document immediately.
+2. Otherwise, `process_audio` runs in the worker pool (see `app.services.workers`), once
+   the admission ticket of the upload is dispatched (see `app.services.admission`).
+   Spooled uploads are passed by path, so only the path crosses the process boundary.
+3. `save_to_database_async` streams the audio into GridFS and buffers the document, which
+   is inserted together with other concurrent documents in one `insert_many`.
+4. The identifier of the stored document is returned and cached, and the stage timings
+   reported in the document's `metadata` are recorded as Prometheus metrics.
+
+Example Usage:
+======================
+    path, digest = await spool_upload(file)
+    result = await handle_upload(path, "example_audio.wav", digest)
+    print(result['document_id'])
+"""
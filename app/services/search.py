@@ -0,0 +1,137 @@
+import re
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.services.async_database import get_async_db
+from app.utils.postings import PHONEME_GRAM_SIZE, normalize_word, phoneme_text, query_grams
+
+# Fields of a posting returned with every hit
+HIT_PROJECTION: dict = {
+    'document_id': 1, 'file': 1, 'text': 1, 'start': 1, 'end': 1,
+    'token_id': 1, 'phoneme': 1, 'context': 1,
+}
+
+def _format_hit(posting: dict) -> dict:
+    return {
+        'document_id': str(posting['document_id']),
+        'file': posting['file'],
+        'word': posting['text'],
+        'start': posting['start'],
+        'end': posting['end'],
+        'token_id': posting.get('token_id'),
+        'phoneme': posting.get('phoneme'),
+        'context': posting['context'],
+    }
+
+async def _search(query: dict, hint: list, limit: int, after: Optional[str]) -> dict:
+    """
+    Reads one page of postings matching a query, in `_id` order.
+
+    Pages are continued from the last `_id` of the previous page (keyset pagination), so every
+    page is a bounded scan of the index whatever its depth, unlike `skip`.
+
+    Args:
+        query (dict): The filter on the `word_postings` collection.
+        hint (list): The index serving the query; its first key must be matched by equality.
+        limit (int): The maximum number of hits in the page.
+        after (Optional[str]): The `next` cursor returned with the previous page.
+
+    Returns:
+        dict: The `results` of the page and the `next` cursor, None on the last page.
+
+    Raises:
+        ValueError: If `after` is not a cursor returned by a previous page.
+    """
+    if after:
+        try:
+            query['_id'] = {'$gt': ObjectId(after)}
+        except InvalidId as e:
+            raise ValueError(f"Invalid page cursor '{after}'.") from e
+
+    # One extra hit tells whether there is a next page
+    cursor = get_async_db().word_postings.find(query, projection=HIT_PROJECTION).hint(hint).sort('_id', 1).limit(limit + 1)
+    postings = await cursor.to_list(length=limit + 1)
+    next_cursor = str(postings[limit - 1]['_id']) if len(postings) > limit else None
+    return {'results': [_format_hit(posting) for posting in postings[:limit]], 'next': next_cursor}
+
+async def search_words(word: str, limit: int, after: Optional[str] = None) -> dict:
+    """
+    Finds the occurrences of a word across the stored documents.
+
+    Args:
+        word (str): The word; case and surrounding punctuation are ignored.
+        limit (int): The maximum number of hits in the page.
+        after (Optional[str]): The `next` cursor returned with the previous page.
+
+    Returns:
+        dict: The `results` (file, timestamps, phonemes and context of each occurrence) and
+              the `next` cursor.
+    """
+    normalized = normalize_word(word)
+    if not normalized:
+        raise ValueError("The query holds no word.")
+    return await _search({'word': normalized}, [('word', 1), ('_id', 1)], limit, after)
+
+async def search_tokens(token_id: int, limit: int, after: Optional[str] = None) -> dict:
+    """
+    Finds the words transcribed with a given Whisper token id across the stored documents.
+
+    Args:
+        token_id (int): The token id, as stored in the `token_id` of the words.
+        limit (int): The maximum number of hits in the page.
+        after (Optional[str]): The `next` cursor returned with the previous page.
+
+    Returns:
+        dict: The `results` and the `next` cursor, as for `search_words`.
+    """
+    return await _search({'token_id': token_id}, [('token_id', 1), ('_id', 1)], limit, after)
+
+async def search_phonemes(phonemes: str, limit: int, after: Optional[str] = None) -> dict:
+    """
+    Finds the words whose phonemes contain a given phoneme sequence.
+
+    The phoneme n-gram index narrows the candidates to the words containing every n-gram of
+    the sequence; for sequences longer than `PHONEME_GRAM_SIZE`, the candidates are checked
+    for the full sequence by the server.
+
+    Args:
+        phonemes (str): The phoneme sequence, e.g. `həl` (delimiters and spaces are ignored).
+        limit (int): The maximum number of hits in the page.
+        after (Optional[str]): The `next` cursor returned with the previous page.
+
+    Returns:
+        dict: The `results` and the `next` cursor, as for `search_words`.
+    """
+    sequence = ''.join(phoneme_text(phonemes).split())
+    if not sequence:
+        raise ValueError("The query holds no phonemes.")
+
+    grams = query_grams(sequence)
+    query: dict = {'phoneme_grams': {'$all': grams}}
+    if len(sequence) > PHONEME_GRAM_SIZE:
+        query['phoneme'] = {'$regex': re.escape(sequence)}
+    return await _search(query, [('phoneme_grams', 1), ('_id', 1)], limit, after)
+
+"""
+======================
+This module answers the search queries of the API from the `word_postings` collection,
+which holds one posting per stored word (see `app.utils.postings`). Every query is served
+by a compound index whose first key is the searched value and whose second key is `_id`,
+so a page of hits is one bounded index range scan, whatever the size of the corpus.
+
+Functions:
+- `search_words`: Occurrences of a word.
+- `search_tokens`: Occurrences of a Whisper token id.
+- `search_phonemes`: Words containing a phoneme sequence, through the phoneme n-gram index.
+
+Pagination:
+- Each response holds up to `limit` hits and a `next` cursor, the `_id` of its last posting.
+  Passing it as `after` returns the following page; it is None on the last page.
+
+Example Usage:
+======================
+    page = await search_words('hello', limit=50)
+    next_page = await search_words('hello', limit=50, after=page['next'])
+"""
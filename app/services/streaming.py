@@ -0,0 +1,316 @@
+import os
+import tempfile
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from app import config
+from app.services.admission import get_admission
+from app.services.async_database import save_to_database_async
+from app.services.audio_processing import TARGET_SAMPLE_RATE, build_document, process_window
+from app.services.cache import audio_digest
+from app.services.uploads import remove_spooled
+from app.services.workers import run_in_pool
+from app.utils.postings import PAUSE_WORD
+from app.utils.timestamps import add_pause_timestamp
+from app.utils.wav import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, wav_header
+
+# Sample formats accepted from clients: (WAVE format tag, NumPy dtype)
+STREAM_ENCODINGS: dict = {
+    'pcm_s16le': (WAVE_FORMAT_PCM, np.dtype('<i2')),
+    'pcm_f32le': (WAVE_FORMAT_IEEE_FLOAT, np.dtype('<f4')),
+}
+# Size of the header written before the samples of the recording
+WAV_HEADER_SIZE: int = 44
+
+class StreamLimitExceeded(Exception):
+    """
+    Raised when a stream exceeds `STREAM_MAX_SECONDS` or `STREAM_MAX_BACKLOG_SECONDS`.
+
+    Args:
+        message (str): The reason, for the client.
+        code (int): The WebSocket close code: 1009 (too big) or 1008 (policy violation).
+    """
+
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+
+class StreamSession:
+    """
+    Incremental processing of a live audio stream.
+
+    Incoming samples are appended to a rolling buffer that starts where the last final word
+    ends. Every `STREAM_STEP_SECONDS` of new audio, the start of the buffer (at most
+    `STREAM_MAX_WINDOW_SECONDS`) is processed again. Words ending at least
+    `STREAM_COMMIT_MARGIN_SECONDS` before the end of the window have enough right context to
+    be final, and the buffer is cut after the last of them; the words after it are tentative.
+    When a window fills up without any final word, all but its last word are made final (or
+    its silence dropped), so the buffer, and with it the latency, stays bounded.
+
+    The stream is also written to a WAV file, which is stored with the document by `finish`.
+    Both the total length of the stream and the audio waiting to be processed are bounded, so
+    neither the buffer nor the recording grows without limit.
+
+    Args:
+        filename (str): The name under which the recording is stored.
+        sample_rate (int): The sample rate of the stream in Hz.
+        encoding (str): The sample format, one of `STREAM_ENCODINGS` (mono).
+
+    Raises:
+        ValueError: If the encoding or sample rate is not supported.
+    """
+
+    def __init__(self, filename: str, sample_rate: int, encoding: str):
+        if encoding not in STREAM_ENCODINGS:
+            raise ValueError(f"Unknown encoding '{encoding}', expected one of {', '.join(STREAM_ENCODINGS)}.")
+        if sample_rate <= 0:
+            raise ValueError(f"Invalid sample rate {sample_rate}.")
+
+        self.filename = filename
+        self.sample_rate = sample_rate
+        self.format_tag, self.dtype = STREAM_ENCODINGS[encoding]
+
+        # Samples after the last final word, and the stream time of the first of them
+        self._chunks: list[np.ndarray] = []
+        self._offset = 0.0
+        # Samples received after the end of the last processed window
+        self._unprocessed = 0
+        # Bytes of a sample split across two messages
+        self._remainder = b''
+
+        self.words: list[dict] = []
+        self.received_samples = 0
+        self.windows = 0
+        self.timings: dict[str, float] = {}
+
+        # The recording, written as it arrives; the header is completed by `finish`
+        descriptor, self.path = tempfile.mkstemp(suffix='.wav', prefix='stream-', dir=config.UPLOAD_SPOOL_DIR or None)
+        self._file = os.fdopen(descriptor, 'wb')
+        self._file.write(wav_header(self.format_tag, 1, sample_rate, 8 * self.dtype.itemsize, 0))
+
+    @property
+    def duration(self) -> float:
+        """
+        The seconds of audio received so far.
+        """
+        return self.received_samples / self.sample_rate
+
+    @property
+    def last_end(self) -> float:
+        """
+        The end of the last final word, in seconds.
+        """
+        return self.words[-1]['end'] if self.words else 0.0
+
+    def append(self, data: bytes) -> None:
+        """
+        Adds raw samples received from the client.
+
+        Args:
+            data (bytes): Samples in the encoding of the session; may end in the middle of a sample.
+
+        Raises:
+            StreamLimitExceeded: If the samples would make the stream longer than
+                                 `STREAM_MAX_SECONDS`, or leave more than
+                                 `STREAM_MAX_BACKLOG_SECONDS` of audio waiting to be processed.
+                                 They are not added.
+        """
+        count = (len(self._remainder) + len(data)) // self.dtype.itemsize
+        if (self.received_samples + count) / self.sample_rate > config.STREAM_MAX_SECONDS:
+            raise StreamLimitExceeded(f"The stream is longer than {config.STREAM_MAX_SECONDS:g} s.", 1009)
+        if (self._unprocessed + count) / self.sample_rate > config.STREAM_MAX_BACKLOG_SECONDS:
+            raise StreamLimitExceeded(
+                f"More than {config.STREAM_MAX_BACKLOG_SECONDS:g} s of audio are waiting to be processed; "
+                "send the stream at most as fast as it is recorded.",
+                1008,
+            )
+
+        self._file.write(data)
+        data = self._remainder + data
+        usable = len(data) - len(data) % self.dtype.itemsize
+        self._remainder = data[usable:]
+
+        samples = np.frombuffer(data[:usable], dtype=self.dtype)
+        if self.dtype.kind == 'i':
+            samples = samples.astype(np.float32) / 32768.0
+        else:
+            samples = samples.astype(np.float32)
+        self._chunks.append(samples)
+        self._unprocessed += samples.shape[0]
+        self.received_samples += samples.shape[0]
+
+    def should_advance(self) -> bool:
+        """
+        Tells whether enough audio arrived since the last window to process the stream again.
+        """
+        return self._unprocessed >= config.STREAM_STEP_SECONDS * self.sample_rate
+
+    def _buffer(self) -> np.ndarray:
+        # Merge the chunks received so far, so the buffer is copied once per window
+        buffer = np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=np.float32)
+        self._chunks = [buffer]
+        return buffer
+
+    def _cut(self, samples: int) -> None:
+        # Drop the start of the buffer, including the chunks received in the meantime
+        buffer = self._buffer()
+        self._chunks = [buffer[samples:]]
+        self._offset += samples / self.sample_rate
+
+    async def advance(self, final: bool = False) -> dict:
+        """
+        Processes the start of the rolling buffer and finalizes the words that are stable.
+
+        Args:
+            final (bool, optional): If true, the stream has ended: the whole buffer is
+                                    processed and every word is final. Defaults to False.
+
+        Returns:
+            dict: The message for the client, containing:
+                - 'type': `partial`.
+                - 'words': The words that became final, in the format of `corpus_app` (with
+                  `<pause>` entries); they never change afterwards.
+                - 'tentative': The words after them, which may still change.
+                - 'duration': The seconds of audio received so far.
+        """
+        max_window = int(config.STREAM_MAX_WINDOW_SECONDS * self.sample_rate)
+        new_words: list[dict] = []
+        tentative: list[dict] = []
+
+        while True:
+            buffer = self._buffer()
+            window = min(buffer.shape[0], max_window)
+            if window == 0:
+                break
+            self._unprocessed = buffer.shape[0] - window
+
+            # The window waits for a pipeline worker like an upload of its length, so the
+            # admission controller accounts for streams; it is never rejected
+            admission = get_admission()
+            ticket = admission.admit(window / self.sample_rate, reject=False) if admission is not None else None
+            try:
+                if ticket is not None:
+                    await admission.acquire(ticket)
+                result = await run_in_pool(process_window, buffer[:window].copy(), self.sample_rate, self._offset)
+            finally:
+                if ticket is not None:
+                    admission.release(ticket)
+            self.windows += 1
+            for stage, seconds in result['timings'].items():
+                self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+            # Pauses are rebuilt relative to the last final word, below
+            spoken = [word for word in result['words'] if word['word'] != PAUSE_WORD]
+            window_end = self._offset + window / self.sample_rate
+            full = window == max_window
+
+            if final and window == buffer.shape[0]:
+                stable, cut = spoken, window
+            else:
+                stable = [word for word in spoken if word['end'] <= window_end - config.STREAM_COMMIT_MARGIN_SECONDS]
+                if not stable and full:
+                    stable = spoken[:-1] if len(spoken) > 1 else spoken
+                if stable:
+                    cut = int(round((stable[-1]['end'] - self._offset) * self.sample_rate))
+                elif full:
+                    # Silence: drop it, keeping the margin in case speech starts at its end
+                    cut = window - int(config.STREAM_COMMIT_MARGIN_SECONDS * self.sample_rate)
+                else:
+                    cut = 0
+                # A full window always moves the buffer on, so the stream keeps up
+                cut = min(max(cut, 1 if full else 0), window)
+
+            if stable:
+                finalized = add_pause_timestamp(stable, start=self.last_end)
+                self.words += finalized
+                new_words += finalized
+            if cut:
+                self._cut(cut)
+            tentative = add_pause_timestamp(spoken[len(stable):], start=self.last_end)
+
+            # A live stream is processed one window per step; a finished one until its end
+            if not final:
+                break
+
+        return {'type': 'partial', 'words': new_words, 'tentative': tentative, 'duration': self.duration}
+
+    async def finish(self) -> dict:
+        """
+        Finalizes the stream and stores its document and recording.
+
+        Returns:
+            dict: The message for the client, containing:
+                - 'type': `final`.
+                - 'document_id': The identifier of the stored document, or None if no audio
+                  was received.
+                - 'words': The words that became final since the last message.
+                - 'duration': The seconds of audio received.
+        """
+        message = await self.advance(final=True)
+
+        # Complete the header of the recording now that its size is known
+        data_size = self._file.tell() - WAV_HEADER_SIZE
+        self._file.seek(0)
+        self._file.write(wav_header(self.format_tag, 1, self.sample_rate, 8 * self.dtype.itemsize, data_size))
+        self._file.close()
+
+        document_id = None
+        if self.received_samples:
+            text = ''.join(word['word'] for word in self.words if word['word'] != PAUSE_WORD).strip()
+            timings = {'total': 0.0, **self.timings}
+            num_samples = int(round(self.received_samples * TARGET_SAMPLE_RATE / self.sample_rate))
+            json_data = build_document(self.filename, num_samples, self.sample_rate, {'text': text}, self.words, timings)
+            json_data['metadata']['stream_windows'] = self.windows
+
+            # Hashing reads the whole recording, so keep it off the event loop thread
+            json_data['audio']['sha256'] = await run_in_threadpool(audio_digest, self.path)
+            with open(self.path, 'rb') as source:
+                document_id = await save_to_database_async(json_data, source, timings)
+
+        return {'type': 'final', 'document_id': document_id, 'words': message['words'], 'duration': self.duration}
+
+    def close(self) -> None:
+        """
+        Releases the temporary recording. Safe to call more than once.
+        """
+        if not self._file.closed:
+            self._file.close()
+        remove_spooled(self.path)
+
+"""
+======================
+This module processes live audio streams incrementally, for the WebSocket route of
+`app.routes.audio_routes`.
+
+Main Components:
+- `StreamSession`: Rolling buffer of a stream, incremental inference, and finalization.
+- `StreamLimitExceeded`: Raised for streams over `STREAM_MAX_SECONDS` or `STREAM_MAX_BACKLOG_SECONDS`.
+- `STREAM_ENCODINGS`: The raw sample formats clients can send.
+
+Workflow:
+1. The client sends mono PCM samples as they are recorded; `append` adds them to the rolling
+   buffer and to a WAV file.
+2. Every `STREAM_STEP_SECONDS` of new audio, `advance` runs `process_window` in the worker
+   pool on the buffer, once the admission controller gives it a slot, and returns the words that became final plus the tentative ones.
+3. When the stream ends, `finish` processes the rest of the buffer, and stores the document
+   and the recording like an upload.
+
+Notes:
+- Word times are in the timeline of the stream, and `<pause>` entries are placed between the
+  final words exactly as `add_pause_timestamp` places them in an uploaded recording.
+- Each window holds at most `STREAM_MAX_WINDOW_SECONDS` of audio, which bounds the inference
+  time per step. Words are final once `STREAM_COMMIT_MARGIN_SECONDS` of audio follow them,
+  so a word reaches the client as final about that long, plus one step and one inference, after it is spoken.
+- Streamed documents have no `content_key`: they are not returned for uploads of the same
+  recording, which are processed as a whole.
+
+Example Usage:
+======================
+    session = StreamSession('live.wav', 16000, 'pcm_s16le')
+    session.append(pcm_bytes)
+    if session.should_advance():
+        message = await session.advance()
+    final_message = await session.finish()
+    session.close()
+"""
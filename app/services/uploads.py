@@ -0,0 +1,125 @@
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from app import config
+from app.utils.archives import audio_members
+
+def _spool(source: BinaryIO, suffix: str) -> tuple[str, str]:
+    """
+    Copies a file object to a new temporary file in chunks, hashing the bytes on the way.
+    """
+    digest = hashlib.sha256()
+    descriptor, path = tempfile.mkstemp(suffix=suffix, prefix="upload-", dir=config.UPLOAD_SPOOL_DIR or None)
+    try:
+        with os.fdopen(descriptor, 'wb') as spooled:
+            while chunk := source.read(config.UPLOAD_CHUNK_BYTES):
+                digest.update(chunk)
+                spooled.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+async def spool_upload(file: UploadFile) -> tuple[str, str]:
+    """
+    Writes an uploaded file to a temporary file on disk, chunk by chunk.
+
+    Only one chunk of the upload is held in memory at a time, and its SHA-256 digest is
+    computed in the same pass, so the file is never read twice. The caller owns the
+    temporary file and must delete it with `remove_spooled`.
+
+    Args:
+        file (UploadFile): The uploaded file.
+
+    Returns:
+        tuple[str, str]: The path of the temporary file and the digest of its bytes.
+    """
+    # Keep the extension, so decoders that rely on it can tell the container format
+    suffix = os.path.splitext(file.filename or "")[1]
+    await file.seek(0)
+    return await run_in_threadpool(_spool, file.file, suffix)
+
+def _spool_members(archive_path: str, filename: str, max_files: int, max_bytes: int) -> list[tuple[str, str, str]]:
+    """
+    Spools the audio members of an archive to temporary files, one member at a time.
+    """
+    spooled = []
+    try:
+        for member, name in audio_members(archive_path, filename, max_files, max_bytes):
+            path, digest = _spool(member, os.path.splitext(name)[1])
+            spooled.append((path, name, digest))
+    except BaseException:
+        for path, _, _ in spooled:
+            remove_spooled(path)
+        raise
+    return spooled
+
+async def spool_archive(file: UploadFile, max_files: int, max_bytes: int) -> list[tuple[str, str, str]]:
+    """
+    Extracts the audio files of an uploaded zip or tar archive to temporary files.
+
+    The archive is spooled to disk first, and its members are then copied out chunk by chunk,
+    so neither the archive nor its members are ever held in memory as a whole. The caller owns
+    the temporary files and must delete them with `remove_spooled`.
+
+    Args:
+        file (UploadFile): The uploaded archive.
+        max_files (int): Maximum number of audio members.
+        max_bytes (int): Maximum total uncompressed size of the audio members, in bytes.
+
+    Returns:
+        list[tuple[str, str, str]]: The path of the temporary file, the path within the archive,
+                                    and the digest of every audio member, in archive order.
+
+    Raises:
+        ValueError: If the archive cannot be read or exceeds one of the limits.
+    """
+    archive_path, _ = await spool_upload(file)
+    try:
+        # Decompressing may take a while, so keep it off the event loop thread
+        return await run_in_threadpool(_spool_members, archive_path, file.filename, max_files, max_bytes)
+    finally:
+        remove_spooled(archive_path)
+
+def remove_spooled(path: str) -> None:
+    """
+    Deletes a temporary file created by `spool_upload`, if it still exists.
+
+    Args:
+        path (str): The path returned by `spool_upload`.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+"""
+======================
+This module implements the streaming ingestion path: uploads are spooled to disk in chunks
+instead of being read into memory, so the memory used per request scales with
+`UPLOAD_CHUNK_BYTES`, not with the size of the file.
+
+Functions:
+- `spool_upload`: Copies an upload to a temporary file, hashing it in the same pass.
+- `spool_archive`: Copies the audio members of an uploaded archive to temporary files, within size limits.
+- `remove_spooled`: Deletes a spooled file once the upload has been handled.
+
+Workflow:
+1. The route spools the upload with `spool_upload` and passes the path on.
+2. The worker decodes the audio from the path; WAV files are memory-mapped (see `app.utils.wav`).
+3. The audio is streamed into GridFS from an open file handle.
+4. The route (or job) deletes the temporary file with `remove_spooled`.
+
+Example Usage:
+======================
+    path, digest = await spool_upload(file)
+    try:
+        result = await handle_upload(path, file.filename, digest)
+    finally:
+        remove_spooled(path)
+"""
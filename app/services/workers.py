@@ -0,0 +1,103 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app import config
+from app.services.model_registry import load_models
+
+# Pool shared by every request of this process, created by `start_pool`
+_executor: Optional[Executor] = None
+
+def _init_worker() -> None:
+    """
+    Initializer of each worker process: loads the models once for the lifetime of the worker.
+    """
+    # A process worker runs one job at a time, so there is nothing to batch phonemes with
+    config.PHONEME_BATCHING = False
+    if config.PRELOAD_MODELS:
+        load_models()
+
+def _worker_ready() -> bool:
+    """
+    No-op task used to make the pool start its workers eagerly.
+    """
+    return True
+
+def start_pool() -> Executor:
+    """
+    Creates the worker pool that runs the CPU-bound processing pipeline.
+
+    With `WORKER_POOL=process`, the workers are separate processes that load their own
+    copy of the models, so inference never competes with the event loop for the GIL.
+    With `WORKER_POOL=thread`, the workers share the models of this process, which lets
+    concurrent requests be batched by the phoneme batcher.
+
+    Returns:
+        Executor: The worker pool.
+    """
+    global _executor
+    if _executor is not None:
+        return _executor
+
+    if config.WORKER_POOL == "process":
+        # "spawn" avoids forking a parent that may already hold OpenMP or torch threads
+        _executor = ProcessPoolExecutor(
+            max_workers=config.WORKER_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        # Submitting one task per worker makes the pool start (and warm up) all of them now
+        for _ in range(config.WORKER_POOL_SIZE):
+            _executor.submit(_worker_ready)
+    elif config.WORKER_POOL == "thread":
+        _executor = ThreadPoolExecutor(max_workers=config.WORKER_POOL_SIZE, thread_name_prefix="pipeline")
+    else:
+        raise ValueError(f"Unknown WORKER_POOL '{config.WORKER_POOL}', expected 'process' or 'thread'.")
+
+    return _executor
+
+def shutdown_pool() -> None:
+    """
+    Shuts the worker pool down, waiting for the running jobs to finish.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+async def run_in_pool(func: Callable, *args):
+    """
+    Runs a function in the worker pool without blocking the event loop.
+
+    Args:
+        func (Callable): The function to run. With a process pool it must be picklable,
+                         i.e. defined at module level.
+        *args: Positional arguments passed to `func`.
+
+    Returns:
+        The return value of `func`.
+    """
+    executor = start_pool()
+    return await asyncio.wrap_future(executor.submit(func, *args))
+
+"""
+======================
+This module manages the bounded pool of workers that run the CPU-bound audio pipeline, so
+that long clips never block the FastAPI event loop (and with it, every other request).
+
+Functions:
+- `start_pool`: Creates the process or thread pool configured by `WORKER_POOL`.
+- `shutdown_pool`: Waits for running jobs and releases the workers.
+- `run_in_pool`: Awaits a function executed in the pool.
+
+Workflow:
+1. The application lifespan in `app/main.py` calls `start_pool` at startup.
+2. Each process worker loads and warms up the models once, in `_init_worker`.
+3. Routes and the job manager await `run_in_pool(process_audio, ...)`.
+4. `shutdown_pool` is called when the application stops.
+
+Example Usage:
+======================
+    json_data = await run_in_pool(process_audio, audio_bytes, "example_audio.wav")
+"""
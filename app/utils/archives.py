@@ -0,0 +1,90 @@
+import os
+import tarfile
+import zipfile
+from typing import BinaryIO, Iterator
+
+# Extensions of the archive members treated as audio files
+AUDIO_EXTENSIONS: frozenset = frozenset({'.wav', '.mp3', '.flac', '.ogg', '.m4a', '.webm', '.opus', '.aac'})
+
+def is_archive(filename: str) -> bool:
+    """
+    Tells whether an uploaded file is a zip or tar archive, judging by its name.
+
+    Args:
+        filename (str): The name of the uploaded file.
+
+    Returns:
+        bool: True for `.zip`, `.tar`, `.tar.gz`, `.tgz`, `.tar.bz2` and `.tar.xz` files.
+    """
+    name = filename.lower()
+    return name.endswith(('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz'))
+
+def _is_audio(name: str) -> bool:
+    basename = os.path.basename(name)
+    # Skip hidden files, such as the `._*` resource forks added by macOS
+    return not basename.startswith('.') and os.path.splitext(basename)[1].lower() in AUDIO_EXTENSIONS
+
+def audio_members(archive_path: str, filename: str, max_files: int, max_bytes: int) -> Iterator[tuple[BinaryIO, str]]:
+    """
+    Yields the audio files of a zip or tar archive as file objects, without reading them.
+
+    The member count and the uncompressed sizes recorded in the archive are checked before
+    anything is decompressed. Reads of a member stop at its recorded size, so an archive that
+    understates its sizes cannot decompress to more than the limits either.
+
+    Args:
+        archive_path (str): The path of the archive, e.g. a spooled upload.
+        filename (str): The name of the archive, used to tell zip from tar.
+        max_files (int): Maximum number of audio members.
+        max_bytes (int): Maximum total uncompressed size of the audio members, in bytes.
+
+    Yields:
+        tuple[BinaryIO, str]: A file object reading the member and its path within the
+                              archive, for every audio member, in archive order. Other
+                              members are ignored. Each file object is only valid until
+                              the next member is requested.
+
+    Raises:
+        ValueError: If the archive cannot be read or exceeds one of the limits.
+    """
+    try:
+        if filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(archive_path) as archive:
+                members = [info for info in archive.infolist() if not info.is_dir() and _is_audio(info.filename)]
+                _check_limits(filename, [info.file_size for info in members], max_files, max_bytes)
+                for info in members:
+                    with archive.open(info) as member:
+                        yield member, info.filename
+        else:
+            with tarfile.open(archive_path) as archive:
+                members = [member for member in archive.getmembers() if member.isfile() and _is_audio(member.name)]
+                _check_limits(filename, [member.size for member in members], max_files, max_bytes)
+                for member in members:
+                    with archive.extractfile(member) as source:
+                        yield source, member.name
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise ValueError(f"Could not read archive '{filename}': {e}") from e
+
+def _check_limits(filename: str, sizes: list[int], max_files: int, max_bytes: int) -> None:
+    if len(sizes) > max_files:
+        raise ValueError(f"Archive '{filename}' holds {len(sizes)} audio files, only {max(0, max_files)} more are allowed.")
+    if sum(sizes) > max_bytes:
+        raise ValueError(f"Archive '{filename}' holds {sum(sizes)} bytes of audio, only {max(0, max_bytes)} more are allowed.")
+
+"""
+======================
+This module unpacks the archives accepted by the batch upload endpoint, so a whole corpus
+can be sent in one request. Members are streamed out of the archive one at a time (see
+`spool_archive` in `app.services.uploads`) and written to temporary files with generated
+names, so paths inside the archive cannot escape any directory.
+
+Functions:
+- `is_archive`: Tells archives from audio files by extension.
+- `audio_members`: Checks the member count and sizes of a zip or tar archive, and yields its audio members.
+
+Example Usage:
+======================
+    if is_archive(filename):
+        for member, name in audio_members(archive_path, filename, max_files=1000, max_bytes=2**31):
+            shutil.copyfileobj(member, output)
+"""
@@ -0,0 +1,181 @@
+import math
+
+import numpy as np
+from bson.binary import Binary
+
+# Identifier of the encoding, stored with the data so it can evolve
+COLUMNAR_FORMAT: str = 'columnar-v1'
+# Whisper reports times with two decimals; float32 keeps them to well within that precision
+TIME_DECIMALS: int = 2
+# Keys a word may have; words with other keys cannot be encoded
+WORD_KEYS: frozenset = frozenset({'word', 'start', 'end', 'probability', 'token_id', 'phoneme'})
+
+def _dictionary_encode(values: list) -> dict:
+    """
+    Replaces repeated strings by int32 indices into a list of distinct values (-1 for missing).
+    """
+    positions: dict[str, int] = {}
+    indices = np.fromiter(
+        (-1 if value is None else positions.setdefault(value, len(positions)) for value in values),
+        dtype='<i4',
+        count=len(values),
+    )
+    return {'values': list(positions), 'index': Binary(indices.tobytes())}
+
+def _dictionary_decode(column: dict) -> list:
+    values = column['values']
+    return [None if i < 0 else values[i] for i in np.frombuffer(column['index'], dtype='<i4').tolist()]
+
+def encode_words(words: list[dict]) -> dict:
+    """
+    Encodes a list of word dictionaries into parallel typed columns.
+
+    Times are stored as little-endian float32 arrays, probabilities as a float64 array and
+    token ids as an int32 array, each as a single BSON binary value; words and phonemes are
+    dictionary-encoded.
+    Missing values (e.g., the `probability` of a `<pause>` entry) are stored as NaN or -1.
+
+    Args:
+        words (list[dict]): The words returned by `corpus_app`, including `<pause>` entries.
+
+    Returns:
+        dict: The columnar representation, to be decoded by `decode_words`.
+
+    Raises:
+        ValueError: If a word has keys other than `WORD_KEYS`.
+    """
+    for word in words:
+        unknown = word.keys() - WORD_KEYS
+        if unknown:
+            raise ValueError(f"Cannot encode word keys {sorted(unknown)} in columnar format.")
+
+    def float_column(key: str, dtype: str) -> Binary:
+        values = [word.get(key) for word in words]
+        return Binary(np.array([math.nan if value is None else value for value in values], dtype=dtype).tobytes())
+
+    return {
+        'format': COLUMNAR_FORMAT,
+        'count': len(words),
+        'start': float_column('start', '<f4'),
+        'end': float_column('end', '<f4'),
+        # float64, so the stored probability is exactly the one Whisper reported
+        'probability': float_column('probability', '<f8'),
+        'token_id': Binary(np.array([word.get('token_id', -1) for word in words], dtype='<i4').tobytes()),
+        'word': _dictionary_encode([word.get('word') for word in words]),
+        'phoneme': _dictionary_encode([word.get('phoneme') for word in words]),
+    }
+
+def decode_columns(columns: dict) -> dict[str, np.ndarray]:
+    """
+    Decodes the numeric columns as NumPy arrays, without building any dictionaries.
+
+    Args:
+        columns (dict): The output of `encode_words`.
+
+    Returns:
+        dict[str, np.ndarray]: The float32 `start` and `end` columns, the float64 `probability`
+                               column and the int32 `token_id` column, as read-only arrays over
+                               the stored bytes.
+    """
+    if columns.get('format') != COLUMNAR_FORMAT:
+        raise ValueError(f"Unsupported words format '{columns.get('format')}'.")
+    return {
+        'start': np.frombuffer(columns['start'], dtype='<f4'),
+        'end': np.frombuffer(columns['end'], dtype='<f4'),
+        'probability': np.frombuffer(columns['probability'], dtype='<f8'),
+        'token_id': np.frombuffer(columns['token_id'], dtype='<i4'),
+    }
+
+def decode_words(columns: dict) -> list[dict]:
+    """
+    Rebuilds the list of word dictionaries from its columnar representation.
+
+    Args:
+        columns (dict): The output of `encode_words`.
+
+    Returns:
+        list[dict]: The words, with the keys and key order of `corpus_app`'s output. Times are
+                    rounded back to `TIME_DECIMALS` decimals; probabilities are exact.
+    """
+    arrays = decode_columns(columns)
+    starts = np.round(arrays['start'].astype(np.float64), TIME_DECIMALS).tolist()
+    ends = np.round(arrays['end'].astype(np.float64), TIME_DECIMALS).tolist()
+    probabilities = arrays['probability'].tolist()
+    token_ids = arrays['token_id'].tolist()
+    texts = _dictionary_decode(columns['word'])
+    phonemes = _dictionary_decode(columns['phoneme'])
+
+    words = []
+    for text, start, end, probability, token_id, phoneme in zip(texts, starts, ends, probabilities, token_ids, phonemes):
+        word = {'word': text, 'start': start, 'end': end}
+        if not math.isnan(probability):
+            word['probability'] = probability
+        if token_id >= 0:
+            word['token_id'] = token_id
+        if phoneme is not None:
+            word['phoneme'] = phoneme
+        words.append(word)
+    return words
+
+def encode_document_words(json_data: dict) -> dict:
+    """
+    Replaces the `words` list of a document with its columnar encoding, `words_columnar`.
+
+    Documents whose words cannot be encoded are left unchanged.
+
+    Args:
+        json_data (dict): The document returned by `process_audio`.
+
+    Returns:
+        dict: The same document, modified in place.
+    """
+    words = json_data.get('words')
+    if words is None:
+        return json_data
+    try:
+        json_data['words_columnar'] = encode_words(words)
+    except ValueError:
+        return json_data
+    del json_data['words']
+    return json_data
+
+def document_words(document: dict) -> list[dict]:
+    """
+    Returns the words of a stored document in list-of-dictionaries form, whichever format it uses.
+
+    Args:
+        document (dict): A document read from the `documents` collection.
+
+    Returns:
+        list[dict]: The words, as returned by `corpus_app`.
+    """
+    if 'words_columnar' in document:
+        return decode_words(document['words_columnar'])
+    return document.get('words', [])
+
+"""
+======================
+This module implements the columnar storage format for the per-word data of a document.
+Instead of one BSON sub-document per word, repeating every key, the words are stored as a
+few parallel columns:
+
+- `start`, `end`: float32 arrays, one BSON binary value each.
+- `probability`: a float64 array, so the stored value is exactly the one Whisper reported.
+- `token_id`: an int32 array, as a BSON binary value.
+- `word`, `phoneme`: dictionary-encoded; the distinct strings plus an int32 index array.
+
+This roughly halves the size of the words (more when words and phonemes repeat), keeps long
+recordings further from the 16 MB BSON limit, and lets analytics read whole columns as NumPy arrays (see `decode_columns`).
+
+Functions:
+- `encode_words` / `decode_words`: Convert between the list of word dictionaries and columns.
+- `decode_columns`: Reads the numeric columns without materializing the words.
+- `encode_document_words`: Used by the save paths when `WORDS_STORAGE=columnar`.
+- `document_words`: Reads the words of a document in either format.
+
+Example Usage:
+======================
+    columns = encode_words(json_data['words'])
+    words = decode_words(columns)
+    starts = decode_columns(columns)['start']
+"""
@@ -1,72 +1,222 @@
-import torch
-from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
-
-def phonemizer(audio: torch.Tensor, sample_rate: int) -> list[dict]:
-    """
-    Phonemizes an audio waveform by converting it into a sequence of phonemes with character offsets.
-
-    Args:
-        audio (torch.Tensor): The audio waveform as a PyTorch tensor. Typically a 1D tensor for mono audio.
-        sample_rate (int): The sample rate of the audio in Hz.
-
-    Returns:
-        list[dict]: A list of character offsets with phoneme information. Each dictionary contains:
-            - 'char': The predicted character or phoneme.
-            - 'start_offset': The starting offset of the character in the audio.
-    """
-    print("Loading Wav2Vec model...")
-
-    # Load the Wav2Vec2 processor and model
-    wav2vec_processor = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-xlsr-53-espeak-cv-ft")
-    wav2vec_model = Wav2Vec2ForCTC.from_pretrained("facebook/wav2vec2-xlsr-53-espeak-cv-ft")
-    
-    # Convert the audio waveform into input values for the Wav2Vec2 model
-    input_values = wav2vec_processor(audio, return_tensors="pt", sampling_rate=sample_rate).input_values
-
-    # Perform inference to get logits (model output)
-    with torch.no_grad():
-        logits = wav2vec_model(input_values).logits
-
-    # Decode logits to predicted character IDs
-    predicted_ids = torch.max(logits, dim=-1).indices
-
-    # Decode the predicted IDs to characters and obtain character offsets
-    decoded_ids = wav2vec_processor.batch_decode(predicted_ids, output_char_offsets=True)
-
-    # Extract character offsets from the decoded output
-    char_offsets = decoded_ids['char_offsets'][0]
-
-    return char_offsets
-
-"""
-======================
-This module provides functionality for phonemizing audio waveforms using the Wav2Vec2 model
-pretrained with Espeak.
-
-Main Function:
-- `phonemizer`: Converts an audio waveform into phonemes with character offsets.
-
-Workflow:
-1. Load the Wav2Vec2 processor and model from the Hugging Face Transformers library.
-2. Convert the audio waveform into input values required by the model.
-3. Perform inference on the input values to obtain logits.
-4. Decode logits into phonemes with character offsets using the processor.
-
-Dependencies:
-- `transformers`: Provides the Wav2Vec2 model and processor.
-- `torch`: Used for tensor computations and managing model inference.
-
-Example Usage:
-======================
-1. Load a mono audio waveform using PyTorch or Torchaudio.
-2. Call the `phonemizer` function with the waveform and sample rate.
-
-Output:
-The function returns a list of dictionaries, where each dictionary contains:
-    - 'char': The predicted character or phoneme.
-    - 'start_offset': The timestamp (in samples) where the character begins in the audio.
-
-Performance Notes:
-- The pretrained model ("facebook/wav2vec2-xlsr-53-espeak-cv-ft") is optimized for phoneme transcription.
-- Ensure the input audio is mono and matches the sample rate of the model.
-"""
+import torch
+from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
+
+def phonemizer(
+    audio: torch.Tensor,
+    sample_rate: int,
+    wav2vec_processor: Wav2Vec2Processor,
+    wav2vec_model: Wav2Vec2ForCTC
+) -> list[dict]:
+    """
+    Phonemizes an audio waveform by converting it into a sequence of phonemes with character offsets.
+
+    Args:
+        audio (torch.Tensor): The audio waveform as a PyTorch tensor. Typically a 1D tensor for mono audio.
+        sample_rate (int): The sample rate of the audio in Hz.
+        wav2vec_processor (Wav2Vec2Processor): A loaded Wav2Vec2 processor, usually obtained from the model registry.
+        wav2vec_model (Wav2Vec2ForCTC): A loaded Wav2Vec2 CTC model, usually obtained from the model registry.
+
+    Returns:
+        list[dict]: A list of character offsets with phoneme information. Each dictionary contains:
+            - 'char': The predicted character or phoneme.
+            - 'start_offset': The starting offset of the character in the audio.
+    """
+    # Convert the audio waveform into input values for the Wav2Vec2 model
+    input_values = wav2vec_processor(audio, return_tensors="pt", sampling_rate=sample_rate).input_values
+
+    # Perform inference to get logits (model output)
+    with torch.no_grad():
+        logits = wav2vec_model(input_values).logits
+
+    # Decode logits to predicted character IDs
+    predicted_ids = torch.max(logits, dim=-1).indices
+
+    # Decode the predicted IDs to characters and obtain character offsets
+    decoded_ids = wav2vec_processor.batch_decode(predicted_ids, output_char_offsets=True)
+
+    # Extract character offsets from the decoded output
+    char_offsets = decoded_ids['char_offsets'][0]
+
+    return char_offsets
+
+def _batch_predicted_ids(
+    audios: list[torch.Tensor],
+    sample_rate: int,
+    wav2vec_processor: Wav2Vec2Processor,
+    wav2vec_model: Wav2Vec2ForCTC
+) -> list[torch.Tensor]:
+    """
+    Runs several waveforms through the Wav2Vec2 model in one padded forward pass.
+
+    Returns:
+        list[torch.Tensor]: The predicted character IDs of each waveform, trimmed to the
+                            number of frames of its own (non-padded) samples.
+    """
+    # Pad the waveforms into a single batch and build the matching attention mask
+    inputs = wav2vec_processor(
+        [audio.numpy() for audio in audios],
+        return_tensors="pt",
+        sampling_rate=sample_rate,
+        padding=True,
+        return_attention_mask=True,
+    )
+
+    # Perform inference on the whole batch at once
+    with torch.no_grad():
+        logits = wav2vec_model(inputs.input_values, attention_mask=inputs.attention_mask).logits
+
+    predicted_ids = torch.max(logits, dim=-1).indices
+
+    # Number of logit frames that correspond to real (non-padded) samples of each input
+    output_lengths = wav2vec_model._get_feat_extract_output_lengths(inputs.attention_mask.sum(dim=-1))
+
+    return [ids[:int(length)] for ids, length in zip(predicted_ids, output_lengths)]
+
+def batch_phonemizer(
+    audios: list[torch.Tensor],
+    sample_rate: int,
+    wav2vec_processor: Wav2Vec2Processor,
+    wav2vec_model: Wav2Vec2ForCTC
+) -> list[list[dict]]:
+    """
+    Phonemizes several audio waveforms with a single forward pass of the Wav2Vec2 model.
+
+    The waveforms are padded to the longest one and an attention mask keeps the padding
+    from influencing the predictions. The logits of each waveform are trimmed back to its
+    own length before decoding, so the offsets match those of `phonemizer`.
+
+    Args:
+        audios (list[torch.Tensor]): The mono audio waveforms, all sampled at `sample_rate`.
+        sample_rate (int): The sample rate of the audio in Hz.
+        wav2vec_processor (Wav2Vec2Processor): A loaded Wav2Vec2 processor.
+        wav2vec_model (Wav2Vec2ForCTC): A loaded Wav2Vec2 CTC model.
+
+    Returns:
+        list[list[dict]]: One list of character offsets per input waveform, in input order.
+    """
+    char_offsets_list: list[list[dict]] = []
+    for ids in _batch_predicted_ids(audios, sample_rate, wav2vec_processor, wav2vec_model):
+        decoded_ids = wav2vec_processor.batch_decode(ids.unsqueeze(0), output_char_offsets=True)
+        char_offsets_list.append(decoded_ids['char_offsets'][0])
+
+    return char_offsets_list
+
+def chunked_phonemizer(
+    audio: torch.Tensor,
+    sample_rate: int,
+    wav2vec_processor: Wav2Vec2Processor,
+    wav2vec_model: Wav2Vec2ForCTC,
+    window_seconds: float = 20.0,
+    overlap_seconds: float = 2.0,
+    batch_size: int = 1
+) -> list[dict]:
+    """
+    Phonemizes a long waveform with overlapping windows, keeping peak memory bounded by the
+    window size instead of the recording length.
+
+    Each window is run through the model (optionally several windows per forward pass), and
+    only the frames in the middle of each overlap are kept, so every frame is predicted with
+    context on both sides. The predicted IDs of all windows are stitched into one global
+    sequence and decoded once, which yields `start_offset` values in the global timeline and
+    merges characters repeated across window boundaries exactly as CTC decoding would.
+
+    Args:
+        audio (torch.Tensor): The mono audio waveform.
+        sample_rate (int): The sample rate of the audio in Hz.
+        wav2vec_processor (Wav2Vec2Processor): A loaded Wav2Vec2 processor.
+        wav2vec_model (Wav2Vec2ForCTC): A loaded Wav2Vec2 CTC model.
+        window_seconds (float, optional): Length of each window in seconds. Defaults to 20.
+        overlap_seconds (float, optional): Overlap between consecutive windows in seconds. Defaults to 2.
+        batch_size (int, optional): Number of windows per forward pass. Defaults to 1.
+
+    Returns:
+        list[dict]: The character offsets of the whole waveform, as returned by `phonemizer`.
+    """
+    # Number of samples per output frame of the model (320 for wav2vec2)
+    frame_stride = 1
+    for stride in wav2vec_model.config.conv_stride:
+        frame_stride *= stride
+
+    total = audio.shape[-1]
+    window = int(window_seconds * sample_rate) // frame_stride * frame_stride
+    overlap = int(overlap_seconds * sample_rate) // frame_stride * frame_stride
+    hop = window - overlap
+    if hop <= 0:
+        raise ValueError("The window must be longer than the overlap.")
+
+    # Short recordings fit in a single window
+    if total <= window:
+        return phonemizer(audio, sample_rate, wav2vec_processor, wav2vec_model)
+
+    # Window starts, aligned to frame boundaries; the last window is stretched to the end
+    starts = list(range(0, total - window, hop))
+    last_start = (total - window) // frame_stride * frame_stride
+    if starts[-1] != last_start:
+        starts.append(last_start)
+    ends = [start + window for start in starts[:-1]] + [total]
+
+    # Each window contributes the frames between the midpoints of its overlaps
+    total_frames = int(wav2vec_model._get_feat_extract_output_lengths(torch.tensor(total)))
+    boundaries = [0]
+    for next_start, end in zip(starts[1:], ends[:-1]):
+        boundaries.append((next_start + end) // 2 // frame_stride)
+    boundaries.append(total_frames)
+
+    pad_token_id = wav2vec_processor.tokenizer.pad_token_id
+    global_ids = torch.full((total_frames,), pad_token_id, dtype=torch.long)
+
+    for first in range(0, len(starts), batch_size):
+        indices = range(first, min(first + batch_size, len(starts)))
+        batch_ids = _batch_predicted_ids(
+            [audio[starts[i]:ends[i]] for i in indices],
+            sample_rate,
+            wav2vec_processor,
+            wav2vec_model,
+        )
+        for i, ids in zip(indices, batch_ids):
+            # Copy the kept frames of the window into the global sequence
+            frame_offset = starts[i] // frame_stride
+            keep_start, keep_end = boundaries[i], min(boundaries[i + 1], frame_offset + len(ids))
+            global_ids[keep_start:keep_end] = ids[keep_start - frame_offset:keep_end - frame_offset]
+
+    # Decode the stitched sequence once to obtain global character offsets
+    decoded_ids = wav2vec_processor.batch_decode(global_ids.unsqueeze(0), output_char_offsets=True)
+
+    return decoded_ids['char_offsets'][0]
+
+"""
+======================
+This module provides functionality for phonemizing audio waveforms using the Wav2Vec2 model
+pretrained with Espeak.
+
+Main Functions:
+- `phonemizer`: Converts an audio waveform into phonemes with character offsets.
+- `batch_phonemizer`: Converts several waveforms at once using a padded batch and an attention mask.
+- `chunked_phonemizer`: Converts long waveforms with overlapping windows and bounded memory.
+
+Workflow:
+1. Receive an already loaded Wav2Vec2 processor and model (see `app.services.model_registry`).
+2. Convert the audio waveform into input values required by the model.
+3. Perform inference on the input values to obtain logits.
+4. Decode logits into phonemes with character offsets using the processor.
+
+Dependencies:
+- `transformers`: Provides the Wav2Vec2 model and processor.
+- `torch`: Used for tensor computations and managing model inference.
+
+Example Usage:
+======================
+1. Load a mono audio waveform using PyTorch or Torchaudio.
+2. Call the `phonemizer` function with the waveform, sample rate, and the cached processor and model.
+
+Output:
+The function returns a list of dictionaries, where each dictionary contains:
+    - 'char': The predicted character or phoneme.
+    - 'start_offset': The timestamp (in samples) where the character begins in the audio.
+
+Performance Notes:
+- The pretrained model ("facebook/wav2vec2-xlsr-53-espeak-cv-ft") is optimized for phoneme transcription.
+- Ensure the input audio is mono and matches the sample rate of the model.
+- A single forward pass needs attention memory quadratic in the audio length; use
+  `chunked_phonemizer` for long recordings.
+"""
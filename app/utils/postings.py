@@ -0,0 +1,145 @@
+import re
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+
+# Phoneme strings are indexed by all their substrings of up to this many characters
+PHONEME_GRAM_SIZE: int = 3
+# Marker used by `add_pause_timestamp` for silences; pauses are not indexed
+PAUSE_WORD: str = '<pause>'
+
+# Indexes of the `word_postings` collection. Every lookup key is paired with `_id`, so the
+# hits of a key are read in index order and pages continue from the last `_id` seen
+POSTING_INDEXES: list[IndexModel] = [
+    IndexModel([('document_id', ASCENDING), ('position', ASCENDING)], unique=True),
+    IndexModel([('word', ASCENDING), ('_id', ASCENDING)]),
+    IndexModel([('token_id', ASCENDING), ('_id', ASCENDING)]),
+    IndexModel([('phoneme_grams', ASCENDING), ('_id', ASCENDING)]),
+]
+
+_EDGE_PUNCTUATION = re.compile(r'^[\W_]+|[\W_]+$')
+
+def normalize_word(text: str) -> str:
+    """
+    Normalizes a transcribed word for lookups: case-folded, without surrounding whitespace
+    or punctuation (inner apostrophes and hyphens are kept).
+
+    Args:
+        text (str): The word as transcribed by Whisper, e.g. `' Hello,'`.
+
+    Returns:
+        str: The normalized word, e.g. `'hello'`.
+    """
+    return _EDGE_PUNCTUATION.sub('', text.strip()).casefold()
+
+def phoneme_text(phoneme: str) -> str:
+    """
+    Strips the `/` delimiters `corpus_app` puts around the phonemes of a word.
+    """
+    return phoneme.strip('/')
+
+def phoneme_grams(phonemes: str, size: int = PHONEME_GRAM_SIZE) -> list[str]:
+    """
+    Returns the distinct substrings of a phoneme string of 1 to `size` characters.
+
+    Args:
+        phonemes (str): The phonemes of a word, without delimiters.
+        size (int): The longest substring to include.
+
+    Returns:
+        list[str]: The n-grams, in order of first occurrence.
+    """
+    grams = {}
+    for n in range(1, size + 1):
+        for i in range(len(phonemes) - n + 1):
+            grams.setdefault(phonemes[i:i + n], None)
+    return list(grams)
+
+def query_grams(phonemes: str, size: int = PHONEME_GRAM_SIZE) -> list[str]:
+    """
+    Returns the n-grams a word must contain to possibly match a phoneme query.
+
+    Queries of up to `size` characters are a single indexed gram; longer ones are covered
+    by their overlapping `size`-grams, and candidates are then checked for the full sequence.
+
+    Args:
+        phonemes (str): The queried phoneme sequence, without delimiters.
+        size (int): The n-gram size of the index.
+
+    Returns:
+        list[str]: The n-grams to look up.
+    """
+    if len(phonemes) <= size:
+        return [phonemes]
+    return list(dict.fromkeys(phonemes[i:i + size] for i in range(len(phonemes) - size + 1)))
+
+def build_postings(document_id: ObjectId, filename: str, words: list[dict], context_words: int = 5) -> list[dict]:
+    """
+    Builds the `word_postings` entries of a document: one per spoken word.
+
+    Args:
+        document_id (ObjectId): The identifier of the document in the `documents` collection.
+        filename (str): The name of the audio file, returned with every search hit.
+        words (list[dict]): The words returned by `corpus_app`, including `<pause>` entries.
+        context_words (int): Words of surrounding text stored with every posting on each side.
+
+    Returns:
+        list[dict]: The postings, in the order of the words.
+    """
+    spoken = [(position, word) for position, word in enumerate(words) if word.get('word') != PAUSE_WORD]
+    texts = [word['word'].strip() for _, word in spoken]
+
+    postings = []
+    for i, (position, word) in enumerate(spoken):
+        posting = {
+            'document_id': document_id,
+            'position': position,
+            'file': filename,
+            'word': normalize_word(word['word']),
+            'text': texts[i],
+            'start': word['start'],
+            'end': word['end'],
+            'context': {
+                'before': ' '.join(texts[max(0, i - context_words):i]),
+                'after': ' '.join(texts[i + 1:i + 1 + context_words]),
+            },
+        }
+        if 'token_id' in word:
+            posting['token_id'] = word['token_id']
+        phonemes: Optional[str] = word.get('phoneme')
+        if phonemes is not None:
+            posting['phoneme'] = phoneme_text(phonemes)
+            posting['phoneme_grams'] = phoneme_grams(posting['phoneme'])
+        postings.append(posting)
+    return postings
+
+"""
+======================
+This module builds the entries of the `word_postings` collection, the inverted index that
+makes stored words searchable without scanning and unpacking every document.
+
+Every spoken word of a document becomes one posting, holding what a search hit returns
+(file, timestamps, the word as transcribed, a few words of context) and the indexed keys:
+
+- `word`: The normalized word (see `normalize_word`).
+- `token_id`: The Whisper token id of the word.
+- `phoneme_grams`: Every 1- to `PHONEME_GRAM_SIZE`-character substring of the word's
+  phonemes, so any phoneme sequence can be looked up through a multikey index.
+
+The `(document_id, position)` index is unique, so indexing a document twice (e.g. when a
+write is retried) never duplicates its postings.
+
+Functions:
+- `normalize_word`: Normalization shared by indexing and queries.
+- `phoneme_grams` / `query_grams`: The n-grams indexed for a word and looked up for a query.
+- `build_postings`: The postings of a document, from its list of words.
+
+Notes:
+- `<pause>` entries are not indexed. Phoneme sequences are matched within a word.
+
+Example Usage:
+======================
+    postings = build_postings(document_id, 'interview.wav', document_words(document))
+    db.word_postings.insert_many(postings)
+"""
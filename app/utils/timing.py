@@ -0,0 +1,48 @@
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+@contextmanager
+def timed(timings: dict, stage: str):
+    """
+    Measures the wall time of a block and adds it, in seconds, to `timings[stage]`.
+
+    Args:
+        timings (dict): The dictionary collecting stage timings.
+        stage (str): The name of the stage being timed.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of the current process.
+
+    Returns:
+        float: The peak RSS in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+"""
+======================
+This module provides lightweight helpers to instrument the stages of the processing pipeline.
+They have no dependencies, so they can be used inside worker processes; the collected values
+are turned into Prometheus metrics by `app.services.metrics` in the web process.
+
+Functions:
+- `timed`: Context manager adding the wall time of a block to a dictionary of timings.
+- `peak_rss_mb`: Peak resident memory of the current process.
+
+Example Usage:
+======================
+    timings = {}
+    with timed(timings, 'decode'):
+        waveform, sample_rate = waveform_loader(file)
+    print(timings)  # {'decode': 0.42}
+"""
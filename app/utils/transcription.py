@@ -1,59 +1,224 @@
-import whisper
-
-def transcriber(audio: any) -> dict:
-    """
-    Transcribes an audio waveform into text with word-level timestamps using the Whisper model.
-
-    Args:
-        audio (any): The input audio waveform. Typically a numpy array, PyTorch tensor, or other format supported by Whisper.
-
-    Returns:
-        dict: A dictionary containing the transcription text and word-level timestamps.
-    """
-    print("Loading Whisper model...")
-
-    # Load the Whisper model
-    whisper_model = whisper.load_model("medium.en")
-
-    # Transcribe the audio with word timestamps
-    text_transcription: dict = whisper_model.transcribe(
-        audio=audio,
-        condition_on_previous_text=False,
-        word_timestamps=True,
-        task='transcribe',
-        language='en',
-    )
-
-    return text_transcription
-
-"""
-======================
-This module provides functionality for transcribing audio waveforms into text with word-level 
-timestamps using OpenAI's Whisper model.
-
-Main Function:
-- `transcriber`: Handles the transcription of audio data and returns a detailed result.
-
-Workflow:
-1. Load the Whisper model using the `whisper.load_model` method.
-2. Transcribe the audio waveform with word timestamps enabled.
-3. Return the transcription result as a dictionary with detailed metadata.
-
-Dependencies:
-- `whisper`: OpenAI's library for speech recognition and transcription.
-
-Example Usage:
-======================
-1. Prepare an audio waveform (e.g., using PyTorch or NumPy).
-2. Call the `transcriber` function with the audio waveform as input.
-
-Expected Output:
-- The output is a dictionary containing:
-  - The full transcription text.
-  - Detailed segments, including word-level timestamps.
-
-Performance Notes:
-- The model `medium.en` is optimized for English transcription and provides word-level timestamps.
-- Ensure the input audio matches the supported formats for Whisper (e.g., mono, specific sampling rates).
-
-"""
+import torch
+import whisper
+from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES, SAMPLE_RATE, log_mel_spectrogram, pad_or_trim
+from whisper.decoding import DecodingOptions, DecodingResult
+from whisper.timing import add_word_timestamps
+from whisper.tokenizer import get_tokenizer
+
+# Temperatures tried in turn when a window's greedy decoding looks unreliable, as in `transcribe`
+FALLBACK_TEMPERATURES: tuple = (0.2, 0.4, 0.6, 0.8, 1.0)
+# Thresholds of `whisper.transcribe` for repetitive, improbable, and silent windows
+COMPRESSION_RATIO_THRESHOLD: float = 2.4
+LOGPROB_THRESHOLD: float = -1.0
+NO_SPEECH_THRESHOLD: float = 0.6
+
+def transcriber(audio: any, whisper_model: whisper.Whisper) -> dict:
+    """
+    Transcribes an audio waveform into text with word-level timestamps using the Whisper model.
+
+    Args:
+        audio (any): The input audio waveform. Typically a numpy array, PyTorch tensor, or other format supported by Whisper.
+        whisper_model (whisper.Whisper): A loaded Whisper model, usually obtained from the model registry.
+
+    Returns:
+        dict: A dictionary containing the transcription text and word-level timestamps.
+    """
+    # Transcribe the audio with word timestamps
+    text_transcription: dict = whisper_model.transcribe(
+        audio=audio,
+        condition_on_previous_text=False,
+        word_timestamps=True,
+        task='transcribe',
+        language='en',
+    )
+
+    return text_transcription
+
+def _needs_fallback(result: DecodingResult) -> bool:
+    """
+    Tells whether a decoded window is too repetitive or improbable to be kept (unless silent).
+    """
+    if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+        return False
+    return result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD
+
+def _window_segments(result: DecodingResult, tokenizer, time_offset: float, duration: float) -> list[dict]:
+    """
+    Splits the tokens of a decoded window into segments at its timestamp tokens.
+    """
+    tokens = torch.tensor(result.tokens, dtype=torch.long)
+    # Seconds per timestamp token (0.02)
+    time_precision = 2 * HOP_LENGTH / SAMPLE_RATE
+
+    def segment(start: float, end: float, segment_tokens: torch.Tensor) -> dict:
+        segment_tokens = segment_tokens.tolist()
+        return {
+            'start': start,
+            'end': end,
+            'text': tokenizer.decode([token for token in segment_tokens if token < tokenizer.eot]),
+            'tokens': segment_tokens,
+            'temperature': result.temperature,
+            'avg_logprob': result.avg_logprob,
+            'compression_ratio': result.compression_ratio,
+            'no_speech_prob': result.no_speech_prob,
+        }
+
+    is_timestamp = tokens.ge(tokenizer.timestamp_begin)
+    # Two consecutive timestamp tokens close one segment and open the next
+    slices = (torch.where(is_timestamp[:-1] & is_timestamp[1:])[0] + 1).tolist()
+    if not slices:
+        timestamps = tokens[is_timestamp]
+        if len(timestamps) > 0 and timestamps[-1].item() != tokenizer.timestamp_begin:
+            duration = (timestamps[-1].item() - tokenizer.timestamp_begin) * time_precision
+        return [segment(time_offset, time_offset + duration, tokens)]
+
+    # Unlike sequential decoding, the next window does not restart at the last timestamp, so
+    # trailing text (a final segment, finished or not) is kept rather than decoded again
+    if tokens[slices[-1]:].lt(tokenizer.timestamp_begin).any():
+        slices.append(len(tokens))
+    segments = []
+    last_slice = 0
+    for current_slice in slices:
+        sliced = tokens[last_slice:current_slice]
+        start_position = sliced[0].item() - tokenizer.timestamp_begin
+        end_position = sliced[-1].item() - tokenizer.timestamp_begin
+        if sliced[-1].item() < tokenizer.timestamp_begin:
+            # The trailing segment lacks a closing timestamp; it runs to the end of the window
+            end_position = duration / time_precision
+        segments.append(segment(
+            time_offset + start_position * time_precision,
+            time_offset + end_position * time_precision,
+            sliced,
+        ))
+        last_slice = current_slice
+    return segments
+
+def batched_transcriber(audio: torch.Tensor, whisper_model: whisper.Whisper, batch_size: int = 8) -> dict:
+    """
+    Transcribes an audio waveform with Whisper, decoding its 30-second windows in batches.
+
+    Without conditioning on the previous text, the windows of a recording are independent,
+    so instead of decoding them one after another, this splits the audio into consecutive
+    windows, runs the encoder and the decoder over `batch_size` windows at a time, and then
+    adds word timestamps window by window. Windows whose greedy output looks unreliable are
+    decoded again at higher temperatures, and windows without speech are dropped, with the
+    same thresholds as `whisper.transcribe`.
+
+    Args:
+        audio (torch.Tensor): The mono 16 kHz audio waveform.
+        whisper_model (whisper.Whisper): A loaded Whisper model.
+        batch_size (int): Number of windows per forward pass.
+
+    Returns:
+        dict: The transcription, in the format of `transcriber`: the `text`, the `segments`
+              with their `tokens` and `words`, and the `language`.
+    """
+    # fp16 is only supported on GPUs
+    fp16 = whisper_model.device.type != 'cpu'
+    dtype = torch.float16 if fp16 else torch.float32
+    options = DecodingOptions(task='transcribe', language='en', temperature=0.0, fp16=fp16)
+    tokenizer = get_tokenizer(
+        whisper_model.is_multilingual,
+        num_languages=whisper_model.num_languages,
+        language='en',
+        task='transcribe',
+    )
+
+    # Pad 30 seconds of silence to the input audio, for slicing
+    mel = log_mel_spectrogram(audio, whisper_model.dims.n_mels, padding=N_SAMPLES)
+    content_frames = mel.shape[-1] - N_FRAMES
+    window_starts = list(range(0, content_frames, N_FRAMES))
+
+    def window(start: int) -> torch.Tensor:
+        return pad_or_trim(mel[:, start:start + N_FRAMES], N_FRAMES).to(whisper_model.device).to(dtype)
+
+    # Decode the windows in batches
+    results: list[DecodingResult] = []
+    for first in range(0, len(window_starts), batch_size):
+        batch = torch.stack([window(start) for start in window_starts[first:first + batch_size]])
+        results.extend(whisper_model.decode(batch, options))
+
+    all_segments: list[dict] = []
+    last_speech_timestamp = 0.0
+    for start, result in zip(window_starts, results):
+        mel_segment = window(start)
+
+        # Retry unreliable windows one by one; they are few, so this stays off the batched path
+        for temperature in FALLBACK_TEMPERATURES:
+            if not _needs_fallback(result):
+                break
+            result = whisper_model.decode(mel_segment, DecodingOptions(
+                task='transcribe', language='en', temperature=temperature, fp16=fp16,
+            ))
+
+        # Skip windows without speech, unless the decoder is confident about its text
+        if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob <= LOGPROB_THRESHOLD:
+            continue
+
+        segment_size = min(N_FRAMES, content_frames - start)
+        time_offset = start * HOP_LENGTH / SAMPLE_RATE
+        segments = _window_segments(result, tokenizer, time_offset, segment_size * HOP_LENGTH / SAMPLE_RATE)
+
+        add_word_timestamps(
+            segments=segments,
+            model=whisper_model,
+            tokenizer=tokenizer,
+            mel=mel_segment,
+            num_frames=segment_size,
+            last_speech_timestamp=last_speech_timestamp,
+        )
+        words = [word for segment in segments for word in segment.get('words', [])]
+        if words:
+            last_speech_timestamp = words[-1]['end']
+
+        # Instantaneous or textless segments are cleared, as `whisper.transcribe` does
+        for segment in segments:
+            if segment['start'] == segment['end'] or segment['text'].strip() == '':
+                segment.update(text='', tokens=[], words=[])
+            segment['seek'] = start
+            all_segments.append({'id': len(all_segments), **segment})
+
+    text_tokens = [token for segment in all_segments for token in segment['tokens'] if token < tokenizer.eot]
+    return {
+        'text': tokenizer.decode(text_tokens),
+        'segments': all_segments,
+        'language': 'en',
+    }
+
+"""
+======================
+This module provides functionality for transcribing audio waveforms into text with word-level 
+timestamps using OpenAI's Whisper model.
+
+Main Functions:
+- `transcriber`: Handles the transcription of audio data and returns a detailed result.
+- `batched_transcriber`: Same output, decoding the 30-second windows of long recordings in
+  batches instead of one after another.
+
+Workflow:
+1. Receive an already loaded Whisper model (see `app.services.model_registry`).
+2. Transcribe the audio waveform with word timestamps enabled.
+3. Return the transcription result as a dictionary with detailed metadata.
+
+Dependencies:
+- `whisper`: OpenAI's library for speech recognition and transcription.
+
+Example Usage:
+======================
+1. Prepare an audio waveform (e.g., using PyTorch or NumPy).
+2. Call the `transcriber` function with the audio waveform and the cached Whisper model.
+
+Expected Output:
+- The output is a dictionary containing:
+  - The full transcription text.
+  - Detailed segments, including word-level timestamps.
+
+Performance Notes:
+- The model `medium.en` is optimized for English transcription and provides word-level timestamps.
+- Ensure the input audio matches the supported formats for Whisper (e.g., mono, specific sampling rates).
+- `batched_transcriber` cuts the audio at fixed 30-second boundaries, whereas `transcriber`
+  starts each window at the last complete segment of the previous one. A word spoken across
+  a boundary may therefore be split in two; in exchange, a recording of N windows takes
+  about N / batch_size decoding passes instead of N.
+
+"""
@@ -0,0 +1,158 @@
+import numpy as np
+import torch
+
+# Length of the analysis frames, in samples; 320 matches one Wav2Vec2 output frame at 16 kHz,
+# so region boundaries fall on phoneme frame boundaries and offsets remap exactly
+FRAME_SAMPLES: int = 320
+# Frames quieter than this are silence regardless of the recording, in dB relative to full scale
+FLOOR_DB: float = -50.0
+# The threshold is never set further than this below the loudest frame
+MAX_DYNAMIC_RANGE_DB: float = 30.0
+# Percentile of the frame energies taken as the noise floor of the recording
+NOISE_PERCENTILE: float = 10.0
+
+def frame_energy_db(waveform: torch.Tensor, frame_samples: int = FRAME_SAMPLES) -> np.ndarray:
+    """
+    Computes the RMS energy of consecutive frames of a waveform.
+
+    Args:
+        waveform (torch.Tensor): The mono audio waveform, with samples in [-1, 1].
+        frame_samples (int): The number of samples per frame; a trailing partial frame is
+                             zero-padded.
+
+    Returns:
+        np.ndarray: The energy of every frame in dB relative to full scale.
+    """
+    samples = waveform.numpy()
+    frames = -(-samples.shape[-1] // frame_samples)
+    padded = np.zeros(frames * frame_samples, dtype=np.float32)
+    padded[:samples.shape[-1]] = samples
+    power = np.mean(np.square(padded.reshape(frames, frame_samples)), axis=1)
+    return 10 * np.log10(power + 1e-12)
+
+def detect_speech(
+    waveform: torch.Tensor,
+    sample_rate: int,
+    margin_db: float = 12.0,
+    min_silence_seconds: float = 0.5,
+    padding_seconds: float = 0.2,
+    frame_samples: int = FRAME_SAMPLES
+) -> list[tuple[int, int]]:
+    """
+    Finds the regions of a waveform that contain speech, using an adaptive energy threshold.
+
+    A frame is speech if its energy exceeds the noise floor of the recording by `margin_db`
+    (the threshold is kept between `FLOOR_DB` and `MAX_DYNAMIC_RANGE_DB` below the loudest
+    frame). Silences shorter than `min_silence_seconds` are kept inside the surrounding
+    region, so pauses within a sentence never split it, and every region is padded on both
+    sides so soft word onsets and endings are not cut.
+
+    Args:
+        waveform (torch.Tensor): The mono audio waveform.
+        sample_rate (int): The sample rate of the waveform in Hz.
+        margin_db (float): How far above the noise floor speech must be, in dB.
+        min_silence_seconds (float): Shortest silence that separates two regions.
+        padding_seconds (float): Silence kept before and after every region.
+        frame_samples (int): The number of samples per analysis frame.
+
+    Returns:
+        list[tuple[int, int]]: The sorted, non-overlapping `(start, end)` sample ranges of
+                               speech. The starts are multiples of `frame_samples`.
+    """
+    total = waveform.shape[-1]
+    if total == 0:
+        return []
+
+    energy = frame_energy_db(waveform, frame_samples)
+    noise_floor = np.percentile(energy, NOISE_PERCENTILE)
+    threshold = max(FLOOR_DB, min(noise_floor + margin_db, energy.max() - MAX_DYNAMIC_RANGE_DB))
+    is_speech = energy > threshold
+    if not is_speech.any():
+        return []
+
+    # Start and end frames of the runs of speech frames
+    edges = np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    frame_seconds = frame_samples / sample_rate
+    padding = int(round(padding_seconds / frame_seconds))
+    min_gap = int(round(min_silence_seconds / frame_seconds))
+
+    # Pad the runs and merge those separated by less than the minimum silence
+    regions: list[list[int]] = []
+    for start, end in zip((starts - padding).tolist(), (ends + padding).tolist()):
+        start = max(0, start)
+        if regions and start - regions[-1][1] < min_gap:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    return [(start * frame_samples, min(end * frame_samples, total)) for start, end in regions]
+
+def extract_regions(waveform: torch.Tensor, regions: list[tuple[int, int]]) -> torch.Tensor:
+    """
+    Concatenates the given regions of a waveform, dropping everything in between.
+
+    Args:
+        waveform (torch.Tensor): The mono audio waveform.
+        regions (list[tuple[int, int]]): The sample ranges returned by `detect_speech`.
+
+    Returns:
+        torch.Tensor: The contiguous waveform of the regions.
+    """
+    if not regions:
+        return waveform[:0]
+    return torch.cat([waveform[start:end] for start, end in regions])
+
+def remap_times(times: np.ndarray, regions: list[tuple[int, int]], sample_rate: int, is_end: bool = False) -> np.ndarray:
+    """
+    Maps timestamps of the waveform returned by `extract_regions` back to the original timeline.
+
+    Args:
+        times (np.ndarray): Timestamps in seconds within the extracted waveform.
+        regions (list[tuple[int, int]]): The sample ranges that were extracted.
+        sample_rate (int): The sample rate of the waveform in Hz.
+        is_end (bool): If True, a timestamp falling exactly on the junction of two regions is
+                       mapped to the end of the earlier one (as for the end of a word) instead
+                       of the start of the later one.
+
+    Returns:
+        np.ndarray: The timestamps in seconds within the original waveform.
+    """
+    samples = np.asarray(times, dtype=np.float64) * sample_rate
+    region_starts = np.array([start for start, _ in regions], dtype=np.float64)
+    lengths = np.array([end - start for start, end in regions], dtype=np.float64)
+    # Position of every region within the extracted waveform
+    extracted_starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+
+    index = np.searchsorted(extracted_starts, samples, side='left' if is_end else 'right') - 1
+    index = np.clip(index, 0, len(regions) - 1)
+    return (region_starts[index] + samples - extracted_starts[index]) / sample_rate
+
+"""
+======================
+This module implements a lightweight energy-based voice activity detector (VAD). It runs
+before inference, so the models only process the parts of a recording that contain speech,
+and maps the timestamps they produce back to the original recording.
+
+Functions:
+- `frame_energy_db`: RMS energy of fixed-size frames, in dBFS.
+- `detect_speech`: Finds padded speech regions with an adaptive threshold.
+- `extract_regions`: Concatenates the speech regions into one waveform.
+- `remap_times`: Maps timestamps of the concatenated waveform back to the original one.
+
+Notes:
+- The detector only needs to find silence reliably; deciding what was said is left to the
+  models, so it errs on the side of keeping audio (adaptive threshold, bridged short gaps,
+  padding on both sides).
+- Because region starts are multiples of `FRAME_SAMPLES`, Wav2Vec2 frame offsets can be
+  remapped through `remap_times` without rounding errors.
+
+Example Usage:
+======================
+    regions = detect_speech(waveform, 16000)
+    speech = extract_regions(waveform, regions)
+    starts = remap_times(word_starts, regions, 16000)
+    ends = remap_times(word_ends, regions, 16000, is_end=True)
+"""
@@ -0,0 +1,165 @@
+import struct
+from typing import BinaryIO, Optional
+
+import numpy as np
+
+# WAVE format tags
+WAVE_FORMAT_PCM: int = 0x0001
+WAVE_FORMAT_IEEE_FLOAT: int = 0x0003
+WAVE_FORMAT_EXTENSIBLE: int = 0xFFFE
+
+# Sample types that can be read directly from the file, by (format tag, bits per sample)
+_SAMPLE_DTYPES: dict = {
+    (WAVE_FORMAT_PCM, 8): np.dtype('u1'),
+    (WAVE_FORMAT_PCM, 16): np.dtype('<i2'),
+    (WAVE_FORMAT_PCM, 32): np.dtype('<i4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype('<f4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype('<f8'),
+}
+
+def read_wav_header(source: BinaryIO, size: Optional[int] = None) -> Optional[dict]:
+    """
+    Parses the RIFF header of a WAV file up to the start of its sample data.
+
+    Args:
+        source (BinaryIO): A seekable binary file object positioned at the start of the file.
+        size (Optional[int]): The size of the whole file, in bytes. Defaults to the size of
+                              `source`; pass it when `source` only holds the start of the file.
+
+    Returns:
+        Optional[dict]: None if the file is not a WAV file, otherwise a dictionary containing:
+            - 'format_tag': The WAVE format tag (the sub-format for extensible files).
+            - 'channels': The number of interleaved channels.
+            - 'sample_rate': The sample rate in Hz.
+            - 'bits_per_sample': The size of one sample of one channel, in bits.
+            - 'block_align': The size of one frame (all channels), in bytes.
+            - 'data_offset': The byte offset of the first sample.
+            - 'data_size': The size of the sample data, in bytes.
+    """
+    riff = source.read(12)
+    if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+        return None
+
+    header: dict = {}
+    while True:
+        chunk_header = source.read(8)
+        if len(chunk_header) < 8:
+            return None
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+
+        if chunk_id == b'fmt ':
+            fmt = source.read(chunk_size)
+            if len(fmt) < 16:
+                return None
+            format_tag, channels, sample_rate, _, block_align, bits_per_sample = struct.unpack('<HHIIHH', fmt[:16])
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                # The first two bytes of the sub-format GUID hold the actual format tag
+                format_tag = struct.unpack('<H', fmt[24:26])[0]
+            header.update(
+                format_tag=format_tag,
+                channels=channels,
+                sample_rate=sample_rate,
+                bits_per_sample=bits_per_sample,
+                block_align=block_align,
+            )
+            # Chunks are padded to an even size
+            source.seek(chunk_size % 2, 1)
+        elif chunk_id == b'data':
+            if 'format_tag' not in header:
+                return None
+            header['data_offset'] = source.tell()
+            # Streaming writers may leave the size unset; the data then runs to the end of the file
+            end = size if size is not None else source.seek(0, 2)
+            header['data_size'] = min(chunk_size, end - header['data_offset'])
+            return header
+        else:
+            source.seek(chunk_size + chunk_size % 2, 1)
+
+def wav_header(format_tag: int, channels: int, sample_rate: int, bits_per_sample: int, data_size: int) -> bytes:
+    """
+    Builds the 44-byte header of a WAV file holding `data_size` bytes of samples.
+
+    Args:
+        format_tag (int): The WAVE format tag, e.g. `WAVE_FORMAT_PCM`.
+        channels (int): The number of interleaved channels.
+        sample_rate (int): The sample rate in Hz.
+        bits_per_sample (int): The size of one sample of one channel, in bits.
+        data_size (int): The size of the sample data that follows the header, in bytes.
+
+    Returns:
+        bytes: The RIFF header, up to and including the `data` chunk header.
+    """
+    block_align = channels * -(-bits_per_sample // 8)
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, format_tag, channels, sample_rate, sample_rate * block_align, block_align, bits_per_sample,
+        b'data', data_size,
+    )
+
+def memmap_wav(path: str) -> Optional[tuple[np.ndarray, int]]:
+    """
+    Maps the samples of an uncompressed WAV file into memory without reading them.
+
+    Args:
+        path (str): The path of the audio file.
+
+    Returns:
+        Optional[tuple[np.ndarray, int]]: A read-only `(frames, channels)` array backed by
+                                          the file, and the sample rate; None if the file
+                                          is not a WAV file with a directly readable sample type.
+    """
+    with open(path, 'rb') as source:
+        header = read_wav_header(source)
+    if header is None:
+        return None
+
+    dtype = _SAMPLE_DTYPES.get((header['format_tag'], header['bits_per_sample']))
+    if dtype is None or header['block_align'] != dtype.itemsize * header['channels']:
+        return None
+
+    frames = header['data_size'] // header['block_align']
+    if frames == 0:
+        return None
+    samples = np.memmap(path, dtype=dtype, mode='r', offset=header['data_offset'], shape=(frames, header['channels']))
+    return samples, header['sample_rate']
+
+def to_float32(samples: np.ndarray) -> np.ndarray:
+    """
+    Converts integer or float WAV samples to float32 in [-1, 1].
+
+    Args:
+        samples (np.ndarray): Samples of one of the types returned by `memmap_wav`.
+
+    Returns:
+        np.ndarray: The samples as float32.
+    """
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.float32) - 128) / 128
+    if samples.dtype.kind == 'i':
+        return samples.astype(np.float32) / float(2 ** (8 * samples.dtype.itemsize - 1))
+    return samples.astype(np.float32)
+
+"""
+======================
+This module reads uncompressed WAV files without a decoder: the RIFF header is parsed to
+locate the sample data, which can then be memory-mapped, so the operating system pages it
+in as needed instead of the file being read into memory as a whole.
+
+Functions:
+- `read_wav_header`: Parses the format and locates the sample data of a WAV file.
+- `wav_header`: Builds the header of a WAV file, e.g. for a clip cut from a stored file.
+- `memmap_wav`: Maps the samples of a PCM or float WAV file as a `(frames, channels)` array.
+- `to_float32`: Scales samples to float32 in [-1, 1].
+
+Notes:
+- 24-bit PCM, compressed WAV formats, and every other container return None from
+  `memmap_wav`, and are decoded by torchaudio instead.
+
+Example Usage:
+======================
+    mapped = memmap_wav("example_audio.wav")
+    if mapped is not None:
+        samples, sample_rate = mapped
+        first_second = to_float32(samples[:sample_rate])
+"""
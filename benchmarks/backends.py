@@ -0,0 +1,210 @@
+import argparse
+import difflib
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+DEFAULT_BACKENDS: list[str] = ['torch:torch', 'quantized:quantized', 'torch:onnx', 'quantized:onnx']
+
+def edit_distance(reference: list, hypothesis: list) -> int:
+    """
+    Computes the Levenshtein distance between two sequences.
+    """
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_item in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_item in enumerate(hypothesis, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_item != hyp_item),
+            )
+        previous = current
+    return previous[-1]
+
+def _word_text(word: dict) -> str:
+    return word['word'].strip().lower().strip('.,?!;:"')
+
+def _phonemes(words: list[dict]) -> list[str]:
+    # `corpus_app` stores the phonemes of a word as '/p1/p2/.../'
+    return [phoneme for word in words for phoneme in word.get('phoneme', '').split('/') if phoneme]
+
+def compare_outputs(reference: dict, candidate: dict) -> dict:
+    """
+    Measures how far the document of a candidate backend is from the reference document.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'word_error_rate': Edit distance of the word sequences over the reference length.
+            - 'phoneme_error_rate': Edit distance of the phoneme sequences over the reference length.
+            - 'timestamp_error_s': Mean absolute difference of the start and end times of the
+              words both documents agree on.
+    """
+    ref_words = [_word_text(word) for word in reference['words']]
+    cand_words = [_word_text(word) for word in candidate['words']]
+    ref_phonemes = _phonemes(reference['words'])
+    cand_phonemes = _phonemes(candidate['words'])
+
+    # Pair up the words shared by both transcriptions to compare their timestamps
+    deltas = []
+    matcher = difflib.SequenceMatcher(a=ref_words, b=cand_words, autojunk=False)
+    for block in matcher.get_matching_blocks():
+        for offset in range(block.size):
+            ref_word = reference['words'][block.a + offset]
+            cand_word = candidate['words'][block.b + offset]
+            deltas.append(abs(ref_word['start'] - cand_word['start']))
+            deltas.append(abs(ref_word['end'] - cand_word['end']))
+
+    return {
+        'word_error_rate': edit_distance(ref_words, cand_words) / max(1, len(ref_words)),
+        'phoneme_error_rate': edit_distance(ref_phonemes, cand_phonemes) / max(1, len(ref_phonemes)),
+        'timestamp_error_s': statistics.fmean(deltas) if deltas else 0.0,
+    }
+
+def run_backend(spec: str, audio_paths: list[str], repeat: int) -> tuple[dict, list[dict]]:
+    """
+    Processes every file with one backend combination.
+
+    Args:
+        spec (str): The backends as `transcriber:phonemizer`, e.g. `quantized:onnx`.
+        audio_paths (list[str]): The audio files to process.
+        repeat (int): Timed runs per file.
+
+    Returns:
+        tuple[dict, list[dict]]: The speed measurements, and the document of each file.
+    """
+    from app import config
+    from app.services.audio_processing import process_audio
+    from app.services.model_registry import build_models, warm_up
+
+    transcriber_backend, phonemizer_backend = spec.split(':')
+    # The documents record the backends from the configuration
+    config.TRANSCRIBER_BACKEND = transcriber_backend
+    config.PHONEMIZER_BACKEND = phonemizer_backend
+    config.PHONEME_BATCHING = False
+
+    start = time.perf_counter()
+    models = build_models(transcriber_backend, phonemizer_backend)
+    warm_up(models)
+    load_seconds = time.perf_counter() - start
+
+    documents = []
+    latencies = []
+    audio_seconds = 0.0
+    for path in audio_paths:
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            document = process_audio(path, os.path.basename(path), models=models)
+            runs.append(time.perf_counter() - start)
+        documents.append(document)
+        latencies.append(statistics.median(runs))
+        audio_seconds += document['audio']['duration']
+
+    speed = {
+        'backends': spec,
+        'load_and_warm_up_s': load_seconds,
+        'latency_s': sum(latencies),
+        'real_time_factor': sum(latencies) / audio_seconds if audio_seconds else 0.0,
+        'stage_s': {
+            stage: sum(document['metadata']['timings'].get(stage, 0.0) for document in documents)
+            for stage in ('decode', 'transcribe', 'phonemize', 'corpus_alignment')
+        },
+    }
+
+    # Free this variant before the next one is loaded
+    del models
+    gc.collect()
+    return speed, documents
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare the speed and accuracy of the inference backends on real audio.")
+    parser.add_argument('audio', nargs='+', help="Audio files with speech to process.")
+    parser.add_argument('--backends', nargs='+', default=DEFAULT_BACKENDS,
+                        help="Backend combinations as transcriber:phonemizer; the first one is the reference.")
+    parser.add_argument('--repeat', type=int, default=1, help="Timed runs per file and backend.")
+    parser.add_argument('--max-word-error-rate', type=float, default=0.05, help="Tolerated word error rate against the reference.")
+    parser.add_argument('--max-phoneme-error-rate', type=float, default=0.05, help="Tolerated phoneme error rate against the reference.")
+    parser.add_argument('--max-timestamp-error', type=float, default=0.05, help="Tolerated mean word timestamp deviation, in seconds.")
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+    args = parser.parse_args(argv)
+
+    results = []
+    reference_documents = None
+    reference_latency = None
+    within_tolerance = True
+    for spec in args.backends:
+        speed, documents = run_backend(spec, args.audio, args.repeat)
+        if reference_documents is None:
+            reference_documents, reference_latency = documents, speed['latency_s']
+
+        files = []
+        for path, reference, candidate in zip(args.audio, reference_documents, documents):
+            accuracy = compare_outputs(reference, candidate)
+            accuracy['within_tolerance'] = (
+                accuracy['word_error_rate'] <= args.max_word_error_rate
+                and accuracy['phoneme_error_rate'] <= args.max_phoneme_error_rate
+                and accuracy['timestamp_error_s'] <= args.max_timestamp_error
+            )
+            within_tolerance &= accuracy['within_tolerance']
+            files.append({'file': path, **accuracy})
+
+        speed['speedup'] = reference_latency / speed['latency_s'] if speed['latency_s'] else 0.0
+        results.append({**speed, 'files': files})
+        print(f"{spec:<22} {speed['latency_s']:.2f}s  ({speed['speedup']:.2f}x)", file=sys.stderr)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+        },
+        'reference': args.backends[0],
+        'tolerances': {
+            'word_error_rate': args.max_word_error_rate,
+            'phoneme_error_rate': args.max_phoneme_error_rate,
+            'timestamp_error_s': args.max_timestamp_error,
+        },
+        'within_tolerance': within_tolerance,
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+    return 0 if within_tolerance else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+"""
+======================
+This module compares the inference backends (see `app.services.backends`) on real
+recordings. Every file is processed end to end with each combination of transcriber and
+phonemizer backends, and the documents are compared with those of the first combination.
+
+Measurements:
+- Speed: end-to-end latency, real-time factor, per-stage time, and speedup over the reference.
+- Accuracy: word error rate, phoneme error rate, and the mean deviation of the word
+  timestamps, each against the reference documents.
+
+The exit code is 1 if any file exceeds a tolerance, so the harness can gate a change of
+`TRANSCRIBER_BACKEND` or `PHONEMIZER_BACKEND`. Unlike `benchmarks/run.py`, it needs the
+real models (and `onnxruntime` for the `onnx` backend) and speech recordings.
+
+Example Usage:
+======================
+    python -m benchmarks.backends samples/*.wav --output backends.json
+    python -m benchmarks.backends samples/interview.mp3 --backends torch:torch torch:quantized
+"""
@@ -0,0 +1,189 @@
+import copy
+import itertools
+from contextlib import contextmanager
+from typing import Optional
+
+import bson
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+def _get(document: dict, path: str):
+    """
+    Resolves a dotted field path in a document.
+    """
+    value = document
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def _matches(document: dict, query: dict) -> bool:
+    return all(_get(document, key) == value for key, value in query.items())
+
+def _project(document: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return copy.deepcopy(document)
+    result = {'_id': document['_id']}
+    for path in projection:
+        value = _get(document, path)
+        if value is not None:
+            target = result
+            parts = path.split('.')
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = copy.deepcopy(value)
+    return result
+
+class InMemoryCollection:
+    """
+    Minimal stand-in for a pymongo collection, supporting the operations used by the
+    persistence layer. Documents are BSON-encoded on insert, so serialization cost is
+    still part of the measurement.
+    """
+
+    def __init__(self, database: "InMemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.documents: dict = {}
+        self.encoded_bytes: int = 0
+        self._unique: list[str] = []
+
+    def __getattr__(self, name: str) -> "InMemoryCollection":
+        # Sub-collections, e.g., `db.fs.files`
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.database[f"{self.name}.{name}"]
+
+    def create_index(self, key, unique: bool = False, **kwargs) -> str:
+        field = key if isinstance(key, str) else key[0][0]
+        if unique:
+            self._unique.append(field)
+        return f"{field}_1"
+
+    def _check_unique(self, document: dict) -> None:
+        for field in self._unique:
+            value = _get(document, field)
+            if value is not None and any(_get(other, field) == value for other in self.documents.values()):
+                raise DuplicateKeyError(f"E11000 duplicate key error: {field}")
+
+    def insert_one(self, document: dict):
+        document.setdefault('_id', ObjectId())
+        if document['_id'] in self.documents:
+            raise DuplicateKeyError("E11000 duplicate key error: _id")
+        self._check_unique(document)
+        self.encoded_bytes += len(bson.encode(document))
+        self.documents[document['_id']] = copy.deepcopy(document)
+        return type('InsertOneResult', (), {'inserted_id': document['_id']})()
+
+    def insert_many(self, documents: list[dict], ordered: bool = True):
+        ids = [self.insert_one(document).inserted_id for document in documents]
+        return type('InsertManyResult', (), {'inserted_ids': ids})()
+
+    def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None) -> Optional[dict]:
+        for document in self.documents.values():
+            if _matches(document, query or {}):
+                return _project(document, projection)
+        return None
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None):
+        return [_project(document, projection) for document in self.documents.values() if _matches(document, query or {})]
+
+    def find_one_and_update(self, query: dict, update: dict, projection: Optional[dict] = None, return_document: bool = False, **kwargs) -> Optional[dict]:
+        for document in self.documents.values():
+            if _matches(document, query):
+                before = _project(document, projection)
+                for field, amount in update.get('$inc', {}).items():
+                    document[field] = document.get(field, 0) + amount
+                for field, value in update.get('$set', {}).items():
+                    document[field] = value
+                return _project(document, projection) if return_document else before
+        return None
+
+    def find_one_and_delete(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        for key, document in self.documents.items():
+            if _matches(document, query):
+                del self.documents[key]
+                return _project(document, projection)
+        return None
+
+    def delete_many(self, query: dict) -> None:
+        for key in [key for key, document in self.documents.items() if _matches(document, query)]:
+            del self.documents[key]
+
+class InMemoryDatabase:
+    """
+    Minimal stand-in for a pymongo database: collections are created on attribute access.
+    """
+
+    def __init__(self):
+        self._collections: dict[str, InMemoryCollection] = {}
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(self, name)
+        return self._collections[name]
+
+class InMemoryGridFS:
+    """
+    Minimal stand-in for `gridfs.GridFS`, splitting files into 255 kB chunks like GridFS does.
+    """
+
+    CHUNK_SIZE: int = 255 * 1024
+
+    def __init__(self, database: InMemoryDatabase):
+        self.database = database
+
+    def put(self, data, **kwargs) -> ObjectId:
+        if hasattr(data, 'read'):
+            data = data.read()
+        file_id = kwargs.pop('_id', None) or ObjectId()
+        for n, start in zip(itertools.count(), range(0, len(data), self.CHUNK_SIZE)):
+            self.database['fs.chunks'].insert_one({'files_id': file_id, 'n': n, 'data': data[start:start + self.CHUNK_SIZE]})
+        self.database['fs.files'].insert_one({'_id': file_id, 'length': len(data), 'chunkSize': self.CHUNK_SIZE, **kwargs})
+        return file_id
+
+    def delete(self, file_id: ObjectId) -> None:
+        self.database['fs.files'].delete_many({'_id': file_id})
+        self.database['fs.chunks'].delete_many({'files_id': file_id})
+
+@contextmanager
+def in_memory_database():
+    """
+    Temporarily replaces the MongoDB database and GridFS of `app.services.database` with
+    in-memory stand-ins.
+
+    Yields:
+        InMemoryDatabase: The stand-in database, for inspecting what was written.
+    """
+    from app.services import database
+
+    previous = database.db, database.fs
+    memory_db = InMemoryDatabase()
+    database.db, database.fs = memory_db, InMemoryGridFS(memory_db)
+    try:
+        yield memory_db
+    finally:
+        database.db, database.fs = previous
+
+"""
+======================
+This module provides an in-memory stand-in for MongoDB and GridFS, so the persistence layer
+can be benchmarked without a database server. Only the operations used by
+`app.services.database` are implemented; lookups are linear scans.
+
+Main Components:
+- `InMemoryDatabase`, `InMemoryCollection`, `InMemoryGridFS`: The stand-ins.
+- `in_memory_database`: Context manager swapping them into `app.services.database`.
+
+Example Usage:
+======================
+    with in_memory_database() as memory_db:
+        save_to_database(json_data, audio_bytes)
+        print(memory_db.documents.encoded_bytes)
+"""
@@ -0,0 +1,45 @@
+from app.utils.timestamps import offset_to_timestamp, add_pause_timestamp
+
+def reference_corpus_app(
+    text_transcription: dict,
+    phoneme_transcription: list[dict],
+    sample_rate: int = 16000,
+    downsampling_rate: int = 320
+) -> list[dict]:
+    """
+    The original, quadratic implementation of `corpus_app`, kept as the baseline that the
+    current implementation must reproduce exactly and is timed against.
+
+    Args and return value are those of `app.services.corpus_app.corpus_app`.
+    """
+    segment_list: list[list[dict]] = [segment['words'] for segment in text_transcription['segments']]
+    words_list: list[dict] = sum(segment_list, [])
+
+    tokens_list: list[list[int]] = [segment['tokens'] for segment in text_transcription['segments']]
+    tokens_list: list[int] = sum(tokens_list, [])
+
+    end_list: list[float] = [0] + [word['end'] for word in words_list]
+
+    phoneme_list: list[str] = []
+    for i in range(len(end_list) - 1):
+        phoneme = '/'
+        for char in phoneme_transcription:
+            char_timestamp = offset_to_timestamp(char['start_offset'], sample_rate, downsampling_rate)
+            if end_list[i] <= char_timestamp < end_list[i + 1]:
+                phoneme += char['char']
+        phoneme_list.append(phoneme + '/')
+
+    for word, token, phoneme in zip(words_list, tokens_list, phoneme_list):
+        word['token_id'] = token
+        word['phoneme'] = phoneme
+
+    return add_pause_timestamp(words_list)
+
+"""
+======================
+This module keeps reference implementations of optimized functions, used by the benchmark
+suite both as a speed baseline and as an oracle for regression checks.
+
+Functions:
+- `reference_corpus_app`: The original O(words x phonemes) phoneme-to-word alignment.
+"""
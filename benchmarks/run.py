@@ -0,0 +1,242 @@
+import argparse
+import copy
+import json
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable
+
+from app.services.corpus_app import corpus_app
+from app.utils.timestamps import add_pause_timestamp
+from benchmarks.reference import reference_corpus_app
+from benchmarks.synthetic import (
+    synthetic_char_offsets,
+    synthetic_transcription,
+    synthetic_waveform,
+    waveform_to_wav_bytes,
+)
+
+DEFAULT_DURATIONS: list[float] = [10, 60, 600, 3600, 7200]
+DEFAULT_STAGES: list[str] = ['corpus_app', 'corpus_app_reference', 'add_pause_timestamp', 'save_to_database', 'process_audio']
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(func: Callable, setup: Callable, repeat: int) -> dict:
+    """
+    Times a function over several runs, each with fresh inputs from `setup`.
+
+    Returns:
+        dict: Latency statistics in seconds, the peak Python heap allocation (tracemalloc)
+              and the peak resident set size of the process, in megabytes.
+    """
+    latencies = []
+    heap_peaks = []
+    for _ in range(repeat):
+        args = setup()
+        tracemalloc.start()
+        start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - start)
+        heap_peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        'latency_s': {
+            'min': min(latencies),
+            'median': statistics.median(latencies),
+            'mean': statistics.fmean(latencies),
+        },
+        'heap_peak_mb': max(heap_peaks) / 2**20,
+        'rss_peak_mb': _peak_rss_mb(),
+    }
+
+def _alignment_inputs(duration: float) -> Callable:
+    text_transcription = synthetic_transcription(duration)
+    phoneme_transcription = synthetic_char_offsets(duration)
+    # corpus_app annotates the words in place, so every run gets its own copy
+    return lambda: (copy.deepcopy(text_transcription), phoneme_transcription)
+
+def _pause_inputs(duration: float) -> Callable:
+    words = [word for segment in synthetic_transcription(duration)['segments'] for word in segment['words']]
+    return lambda: (words,)
+
+def _database_inputs(duration: float) -> Callable:
+    words = corpus_app(synthetic_transcription(duration), synthetic_char_offsets(duration))
+    rng = random.Random(0)
+
+    def setup():
+        # Compressed audio is ~16 kB/s; fresh bytes per run, so GridFS deduplication never kicks in
+        audio_bytes = rng.randbytes(int(duration * 16000))
+        json_data = {
+            'metadata': {'transcriber_model': 'stub', 'phonemizer_model': 'stub'},
+            'audio': {'file': f'synthetic_{duration:g}s.wav', 'duration': duration},
+            'text_transcription': '',
+            'words': copy.deepcopy(words),
+        }
+        return json_data, audio_bytes
+    return setup
+
+def _process_inputs(duration: float) -> Callable:
+    audio_bytes = waveform_to_wav_bytes(synthetic_waveform(duration))
+    return lambda: (audio_bytes, f'synthetic_{duration:g}s.wav')
+
+def run_stage(stage: str, duration: float, repeat: int) -> dict:
+    """
+    Benchmarks one stage on synthetic inputs of the given duration.
+
+    Returns:
+        dict: The measurements of `measure`, with the stage, duration and throughput.
+    """
+    if stage == 'corpus_app':
+        result = measure(corpus_app, _alignment_inputs(duration), repeat)
+    elif stage == 'corpus_app_reference':
+        result = measure(reference_corpus_app, _alignment_inputs(duration), repeat)
+    elif stage == 'add_pause_timestamp':
+        result = measure(add_pause_timestamp, _pause_inputs(duration), repeat)
+    elif stage == 'save_to_database':
+        from benchmarks.memory_db import in_memory_database
+        from app.services.database import save_to_database
+        with in_memory_database():
+            result = measure(save_to_database, _database_inputs(duration), repeat)
+    elif stage == 'process_audio':
+        from app import config
+        from app.services.audio_processing import process_audio
+        from benchmarks.stub_models import stub_models
+        # The batcher is process-wide; keep it out of single-request measurements
+        config.PHONEME_BATCHING = False
+        models = stub_models()
+        result = measure(lambda audio, name: process_audio(audio, name, models=models), _process_inputs(duration), repeat)
+    else:
+        raise ValueError(f"Unknown stage '{stage}'.")
+
+    result.update({
+        'stage': stage,
+        'duration_s': duration,
+        'repeat': repeat,
+        # Seconds of audio handled per second of wall time
+        'throughput_x_realtime': duration / result['latency_s']['median'],
+    })
+    return result
+
+def check_corpus_app(trials: int, seed: int = 0) -> bool:
+    """
+    Checks that `corpus_app` matches the reference implementation on randomized inputs,
+    including unsorted offsets and non-monotonic word end times.
+
+    Returns:
+        bool: True if every trial produced identical output.
+    """
+    rng = random.Random(seed)
+    for trial in range(trials):
+        duration = rng.uniform(0, 90)
+        text_transcription = synthetic_transcription(duration, seed=trial)
+        for segment in text_transcription['segments']:
+            for word in segment['words']:
+                if rng.random() < 0.05:
+                    word['end'] = round(word['start'] - rng.uniform(0, 0.3), 2)
+        phoneme_transcription = synthetic_char_offsets(duration, seed=trial)
+        if rng.random() < 0.2:
+            rng.shuffle(phoneme_transcription)
+
+        expected = reference_corpus_app(copy.deepcopy(text_transcription), phoneme_transcription)
+        if corpus_app(copy.deepcopy(text_transcription), phoneme_transcription) != expected:
+            return False
+    return True
+
+def compare(results: list[dict], baseline: list[dict]) -> list[str]:
+    """
+    Formats the median latency of each result relative to a baseline run.
+    """
+    previous = {(entry['stage'], entry['duration_s']): entry for entry in baseline if 'latency_s' in entry}
+    lines = []
+    for entry in results:
+        old = previous.get((entry['stage'], entry['duration_s']))
+        if old is None or 'latency_s' not in entry:
+            continue
+        ratio = entry['latency_s']['median'] / old['latency_s']['median']
+        lines.append(f"{entry['stage']:<22} {entry['duration_s']:>8g}s  {old['latency_s']['median']:.4f}s -> {entry['latency_s']['median']:.4f}s  ({ratio:.2f}x)")
+    return lines
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the MXesco processing pipeline on synthetic inputs.")
+    parser.add_argument('--durations', type=float, nargs='+', default=DEFAULT_DURATIONS, help="Input durations in seconds.")
+    parser.add_argument('--stages', nargs='+', default=DEFAULT_STAGES, choices=DEFAULT_STAGES, help="Stages to benchmark.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage and duration.")
+    parser.add_argument('--reference-max-duration', type=float, default=600, help="Longest input for the quadratic reference implementation.")
+    parser.add_argument('--check-trials', type=int, default=200, help="Randomized corpus_app regression trials (0 to skip).")
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+    parser.add_argument('--baseline', help="JSON report of an earlier run to compare against.")
+    args = parser.parse_args(argv)
+
+    results = []
+    for stage in args.stages:
+        for duration in args.durations:
+            if stage == 'corpus_app_reference' and duration > args.reference_max_duration:
+                continue
+            try:
+                results.append(run_stage(stage, duration, args.repeat))
+            except ImportError as e:
+                # Stages needing torch or pymongo are skipped where those are not installed
+                results.append({'stage': stage, 'duration_s': duration, 'skipped': str(e)})
+            print(f"{stage} {duration:g}s done", file=sys.stderr)
+
+    checks = {}
+    if args.check_trials:
+        checks['corpus_app_matches_reference'] = check_corpus_app(args.check_trials)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+        },
+        'checks': checks,
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            for line in compare(results, json.load(file)['results']):
+                print(line, file=sys.stderr)
+
+    return 0 if all(checks.values()) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+"""
+======================
+This module is the entry point of the benchmark suite. It measures each stage of the
+pipeline on synthetic inputs of increasing duration and writes a JSON report that can be
+diffed across runs.
+
+Stages:
+- `corpus_app`: Phoneme-to-word alignment.
+- `corpus_app_reference`: The original quadratic alignment, as a baseline (short inputs only).
+- `add_pause_timestamp`: Pause insertion.
+- `save_to_database`: Persistence, against the in-memory MongoDB stand-in.
+- `process_audio`: The full pipeline (decoding, windowing, alignment) with stub models.
+
+Each result reports median/min/mean latency, real-time throughput, the peak Python heap
+allocation and the peak RSS of the process. The report also records whether `corpus_app`
+still matches the reference implementation on randomized inputs; the exit code is 1 if not.
+
+Example Usage:
+======================
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --durations 10 600 --stages corpus_app --baseline bench.json
+"""
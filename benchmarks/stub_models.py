@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import torch
+
+from benchmarks.synthetic import synthetic_transcription, SAMPLE_RATE
+
+# Small vocabulary of the stub phonemizer; ID 0 is the CTC blank (pad) token
+STUB_VOCABULARY: list[str] = ['<pad>', 'a', 'b', 'd', 'ə', 'ɪ', 'n', 's']
+
+class StubWhisper:
+    """
+    Stand-in for a Whisper model: `transcribe` returns a synthetic transcription sized by the
+    length of the audio, without running any network.
+    """
+
+    def transcribe(self, audio, **kwargs) -> dict:
+        return synthetic_transcription(audio.shape[-1] / SAMPLE_RATE)
+
+class StubWav2Vec2Processor:
+    """
+    Stand-in for `Wav2Vec2Processor`: pads inputs like the feature extractor and decodes
+    predicted IDs into character offsets like the tokenizer.
+    """
+
+    def __init__(self):
+        self.tokenizer = SimpleNamespace(pad_token_id=0)
+
+    def __call__(self, audio, return_tensors: str = "pt", sampling_rate: int = SAMPLE_RATE, padding: bool = False, return_attention_mask: bool = False):
+        audios = audio if isinstance(audio, list) else [audio]
+        audios = [torch.as_tensor(a, dtype=torch.float32) for a in audios]
+        length = max(a.shape[-1] for a in audios)
+        input_values = torch.zeros(len(audios), length)
+        attention_mask = torch.zeros(len(audios), length, dtype=torch.long)
+        for i, a in enumerate(audios):
+            input_values[i, :a.shape[-1]] = a
+            attention_mask[i, :a.shape[-1]] = 1
+        return SimpleNamespace(input_values=input_values, attention_mask=attention_mask)
+
+    def batch_decode(self, predicted_ids: torch.Tensor, output_char_offsets: bool = False) -> dict:
+        char_offsets = []
+        for ids in predicted_ids.tolist():
+            offsets = []
+            previous = None
+            for frame, token in enumerate(ids):
+                # CTC decoding: merge repeats, then drop blanks
+                if token != previous and token != 0:
+                    offsets.append({'char': STUB_VOCABULARY[token], 'start_offset': frame, 'end_offset': frame + 1})
+                elif token == previous and token != 0:
+                    offsets[-1]['end_offset'] = frame + 1
+                previous = token
+            char_offsets.append(offsets)
+        return {'char_offsets': char_offsets}
+
+class StubWav2Vec2ForCTC:
+    """
+    Stand-in for `Wav2Vec2ForCTC`: produces one-hot logits at the model's frame rate, with a
+    deterministic pattern derived from the signal energy.
+    """
+
+    def __init__(self):
+        self.config = SimpleNamespace(conv_stride=[5, 2, 2, 2, 2, 2, 2])
+
+    @staticmethod
+    def _get_feat_extract_output_lengths(input_lengths):
+        # Same formula as the convolutional feature encoder of wav2vec2 (kernel 400, stride 320)
+        return torch.div(torch.as_tensor(input_lengths) - 400, 320, rounding_mode='floor') + 1
+
+    def eval(self):
+        return self
+
+    def __call__(self, input_values: torch.Tensor, attention_mask=None):
+        frames = int(self._get_feat_extract_output_lengths(input_values.shape[-1]))
+        framed = input_values[:, :frames * 320].reshape(input_values.shape[0], frames, 320)
+        energy = framed.abs().mean(dim=-1)
+        ids = torch.where(energy > 0.05, (torch.arange(frames) // 3) % (len(STUB_VOCABULARY) - 1) + 1, 0)
+        logits = torch.nn.functional.one_hot(ids, len(STUB_VOCABULARY)).float()
+        return SimpleNamespace(logits=logits)
+
+def stub_models() -> dict:
+    """
+    Returns stub models in the format of `load_models`.
+
+    Returns:
+        dict: A dictionary with the keys `whisper`, `wav2vec_processor` and `wav2vec_model`.
+    """
+    return {
+        'whisper': StubWhisper(),
+        'wav2vec_processor': StubWav2Vec2Processor(),
+        'wav2vec_model': StubWav2Vec2ForCTC(),
+    }
+
+"""
+======================
+This module provides lightweight stand-ins for the Whisper and Wav2Vec2 models, exposing
+the parts of their interfaces used by `app.utils.transcription` and
+`app.utils.phonemization`. They let the benchmark suite measure the pipeline around the
+models (decoding, windowing, alignment, persistence) in seconds rather than hours.
+
+Example Usage:
+======================
+    json_data = process_audio(audio_bytes, "example.wav", models=stub_models())
+"""
@@ -0,0 +1,146 @@
+import io
+import random
+import wave
+
+import numpy as np
+
+# Rates of the synthetic data, roughly matching conversational English
+SAMPLE_RATE: int = 16000
+WORDS_PER_SECOND: float = 2.5
+PHONEMES_PER_SECOND: float = 12.0
+# Wav2Vec2 emits one frame every 320 samples (20 ms at 16 kHz)
+FRAMES_PER_SECOND: int = 50
+# Whisper decodes the audio in 30-second windows, each becoming (at least) one segment
+SEGMENT_SECONDS: float = 30.0
+PHONEME_ALPHABET: list[str] = list("abdefhijklmnoprstuvwzæðŋɑɔəɛɪʃʊʌʒθ")
+
+def synthetic_waveform(duration: float, sample_rate: int = SAMPLE_RATE, seed: int = 0) -> np.ndarray:
+    """
+    Generates a speech-like mono float32 waveform: voiced bursts separated by silences.
+
+    Args:
+        duration (float): Length of the waveform in seconds.
+        sample_rate (int, optional): Sample rate in Hz. Defaults to 16000.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+
+    Returns:
+        np.ndarray: The waveform, with values in [-1, 1].
+    """
+    rng = np.random.default_rng(seed)
+    n = int(duration * sample_rate)
+    t = np.arange(n, dtype=np.float32) / sample_rate
+
+    # A harmonic carrier with a slowly varying pitch, gated by a syllable-rate envelope
+    carrier = np.sin(2 * np.pi * (120 + 20 * np.sin(2 * np.pi * 0.3 * t)) * t)
+    envelope = (np.sin(2 * np.pi * 2.0 * t) > -0.2).astype(np.float32)
+    noise = 0.01 * rng.standard_normal(n).astype(np.float32)
+
+    return (0.3 * carrier * envelope + noise).astype(np.float32)
+
+def waveform_to_wav_bytes(waveform: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """
+    Encodes a float waveform as a 16-bit PCM WAV file.
+
+    Args:
+        waveform (np.ndarray): The waveform, with values in [-1, 1].
+        sample_rate (int, optional): Sample rate in Hz. Defaults to 16000.
+
+    Returns:
+        bytes: The WAV file.
+    """
+    pcm = (np.clip(waveform, -1, 1) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+def synthetic_transcription(duration: float, seed: int = 0) -> dict:
+    """
+    Generates a dictionary shaped like the output of `whisper.transcribe` with word timestamps.
+
+    Args:
+        duration (float): Length of the transcribed audio in seconds.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+
+    Returns:
+        dict: A dictionary with the keys `text`, `segments` (each with `words` and `tokens`)
+              and `language`.
+    """
+    rng = random.Random(seed)
+    segments = []
+    time = 0.0
+    segment_start = 0.0
+    while segment_start < duration:
+        segment_end = min(duration, segment_start + SEGMENT_SECONDS)
+        words = []
+        time = max(time, segment_start)
+        while True:
+            start = time + (rng.uniform(0.2, 1.0) if rng.random() < 0.15 else 0.0)
+            end = start + rng.uniform(0.5, 1.5) / WORDS_PER_SECOND
+            if end > segment_end:
+                break
+            words.append({
+                'word': ' ' + ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 8))),
+                'start': round(start, 2),
+                'end': round(end, 2),
+                'probability': rng.uniform(0.5, 1.0),
+            })
+            time = end
+        tokens = [rng.randint(0, 50256) for _ in range(len(words))]
+        segments.append({
+            'id': len(segments),
+            'start': segment_start,
+            'end': segment_end,
+            'text': ''.join(word['word'] for word in words),
+            'tokens': tokens,
+            'words': words,
+        })
+        segment_start = segment_end
+
+    return {
+        'text': ''.join(segment['text'] for segment in segments),
+        'segments': segments,
+        'language': 'en',
+    }
+
+def synthetic_char_offsets(duration: float, seed: int = 0) -> list[dict]:
+    """
+    Generates a list shaped like the wav2vec2 `char_offsets` output (offsets in frames).
+
+    Args:
+        duration (float): Length of the phonemized audio in seconds.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+
+    Returns:
+        list[dict]: Character offsets with the keys `char`, `start_offset` and `end_offset`,
+                    sorted by `start_offset`.
+    """
+    rng = random.Random(seed)
+    total_frames = int(duration * FRAMES_PER_SECOND)
+    count = min(total_frames, int(duration * PHONEMES_PER_SECOND))
+    offsets = sorted(rng.sample(range(total_frames), count)) if count else []
+    return [
+        {'char': rng.choice(PHONEME_ALPHABET), 'start_offset': offset, 'end_offset': offset + 1}
+        for offset in offsets
+    ]
+
+"""
+======================
+This module generates synthetic inputs for the benchmark suite, sized by audio duration, so
+that every stage can be measured without real recordings.
+
+Functions:
+- `synthetic_waveform`: Speech-like float32 waveform with voiced bursts and silences.
+- `waveform_to_wav_bytes`: Encodes a waveform as an uploaded WAV file would be.
+- `synthetic_transcription`: Whisper-shaped transcription with word timestamps and tokens.
+- `synthetic_char_offsets`: Wav2vec2-shaped character offsets, in 20 ms frames.
+
+Example Usage:
+======================
+    text_transcription = synthetic_transcription(600)
+    phoneme_transcription = synthetic_char_offsets(600)
+    words = corpus_app(text_transcription, phoneme_transcription)
+"""
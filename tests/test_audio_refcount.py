@@ -0,0 +1,105 @@
+import pytest
+
+pytest.importorskip("gridfs")
+
+from pymongo.errors import DuplicateKeyError
+
+from app.services import database
+
+def _matches(document: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        value = document.get(key)
+        if isinstance(condition, dict):
+            if '$gt' in condition and not (value is not None and value > condition['$gt']):
+                return False
+            if '$lte' in condition and not (value is not None and value <= condition['$lte']):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+class _Files:
+    """
+    Stand-in for `fs.files`; `on_decrement` runs right after a reference is dropped, to
+    interleave another operation between the decrement and the delete.
+    """
+
+    def __init__(self):
+        self.documents: dict = {}
+        self.on_decrement = None
+
+    def find_one_and_update(self, query: dict, update: dict, projection=None, return_document=False):
+        for document in self.documents.values():
+            if _matches(document, query):
+                before = dict(document)
+                document['refcount'] += update['$inc']['refcount']
+                after = dict(document)
+                if update['$inc']['refcount'] < 0 and self.on_decrement is not None:
+                    hook, self.on_decrement = self.on_decrement, None
+                    hook()
+                return after if return_document else before
+        return None
+
+    def find_one_and_delete(self, query: dict, projection=None):
+        for file_id, document in list(self.documents.items()):
+            if _matches(document, query):
+                return self.documents.pop(file_id)
+        return None
+
+class _Chunks:
+    def __init__(self):
+        self.files_ids: list = []
+
+    def delete_many(self, query: dict) -> None:
+        self.files_ids = [files_id for files_id in self.files_ids if files_id != query['files_id']]
+
+class _Database:
+    def __init__(self):
+        self.fs = type('fs', (), {})()
+        self.fs.files = _Files()
+        self.fs.chunks = _Chunks()
+
+class _GridFS:
+    def __init__(self, db: _Database):
+        self.db = db
+
+    def put(self, data, _id, filename, sha256, refcount):
+        # Chunks are written first, then the file entry, which is unique per digest
+        self.db.fs.chunks.files_ids.append(_id)
+        if any(document['sha256'] == sha256 for document in self.db.fs.files.documents.values()):
+            raise DuplicateKeyError("E11000 duplicate key error")
+        self.db.fs.files.documents[_id] = {'_id': _id, 'sha256': sha256, 'refcount': refcount}
+
+    def delete(self, file_id) -> None:
+        self.db.fs.files.documents.pop(file_id, None)
+        self.db.fs.chunks.delete_many({'files_id': file_id})
+
+@pytest.fixture
+def db(monkeypatch):
+    db = _Database()
+    monkeypatch.setattr(database, 'db', db)
+    monkeypatch.setattr(database, 'fs', _GridFS(db))
+    return db
+
+def test_upload_between_decrement_and_delete_keeps_its_audio(db):
+    first = database.store_audio(b'audio', 'a.wav', 'digest')
+    stored = []
+    # Another upload of the same bytes arrives once the last reference is dropped
+    db.fs.files.on_decrement = lambda: stored.append(database.store_audio(b'audio', 'b.wav', 'digest'))
+
+    database.release_audio(first)
+
+    file_id = stored[0]
+    assert db.fs.files.documents[file_id]['refcount'] == 1
+    assert file_id in db.fs.chunks.files_ids
+    assert first not in db.fs.chunks.files_ids
+
+def test_upload_before_release_shares_the_file(db):
+    first = database.store_audio(b'audio', 'a.wav', 'digest')
+    second = database.store_audio(b'audio', 'b.wav', 'digest')
+
+    database.release_audio(first)
+
+    assert second == first
+    assert db.fs.files.documents[first]['refcount'] == 1
+    assert first in db.fs.chunks.files_ids
@@ -0,0 +1,44 @@
+import copy
+import random
+
+import pytest
+
+from app.services.corpus_app import corpus_app
+from benchmarks.reference import reference_corpus_app
+from benchmarks.synthetic import synthetic_char_offsets, synthetic_transcription
+
+def _inputs(seed: int, duration: float, end_jitter: float, shuffle: bool) -> tuple[dict, list[dict]]:
+    """
+    Builds a random transcription and phoneme offsets; a share `end_jitter` of the words end
+    before they start, and the offsets are shuffled if `shuffle` is set.
+    """
+    rng = random.Random(seed)
+    text_transcription = synthetic_transcription(duration, seed=seed)
+    for segment in text_transcription['segments']:
+        for word in segment['words']:
+            if rng.random() < end_jitter:
+                word['end'] = round(word['start'] - rng.uniform(0, 0.3), 2)
+    phoneme_transcription = synthetic_char_offsets(duration, seed=seed)
+    if shuffle:
+        rng.shuffle(phoneme_transcription)
+    return text_transcription, phoneme_transcription
+
+def _assert_matches_reference(text_transcription: dict, phoneme_transcription: list[dict]) -> None:
+    expected = reference_corpus_app(copy.deepcopy(text_transcription), phoneme_transcription)
+    assert corpus_app(copy.deepcopy(text_transcription), phoneme_transcription) == expected
+
+@pytest.mark.parametrize('seed', range(50))
+def test_matches_reference_on_random_inputs(seed):
+    rng = random.Random(seed)
+    _assert_matches_reference(*_inputs(seed, rng.uniform(0, 90), 0.05, rng.random() < 0.2))
+
+@pytest.mark.parametrize('seed', range(10))
+def test_matches_reference_with_unsorted_offsets(seed):
+    _assert_matches_reference(*_inputs(seed, 30, 0.0, True))
+
+@pytest.mark.parametrize('seed', range(10))
+def test_matches_reference_with_non_monotonic_word_ends(seed):
+    _assert_matches_reference(*_inputs(seed, 30, 0.3, True))
+
+def test_matches_reference_on_empty_input():
+    _assert_matches_reference(*_inputs(0, 0, 0.0, False))
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("motor")
+
+from pymongo.errors import DocumentTooLarge
+
+from app import config
+from app.services import async_database
+from app.services.async_database import WriteBehindBuffer
+
+class _Cursor:
+    def __init__(self, documents: list[dict]):
+        self._documents = documents
+
+    async def to_list(self, length=None) -> list[dict]:
+        return self._documents
+
+class _Collection:
+    """
+    Stand-in for the `documents` collection that rejects documents marked as oversized.
+    """
+
+    def __init__(self):
+        self.documents: dict = {}
+
+    async def insert_many(self, documents: list[dict], ordered: bool = True) -> None:
+        if any(document.get('oversized') for document in documents):
+            raise DocumentTooLarge("BSON document too large.")
+        for document in documents:
+            self.documents[document['_id']] = document
+
+    def find(self, query: dict, projection=None) -> _Cursor:
+        ids = query['_id']['$in']
+        return _Cursor([{'_id': _id} for _id in ids if _id in self.documents])
+
+class _Database:
+    def __init__(self):
+        self.documents = _Collection()
+
+@pytest.fixture
+def database(monkeypatch):
+    db = _Database()
+    released = []
+
+    async def release_audio(file_id):
+        released.append(file_id)
+
+    monkeypatch.setattr(async_database, 'get_async_db', lambda: db)
+    monkeypatch.setattr(async_database, 'release_audio_async', release_audio)
+    monkeypatch.setattr(config, 'SEARCH_INDEXING', False)
+    return db, released
+
+def _document(file_id: str, **fields) -> dict:
+    return {'audio': {'file': f'{file_id}.wav', 'file_id': file_id}, **fields}
+
+def test_oversized_document_does_not_stop_the_buffer(database):
+    db, released = database
+
+    async def scenario():
+        buffer = WriteBehindBuffer(batch_size=10, max_wait_ms=5, max_retries=0)
+        with pytest.raises(DocumentTooLarge):
+            await buffer.insert(_document('large', oversized=True))
+        document_id = await asyncio.wait_for(buffer.insert(_document('small')), timeout=5)
+        await buffer.flush()
+        return document_id
+
+    document_id = asyncio.run(scenario())
+    assert document_id in {str(_id) for _id in db.documents.documents}
+    assert released == ['large']
+
+def test_oversized_document_only_fails_itself_within_a_batch(database):
+    db, released = database
+
+    async def scenario():
+        buffer = WriteBehindBuffer(batch_size=10, max_wait_ms=50, max_retries=0)
+        return await asyncio.gather(
+            buffer.insert(_document('large', oversized=True)),
+            buffer.insert(_document('small')),
+            return_exceptions=True,
+        )
+
+    large, small = asyncio.run(scenario())
+    assert isinstance(large, DocumentTooLarge)
+    assert small in {str(_id) for _id in db.documents.documents}
+    assert released == ['large']